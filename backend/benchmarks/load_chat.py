@@ -0,0 +1,214 @@
+"""
+Load test of the full /chat -> LLM -> MCP -> executor path, with per-stage latency.
+
+The OpenAI API is replaced by the scripted chat-completions stub in
+`benchmarks.openai_stub` (started in-process unless `--llm-url` is given),
+reached over HTTP through the backend's real model clients. The MCP side is
+a real MCP server (`--mcp-url`, e.g. `uv run src/api/server.py` in
+mcp_server/) or, with `--stub-mcp`, the in-process stub from
+`benchmarks.stubs`.
+
+`--requests` questions (rotating over the three datasets) are sent to the
+FastAPI app in-process at `--concurrency`. Per-stage numbers come from the
+app's own trace spans: the HTTP request, each agent, every LLM generation and
+every tool call. Per request, the LLM calls and their input/output tokens
+are reported too, next to the size of the schema digest the analyst gets in
+its instructions (`--no-schema-digest` turns it off, which brings back the
+get_file_context turn).
+
+`--llm-rpm`/`--llm-tpm` make the in-process stub answer 429s over those
+limits, so the backend's admission control (queueing, retries, the
+LLM_* budgets of `src.llm.admission`) can be exercised; `--batch-questions`
+sends one /chat/batch of that many questions alongside the interactive load,
+reported as `batch`. Results are saved under benchmarks/results/; pass an
+earlier result file as `--compare` to see the change.
+
+Usage:
+    uv run python -m benchmarks.load_chat --requests 200 --concurrency 16 --label baseline
+    uv run python -m benchmarks.load_chat --requests 200 --concurrency 16 --compare benchmarks/results/<file>.json
+    uv run python -m benchmarks.load_chat --stub-mcp --llm-rpm 600 --batch-questions 50 --label rate-limited
+"""
+import argparse
+import asyncio
+import collections
+import contextlib
+import os
+import sys
+import time
+
+import httpx
+
+from benchmarks import results
+from benchmarks.openai_stub import StubServer
+
+
+QUESTIONS = [
+    "What is the average salary per department? (#{i})",
+    "What is the average temperature per city? (#{i})",
+    "What is the revenue per product? (#{i})",
+]
+
+# Spans per request are ~15; keep every span of the run
+SPANS_PER_REQUEST = 32
+
+
+def stage_of(span) -> str:
+    """Group span names into stages, e.g. `agent.function/code_executor` -> `tool/code_executor`."""
+    if span.parent_id is None and span.name.startswith(("POST ", "GET ")):
+        return f"http {span.name}"
+    kind, _, name = span.name.removeprefix("agent.").partition("/")
+    if kind == "function":
+        return f"tool/{name}"
+    if kind == "generation":
+        return "llm/generation"
+    return f"{kind}/{name}" if name else kind
+
+
+async def drive(args, stub=None) -> int:
+    # Imported here so the environment set up by `main` is in place first
+    from src.api.main import app
+    from src.agent_.data_analysis import MCP_ALLOWED_TOOL_NAMES
+    from src.agent_.schema_digest import schema_digest
+    from src.llm.admission import admission_controller
+    from src.agent_.utils import MCPServerPool
+    from src.llm.model import model_registry
+    from src.observability import tracing
+
+    memory = tracing.MemoryExporter(size=args.requests * SPANS_PER_REQUEST)
+    tracing.set_exporter(memory)
+
+    server_factory = None
+    if args.stub_mcp:
+        from benchmarks.stubs import StubMCPServer
+        server_factory = lambda: StubMCPServer(latency=args.tool_latency)
+    pool = MCPServerPool(
+        allowed_tool_names=MCP_ALLOWED_TOOL_NAMES, size=args.pool_size, url=args.mcp_url, server_factory=server_factory
+    )
+    await pool.start()
+    app.state.mcp_server_pool = pool
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies, batch_latencies, failures = [], [], []
+
+    async def chat(client: httpx.AsyncClient, i: int):
+        question = QUESTIONS[i % len(QUESTIONS)].format(i=i)
+        async with semaphore:
+            started = time.perf_counter()
+            if args.stream:
+                async with client.stream("POST", "/chat/stream", params={"question": question}) as response:
+                    body = "".join([chunk async for chunk in response.aiter_text()])
+            else:
+                response = await client.post("/chat", params={"question": question})
+                body = response.text
+            elapsed = time.perf_counter() - started
+        if response.status_code != 200 or "error" in body[:200].lower():
+            failures.append(f"{response.status_code}: {body[:200]}")
+        else:
+            latencies.append(elapsed)
+
+    async def batch(client: httpx.AsyncClient):
+        questions = [QUESTIONS[i % len(QUESTIONS)].format(i=f"batch {i}") for i in range(args.batch_questions)]
+        started = time.perf_counter()
+        response = await client.post("/chat/batch", json={"questions": questions})
+        elapsed = time.perf_counter() - started
+        items = response.json().get("results", []) if response.status_code == 200 else []
+        errors = [item["error"] for item in items if "error" in item]
+        if response.status_code != 200 or errors:
+            failures.append(f"batch {response.status_code}: {(errors or [response.text])[0]}")
+        else:
+            batch_latencies.append(elapsed)
+
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://load", timeout=None) as client:
+            # One untimed request warms up the connections and the dataset catalog
+            await chat(client, 0)
+            latencies.clear()
+            memory.spans.clear()
+            started = time.perf_counter()
+            batches = [batch(client)] if args.batch_questions else []
+            await asyncio.gather(*batches, *(chat(client, i) for i in range(1, args.requests + 1)))
+            wall = time.perf_counter() - started
+    finally:
+        await pool.close()
+        await model_registry.close()
+
+    by_stage = collections.defaultdict(list)
+    tokens = collections.Counter()
+    for span in memory.spans:
+        if span.duration is not None:
+            by_stage[stage_of(span)].append(span.duration)
+        for kind, count in (span.attributes.get("usage") or {}).items():
+            tokens[kind] += count or 0
+    metrics = {"end_to_end": results.summarize(latencies, wall)}
+    if batch_latencies:
+        metrics["batch"] = results.summarize(batch_latencies)
+    for stage in sorted(by_stage):
+        metrics[stage] = results.summarize(by_stage[stage], wall)
+    served = max(1, len(latencies))
+    metrics["per_request"] = {
+        "llm_calls": len(by_stage["llm/generation"]) / served,
+        **{kind: count / served for kind, count in sorted(tokens.items())},
+        "schema_digest_tokens": schema_digest.tokens,
+    }
+    admission = admission_controller.stats()
+    metrics["llm_admission"] = {
+        "retries": admission["retries"],
+        "timeouts": admission["timeouts"],
+        "rate_limited": stub.app.state.rate_limited if stub is not None else None,
+    }
+
+    params = {key: value for key, value in vars(args).items() if key not in ("compare", "label")}
+    print(f"[{args.label}] requests={args.requests} concurrency={args.concurrency} wall={wall:.2f}s failures={len(failures)}")
+    baseline = results.load(args.compare) if args.compare else None
+    results.print_table(metrics, baseline)
+    before = (baseline or {}).get("metrics", {}).get("per_request", {})
+    print("per request: " + ", ".join(
+        f"{kind}={value:.1f}" + (f" ({value - before[kind]:+.1f})" if kind in before else "")
+        for kind, value in metrics["per_request"].items()
+    ))
+    print("llm admission: " + ", ".join(f"{key}={value}" for key, value in metrics["llm_admission"].items()))
+    for failure in failures[:5]:
+        print(f"  {failure}")
+    if not args.no_save:
+        print(f"saved {results.save('load_chat', args.label, params, metrics)}")
+    return 1 if failures else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--stream", action="store_true", help="Drive /chat/stream instead of /chat")
+    parser.add_argument("--llm-url", help="Running OpenAI stub (or compatible endpoint); default starts one in-process")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Seconds per stub LLM reply")
+    parser.add_argument("--llm-rpm", type=float, default=0.0, help="Requests per minute the stub allows (0 = unlimited)")
+    parser.add_argument("--llm-tpm", type=float, default=0.0, help="Prompt tokens per minute the stub allows (0 = unlimited)")
+    parser.add_argument("--batch-questions", type=int, default=0, help="Questions of one /chat/batch sent alongside")
+    parser.add_argument("--mcp-url", default="http://127.0.0.1:8000/mcp")
+    parser.add_argument("--stub-mcp", action="store_true", help="Use the in-process MCP stub instead of --mcp-url")
+    parser.add_argument("--tool-latency", type=float, default=0.01, help="Seconds per stub MCP tool call")
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--no-schema-digest", action="store_true", help="Leave the dataset schema out of the analyst's instructions")
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--compare", help="Earlier result file to compare against")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    if args.no_schema_digest:
+        os.environ["SCHEMA_DIGEST_ENABLED"] = "false"
+    with contextlib.ExitStack() as stack:
+        stub = None
+        if args.llm_url is None:
+            stub = stack.enter_context(StubServer(
+                latency=args.llm_latency, requests_per_minute=args.llm_rpm, tokens_per_minute=args.llm_tpm
+            ))
+            args.llm_url = stub.base_url
+        os.environ["OPENAI_API_ENDPOINT"] = args.llm_url
+        sys.exit(asyncio.run(drive(args, stub)))
+
+
+if __name__ == "__main__":
+    main()
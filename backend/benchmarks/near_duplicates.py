@@ -0,0 +1,70 @@
+"""
+Check of the answer cache's near-duplicate matching.
+
+Each case stores the answer to one question and looks up another through
+`AnswerCache` (in memory, no MCP server or LLM involved). Rephrasings that ask
+the same thing must be served from the cache; questions that differ in a
+negation, a comparison, a number or a column must not be, whatever their
+trigram similarity. Exits with status 1 if any lookup has the wrong outcome.
+
+Usage:
+    uv run python -m benchmarks.near_duplicates
+    uv run python -m benchmarks.near_duplicates --similarity 0.8
+"""
+import argparse
+import sys
+
+from src.agent_.answer_cache import ANSWER_CACHE_SIMILARITY, AnswerCache, MemoryAnswerBackend, normalize, trigrams
+
+
+# (cached question, asked question, served from the cache)
+CASES = [
+    ("What is the average salary per department?", "what is the average salary per department", True),
+    ("What is the average salary of the employees in the Sales department?",
+     "What is the average salary of employees in the Sales department?", True),
+    ("What is the average salary of the employees in the Sales department?",
+     "What is the average salary of all the employees in the Sales department?", True),
+    ("Which employees in the Sales department earn more than the department average salary?",
+     "Which employees not in the Sales department earn more than the department average salary?", False),
+    ("How many employees in the Sales department of the Berlin office are managers?",
+     "How many employees in the Sales department of the Berlin office are not managers?", False),
+    ("Which employees in the Sales department of the Berlin office earn more than the average salary of their team?",
+     "Which employees in the Sales department of the Berlin office earn less than the average salary of their team?", False),
+    ("Which employees in the Sales department of the Berlin office earn more than the average salary of their team?",
+     "Which employees in the Sales department of the Berlin office earn at least the average salary of their team?", False),
+    ("Which cities recorded the highest average temperature across all of the measurements taken in 2023?",
+     "Which cities recorded the lowest average temperature across all of the measurements taken in 2023?", False),
+    ("What were the top 5 products by total revenue in the last quarter?",
+     "What were the top 3 products by total revenue in the last quarter?", False),
+    ("List the products sold in the North region with a total revenue above the product average",
+     "List the products sold in the South region with a total revenue above the product average", False),
+    ("List the products sold in the North region with a total revenue above the product average",
+     "List the products sold outside the North region with a total revenue above the product average", False),
+]
+
+
+def similarity(cached: str, asked: str) -> float:
+    a, b = trigrams(normalize(cached)), trigrams(normalize(asked))
+    return len(a & b) / len(a | b)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--similarity", type=float, default=ANSWER_CACHE_SIMILARITY, help="Near-duplicate threshold")
+    args = parser.parse_args()
+
+    wrong = 0
+    print(f"{'trigrams':>8}  {'expected':>8}  {'served':>6}  asked")
+    for cached, asked, expected in CASES:
+        cache = AnswerCache(MemoryAnswerBackend(), similarity=args.similarity)
+        cache.store(cached, "answer", "v1")
+        served = cache.lookup(asked, "v1") is not None
+        wrong += served != expected
+        marker = "" if served == expected else "  <-- wrong"
+        print(f"{similarity(cached, asked):>8.2f}  {str(expected):>8}  {str(served):>6}  {asked}{marker}")
+    print(f"{len(CASES) - wrong}/{len(CASES)} lookups as expected at similarity {args.similarity:g}")
+    sys.exit(1 if wrong else 0)
+
+
+if __name__ == "__main__":
+    main()
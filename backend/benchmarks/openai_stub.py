@@ -0,0 +1,301 @@
+"""
+Deterministic stand-in for the OpenAI chat-completions API.
+
+Point the backend at it with `OPENAI_API_ENDPOINT=http://127.0.0.1:8900/v1`
+and every agent talks to this server instead of OpenAI, over real HTTP and
+through the real `OpenAIChatCompletionsModel`. The replies follow the same
+script the real agents go through:
+
+    - structured output requested (guardrail) -> `{"is_safe": true, ...}`
+    - handoff tool offered (intake) -> call it
+    - analyst without file context yet, and no schema digest ("# Datasets")
+      in its instructions -> call `get_file_context`
+    - analyst with file context -> call `code_executor` with a Polars query
+      picked from the question (see `QUERIES`)
+    - after the `code_executor` result -> answer with the tool output
+
+Both plain and streamed (SSE) completions are served. `--latency` adds a
+fixed delay before each reply and `--tokens-per-second` paces streamed
+text, so the backend's waiting behaviour can be sized without API spend.
+
+`--rpm` and `--tpm` simulate the API's rate limits: requests over them get
+the API's 429 `rate_limit_exceeded` error with a `retry-after` header. The
+limits refill continuously, with a burst of at most `--burst-seconds` worth.
+
+Usage:
+    uv run python -m benchmarks.openai_stub --port 8900 --latency 0.2
+    uv run python -m benchmarks.openai_stub --port 8900 --rpm 120 --tpm 40000
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import re
+import threading
+import time
+from typing import Iterator, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+# Query per dataset; the first whose keywords appear in the question is used
+QUERIES = [
+    (
+        ("salary", "employee", "department", "hire", "performance"),
+        "lazy_df = pl.scan_csv(\"./data/employee_data.csv\")\n"
+        "result = lazy_df.group_by(\"department\").agg(pl.col(\"salary\").mean().alias(\"average_salary\")).sort(\"department\").collect()\n"
+        "result",
+    ),
+    (
+        ("weather", "temperature", "humidity", "rain", "precipitation", "city"),
+        "lazy_df = pl.scan_csv(\"./data/weather_data.csv\")\n"
+        "result = lazy_df.group_by(\"city\").agg(pl.col(\"temperature\").mean().alias(\"average_temperature\")).sort(\"city\").collect()\n"
+        "result",
+    ),
+    (
+        (),
+        "lazy_df = pl.scan_csv(\"./data/sample_sales.csv\")\n"
+        "result = lazy_df.group_by(\"product\").agg((pl.col(\"price\") * pl.col(\"quantity\")).sum().alias(\"revenue\")).sort(\"product\").collect()\n"
+        "result",
+    ),
+]
+
+FINAL_ANSWER_CHARS = 500
+
+_SCHEMA_DIGEST_HEADING = re.compile(r"^# Datasets$", re.MULTILINE)
+
+
+def pick_query(question: str) -> str:
+    question = question.lower()
+    for keywords, code in QUERIES:
+        if not keywords or any(keyword in question for keyword in keywords):
+            return code
+    return QUERIES[-1][1]
+
+
+def _text(content) -> str:
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+def _tool_results(messages: List[dict]) -> dict:
+    """Tool name -> output of the tool results already in the conversation."""
+    names = {
+        call["id"]: call["function"]["name"]
+        for message in messages if message.get("role") == "assistant"
+        for call in message.get("tool_calls") or []
+    }
+    return {names.get(m.get("tool_call_id")): _text(m.get("content")) for m in messages if m.get("role") == "tool"}
+
+
+def _has_schema_digest(messages: List[dict]) -> bool:
+    return any(m.get("role") == "system" and _SCHEMA_DIGEST_HEADING.search(_text(m.get("content"))) for m in messages)
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class ChatScript:
+    """Decides the reply to a chat-completions request body."""
+
+    def __init__(self):
+        self._ids = itertools.count(1)
+
+    def next_id(self, prefix: str) -> str:
+        return f"{prefix}_{next(self._ids):08d}"
+
+    def reply(self, body: dict) -> dict:
+        """An assistant message: `{"content": ...}` or `{"tool_call": (name, arguments)}`."""
+        messages = body.get("messages", [])
+        tools = [tool["function"]["name"] for tool in body.get("tools") or []]
+        question = next((_text(m.get("content")) for m in messages if m.get("role") == "user"), "")
+        results = _tool_results(messages)
+
+        if (body.get("response_format") or {}).get("type") == "json_schema":
+            return {"content": json.dumps({"is_safe": True, "reasoning": "stub verdict"})}
+        handoffs = [name for name in tools if name.startswith("transfer_to_")]
+        if handoffs and not results:
+            return {"tool_call": (handoffs[0], {})}
+        if "code_executor" in results:
+            return {"content": f"Here is the result:\n{results['code_executor'][:FINAL_ANSWER_CHARS]}"}
+        if "get_file_context" in tools and "get_file_context" not in results and not _has_schema_digest(messages):
+            return {"tool_call": ("get_file_context", {"path": "./data"})}
+        if "code_executor" in tools:
+            return {"tool_call": ("code_executor", {"code": pick_query(question)})}
+        return {"content": "stub answer"}
+
+    def completion(self, body: dict, reply: dict) -> dict:
+        message = {"role": "assistant", "content": reply.get("content")}
+        if "tool_call" in reply:
+            name, arguments = reply["tool_call"]
+            message["tool_calls"] = [{
+                "id": self.next_id("call"),
+                "type": "function",
+                "function": {"name": name, "arguments": json.dumps(arguments)},
+            }]
+        return {
+            "id": self.next_id("chatcmpl"),
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": message,
+                "finish_reason": "tool_calls" if "tool_call" in reply else "stop",
+            }],
+            "usage": self.usage(body, message),
+        }
+
+    @staticmethod
+    def usage(body: dict, message: dict) -> dict:
+        prompt_tokens = _tokens(json.dumps(body.get("messages", [])))
+        completion_tokens = _tokens(json.dumps(message))
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+
+def _chunks(completion: dict) -> Iterator[dict]:
+    """Split a completion into stream chunks: one per word of text, one per tool call, then usage."""
+    message = completion["choices"][0]["message"]
+    base = {key: completion[key] for key in ("id", "created", "model")} | {"object": "chat.completion.chunk"}
+
+    def chunk(delta: dict, finish_reason: Optional[str] = None) -> dict:
+        return {**base, "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+
+    yield chunk({"role": "assistant", "content": ""})
+    for word in re.findall(r"\S+\s*", message.get("content") or ""):
+        yield chunk({"content": word})
+    for index, call in enumerate(message.get("tool_calls") or []):
+        yield chunk({"tool_calls": [{"index": index, **call}]})
+    yield chunk({}, completion["choices"][0]["finish_reason"])
+    yield {**base, "choices": [], "usage": completion["usage"]}
+
+
+class RateLimit:
+    """A per-minute limit refilled continuously, holding at most `burst_seconds` worth; <= 0 is unlimited."""
+
+    def __init__(self, per_minute: float, burst_seconds: float = 1.0):
+        self.rate = per_minute / 60
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def retry_after(self, amount: float) -> float:
+        """0 if `amount` was taken, else the seconds until it could be."""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+        amount = min(amount, self.capacity)
+        if self.level < amount:
+            return (amount - self.level) / self.rate
+        self.level -= amount
+        return 0.0
+
+
+def _rate_limited(kind: str, retry_after: float) -> JSONResponse:
+    """The API's 429 reply."""
+    return JSONResponse(
+        status_code=429,
+        headers={"retry-after": f"{retry_after:.3f}"},
+        content={"error": {
+            "message": f"Rate limit reached for {kind}, please try again in {retry_after:.3f}s.",
+            "type": kind,
+            "param": None,
+            "code": "rate_limit_exceeded",
+        }},
+    )
+
+
+def create_app(
+    latency: float = 0.0,
+    tokens_per_second: float = 0.0,
+    requests_per_minute: float = 0.0,
+    tokens_per_minute: float = 0.0,
+    burst_seconds: float = 1.0,
+) -> FastAPI:
+    app = FastAPI()
+    script = ChatScript()
+    limits = {
+        "requests": RateLimit(requests_per_minute, burst_seconds),
+        "tokens": RateLimit(tokens_per_minute, burst_seconds),
+    }
+    app.state.requests = 0
+    app.state.rate_limited = 0
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+        for kind, cost in (("requests", 1), ("tokens", _tokens(json.dumps(body.get("messages", []))))):
+            if (retry_after := limits[kind].retry_after(cost)) > 0:
+                app.state.rate_limited += 1
+                return _rate_limited(kind, retry_after)
+        if latency:
+            await asyncio.sleep(latency)
+        completion = script.completion(body, script.reply(body))
+        if not body.get("stream"):
+            return JSONResponse(completion)
+
+        async def events():
+            for chunk in _chunks(completion):
+                if tokens_per_second and chunk["choices"] and "content" in chunk["choices"][0]["delta"]:
+                    await asyncio.sleep(_tokens(chunk["choices"][0]["delta"]["content"]) / tokens_per_second)
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+class StubServer:
+    """Runs the stub in a background thread with its own event loop, so it does not share the driver's."""
+
+    def __init__(self, port: int = 0, latency: float = 0.0, tokens_per_second: float = 0.0, **limits):
+        self.app = create_app(latency, tokens_per_second, **limits)
+        self.server = uvicorn.Server(uvicorn.Config(self.app, host="127.0.0.1", port=port, log_level="warning"))
+        self._thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        port = self.server.servers[0].sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}/v1"
+
+    def __enter__(self) -> "StubServer":
+        self._thread.start()
+        while not self.server.started:
+            if not self._thread.is_alive():
+                raise RuntimeError("OpenAI stub failed to start")
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.server.should_exit = True
+        self._thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before each reply")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Pace of streamed text (0 = unpaced)")
+    parser.add_argument("--rpm", type=float, default=0.0, help="Requests per minute before 429s (0 = unlimited)")
+    parser.add_argument("--tpm", type=float, default=0.0, help="Prompt tokens per minute before 429s (0 = unlimited)")
+    parser.add_argument("--burst-seconds", type=float, default=1.0, help="Seconds of the limits that may be used at once")
+    args = parser.parse_args()
+    app = create_app(args.latency, args.tokens_per_second, args.rpm, args.tpm, args.burst_seconds)
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Concurrency stress test for the /chat endpoint.
+
+Fires many simultaneous /chat calls at the FastAPI app in-process, with the
+LLM and the MCP server replaced by the scripted stubs in `benchmarks.stubs`.
+Every answer must echo its own question back; any cross-talk between
+concurrent runs (a request answered with another request's data, or a tool
+call on a closed session) is reported and makes the run fail.
+
+Usage:
+    uv run python -m benchmarks.stress_chat --requests 500 --pool-size 4
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import httpx
+
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+from src.api.main import app
+from src.agent_.data_analysis import MCP_ALLOWED_TOOL_NAMES, data_analyst_agent, intake_agent
+from src.agent_.utils import MCPServerPool
+from src.guardrails.input_guardrails import guardrail_agent
+from benchmarks.stubs import StubMCPServer, StubModel
+
+
+def install_stub_model(model_latency: float):
+    """Point the template agents at the stub model (once, before any request runs)."""
+    model = StubModel(latency=model_latency)
+    for agent in (intake_agent, data_analyst_agent, guardrail_agent):
+        agent.model = model
+
+
+async def stress(requests: int, pool_size: int, model_latency: float, tool_latency: float) -> int:
+    install_stub_model(model_latency)
+    pool = MCPServerPool(
+        allowed_tool_names=MCP_ALLOWED_TOOL_NAMES,
+        size=pool_size,
+        server_factory=lambda: StubMCPServer(latency=tool_latency),
+    )
+    await pool.start()
+    app.state.mcp_server_pool = pool
+
+    async def chat(client: httpx.AsyncClient, i: int):
+        question = f"What were the total sales for request-{i}?"
+        start = time.perf_counter()
+        response = await client.post("/chat", params={"question": question})
+        elapsed = time.perf_counter() - start
+        ok = response.status_code == 200 and f"request-{i}?" in response.text
+        return ok, elapsed, response
+
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://stress", timeout=None) as client:
+            start = time.perf_counter()
+            results = await asyncio.gather(*(chat(client, i) for i in range(requests)))
+            wall = time.perf_counter() - start
+    finally:
+        await pool.close()
+
+    latencies = sorted(elapsed for _, elapsed, _ in results)
+    failures = [response for ok, _, response in results if not ok]
+    print(f"requests={requests} pool_size={pool_size} wall={wall:.2f}s throughput={requests / wall:.1f} req/s")
+    print(
+        f"latency p50={statistics.median(latencies) * 1000:.1f}ms "
+        f"p99={latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f}ms max={latencies[-1] * 1000:.1f}ms"
+    )
+    print(f"failures={len(failures)}")
+    for response in failures[:5]:
+        print(f"  {response.status_code}: {response.text[:200]}")
+    return 1 if failures else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--model-latency", type=float, default=0.01, help="Seconds per stub LLM call")
+    parser.add_argument("--tool-latency", type=float, default=0.01, help="Seconds per stub MCP tool call")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(stress(args.requests, args.pool_size, args.model_latency, args.tool_latency)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""
+Deterministic, in-process stand-ins for the LLM and the MCP server.
+
+They script the same conversation the real agents have (guardrail verdict,
+handoff to the analyst, one `code_executor` call, final answer), so the backend
+can be driven at high concurrency without network access or API spend.
+"""
+import asyncio
+import json
+import re
+import time
+import uuid
+from typing import Any, AsyncIterator, List, Optional
+
+from agents import Model, ModelResponse, Usage
+from agents.mcp import MCPServer
+from mcp.types import (
+    CallToolResult,
+    GetPromptResult,
+    ListPromptsResult,
+    ReadResourceResult,
+    TextContent,
+    TextResourceContents,
+)
+from mcp.types import Tool as MCPTool
+from openai.types.responses import (
+    Response,
+    ResponseCompletedEvent,
+    ResponseFunctionToolCall,
+    ResponseOutputMessage,
+    ResponseOutputText,
+    ResponseTextDeltaEvent,
+)
+
+
+CODE_EXECUTOR_CALL_PREFIX = "call_code_executor_"
+UNSAFE_MARKER = "[unsafe]"
+
+
+def _first_user_message(input: Any) -> str:
+    if isinstance(input, str):
+        return input
+    for item in input:
+        if item.get("role") == "user":
+            content = item.get("content")
+            return content if isinstance(content, str) else json.dumps(content)
+    return ""
+
+
+def _message(text: str) -> ResponseOutputMessage:
+    return ResponseOutputMessage(
+        id=f"msg_{uuid.uuid4().hex}",
+        content=[ResponseOutputText(text=text, type="output_text", annotations=[])],
+        role="assistant",
+        status="completed",
+        type="message",
+    )
+
+
+def _function_call(name: str, arguments: dict, call_id: str) -> ResponseFunctionToolCall:
+    return ResponseFunctionToolCall(
+        id=f"fc_{uuid.uuid4().hex}",
+        call_id=call_id,
+        name=name,
+        arguments=json.dumps(arguments),
+        type="function_call",
+    )
+
+
+class StubModel(Model):
+    """
+    Scripted model:
+        - structured output requested (guardrail) -> `{"is_safe": true, ...}`,
+          or `false` when the question contains `UNSAFE_MARKER`
+        - agent with handoffs (intake) -> hand off to the first handoff
+        - agent with tools (analyst) -> call `code_executor` with the question
+        - after the `code_executor` result -> answer with the tool output
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    async def get_response(
+        self,
+        system_instructions,
+        input,
+        model_settings,
+        tools,
+        output_schema,
+        handoffs,
+        tracing,
+        *,
+        previous_response_id=None,
+        prompt=None,
+        **kwargs,
+    ) -> ModelResponse:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        items = [] if isinstance(input, str) else input
+        last_item = items[-1] if items else {}
+
+        if output_schema is not None and not output_schema.is_plain_text():
+            is_safe = UNSAFE_MARKER not in _first_user_message(input)
+            output = _message(json.dumps({"is_safe": is_safe, "reasoning": "stub verdict"}))
+        elif last_item.get("type") == "function_call_output" and last_item["call_id"].startswith(CODE_EXECUTOR_CALL_PREFIX):
+            output = _message(last_item["output"])
+        elif handoffs:
+            output = _function_call(handoffs[0].tool_name, {}, f"call_{uuid.uuid4().hex}")
+        elif any(tool.name == "code_executor" for tool in tools):
+            question = _first_user_message(input)
+            output = _function_call(
+                "code_executor",
+                {"code": f"# {question}\nresult = 1\nresult"},
+                f"{CODE_EXECUTOR_CALL_PREFIX}{uuid.uuid4().hex}",
+            )
+        else:
+            output = _message("stub answer")
+
+        return ModelResponse(
+            output=[output],
+            usage=Usage(requests=1, input_tokens=1, output_tokens=1, total_tokens=2),
+            response_id=None,
+        )
+
+    async def stream_response(
+        self,
+        system_instructions,
+        input,
+        model_settings,
+        tools,
+        output_schema,
+        handoffs,
+        tracing,
+        *,
+        previous_response_id=None,
+        prompt=None,
+        **kwargs,
+    ) -> AsyncIterator[Any]:
+        """Same script as `get_response`, with message text streamed one word per delta."""
+        response = await self.get_response(
+            system_instructions, input, model_settings, tools, output_schema, handoffs, tracing,
+            previous_response_id=previous_response_id, prompt=prompt,
+        )
+        sequence_number = 0
+        for output_index, output in enumerate(response.output):
+            if isinstance(output, ResponseOutputMessage):
+                for chunk in re.findall(r"\S+\s*", output.content[0].text):
+                    yield ResponseTextDeltaEvent(
+                        content_index=0,
+                        delta=chunk,
+                        item_id=output.id,
+                        output_index=output_index,
+                        type="response.output_text.delta",
+                        sequence_number=sequence_number,
+                        logprobs=[],
+                    )
+                    sequence_number += 1
+        yield ResponseCompletedEvent(
+            response=Response(
+                id=f"resp_{uuid.uuid4().hex}",
+                created_at=time.time(),
+                model="stub",
+                object="response",
+                output=response.output,
+                tool_choice="auto",
+                tools=[],
+                parallel_tool_calls=False,
+            ),
+            type="response.completed",
+            sequence_number=sequence_number,
+        )
+
+
+class _StubSession:
+    """`catalog://versions` and `catalog://schema` of a single unchanging dataset."""
+
+    VERSIONS = {"sample_sales.csv": [0, 0]}
+    SCHEMA = {
+        "versions": VERSIONS,
+        "datasets": [{"path": "./data/sample_sales.csv", "rows": 20, "dtypes": {"date": "Date", "amount": "Float64"}}],
+    }
+
+    async def send_ping(self):
+        return None
+
+    async def read_resource(self, uri) -> ReadResourceResult:
+        document = self.SCHEMA if str(uri) == "catalog://schema" else self.VERSIONS
+        return ReadResourceResult(contents=[TextResourceContents(uri=uri, mimeType="application/json", text=json.dumps(document))])
+
+
+class StubMCPServer(MCPServer):
+    """
+    MCP server exposing `code_executor` and `get_file_context`.
+
+    `code_executor` echoes the submitted code back. Calls on a closed server
+    fail loudly, which is how a request using another request's torn-down
+    session would show up.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.session: Optional[_StubSession] = None
+        self.calls = 0
+
+    @property
+    def name(self) -> str:
+        return "stub-mcp-server"
+
+    async def connect(self):
+        self.session = _StubSession()
+
+    async def cleanup(self):
+        self.session = None
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.cleanup()
+
+    async def list_tools(self, run_context=None, agent=None) -> List[MCPTool]:
+        return [
+            MCPTool(
+                name="code_executor",
+                inputSchema={"type": "object", "properties": {"code": {"type": "string"}}, "required": ["code"]},
+            ),
+            MCPTool(
+                name="get_file_context",
+                inputSchema={"type": "object", "properties": {"path": {"type": "string"}}},
+            ),
+        ]
+
+    async def call_tool(self, tool_name: str, arguments: Optional[dict]) -> CallToolResult:
+        if self.session is None:
+            raise RuntimeError("Tool called on a closed MCP server")
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if tool_name == "code_executor":
+            text = json.dumps({"status": "success", "result": arguments["code"]})
+        else:
+            text = json.dumps([{"file": "sample_sales.csv", "headers": ["date", "amount"]}])
+        return CallToolResult(content=[TextContent(type="text", text=text)])
+
+    async def list_prompts(self) -> ListPromptsResult:
+        return ListPromptsResult(prompts=[])
+
+    async def get_prompt(self, name: str, arguments: Optional[dict] = None) -> GetPromptResult:
+        raise NotImplementedError("StubMCPServer has no prompts")
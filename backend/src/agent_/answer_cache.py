@@ -0,0 +1,351 @@
+"""
+Question -> answer cache in front of the agent run.
+
+Dashboards ask the same handful of questions over and over. An answer is
+stored under its normalized question text together with the fingerprint of
+the MCP server's dataset versions (`catalog://versions`) it was computed
+against. A later question is answered from the cache, without any LLM call,
+when it is the same after normalization or a near-duplicate of a cached one
+(character-trigram Jaccard similarity of at least `ANSWER_CACHE_SIMILARITY`,
+with exactly the same words once stopwords are dropped), and the datasets
+have not changed since. Near-duplicates thus differ only in filler words,
+word order and punctuation; "not", "top 5" or "above" always count.
+
+Configuration (environment):
+    ANSWER_CACHE_ENABLED        "true" (default) or "false"
+    ANSWER_CACHE_BACKEND        "memory" (default, per process) or "sqlite" (shared by the
+                                workers of a host and kept across restarts)
+    ANSWER_CACHE_PATH           SQLite database file
+    ANSWER_CACHE_SIZE           entries kept, least recently used evicted first (default 512)
+    ANSWER_CACHE_TTL            seconds an answer is served for (default 600)
+    ANSWER_CACHE_SIMILARITY     near-duplicate threshold in (0, 1]; 1 only serves exact matches
+    ANSWER_CACHE_CATALOG_CHECK_INTERVAL
+                                seconds between reads of the dataset versions (default 5)
+"""
+import asyncio
+import collections
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pydantic import AnyUrl
+from typing import Dict, FrozenSet, Iterator, List, Optional, Set
+
+from src.agent_.utils import MCPServerPool
+from src.observability.metrics import register_stats
+
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_BACKEND = os.getenv("ANSWER_CACHE_BACKEND", "memory")
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", os.path.join(tempfile.gettempdir(), "answer_cache.sqlite3"))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "600"))
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.9"))
+# Matches the MCP server's CATALOG_REFRESH_INTERVAL: checking more often cannot see changes sooner
+ANSWER_CACHE_CATALOG_CHECK_INTERVAL = float(os.getenv("ANSWER_CACHE_CATALOG_CHECK_INTERVAL", "5"))
+
+CATALOG_VERSIONS_URI = "catalog://versions"
+
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+# Symbols that change what a question asks become words before punctuation is dropped:
+# "salary > 50000" and "salary < 50000", or "above -5" and "above 5", must not share a key
+_OPERATOR_WORDS = {
+    ">=": "ge", "=>": "ge", "\u2265": "ge", "<=": "le", "=<": "le", "\u2264": "le",
+    "!=": "ne", "<>": "ne", "\u2260": "ne", "==": "eq", "=": "eq", ">": "gt", "<": "lt", "%": "percent",
+}
+_OPERATOR = re.compile("|".join(map(re.escape, sorted(_OPERATOR_WORDS, key=len, reverse=True))))
+# A minus sign, not a hyphen inside a word, date or range
+_NEGATIVE = re.compile(r"(?<![\w.])-(?=\d)")
+# Words that do not change what a question asks. Negations, comparisons and quantities
+# ("not", "without", "more", "top", "first", numbers) are deliberately left out.
+_STOPWORDS = frozenset({
+    "a", "an", "the", "of", "in", "on", "at", "for", "to", "from", "by", "with", "and",
+    "is", "are", "was", "were", "be", "do", "does", "did", "there", "it", "its", "this", "that",
+    "what", "which", "who", "whom", "how", "me", "us", "i", "we", "you", "please", "can", "could",
+    "would", "show", "tell", "give", "list", "find", "get", "display", "return", "all",
+})
+
+logger = logging.getLogger(__name__)
+
+
+def normalize(question: str) -> str:
+    """Case, punctuation and whitespace insensitive form of a question; comparison operators and signs are kept as words."""
+    text = _NEGATIVE.sub(" neg ", question.casefold())
+    text = _OPERATOR.sub(lambda match: f" {_OPERATOR_WORDS[match.group()]} ", text)
+    return " ".join(_PUNCTUATION.sub(" ", text).split())
+
+
+def question_key(question: str) -> str:
+    """
+    Case and whitespace insensitive form of a question that keeps every other character:
+    questions with the same key are the same question, so they can share one run.
+    """
+    return " ".join(question.casefold().split())
+
+
+def trigrams(text: str) -> FrozenSet[str]:
+    padded = f" {text} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def content_words(text: str) -> FrozenSet[str]:
+    """Words of a normalized question that matter: near-duplicates must have the same ones."""
+    return frozenset(word for word in text.split() if word not in _STOPWORDS)
+
+
+@dataclass
+class CachedAnswer:
+    answer: str
+    catalog_version: str
+    expires_at: float
+
+
+class MemoryAnswerBackend:
+    """Per-process LRU store."""
+
+    def __init__(self, max_size: int = ANSWER_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: OrderedDict[str, CachedAnswer] = OrderedDict()
+
+    def get(self, key: str) -> Optional[CachedAnswer]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, entry: CachedAnswer) -> List[str]:
+        """Store an entry; returns the keys evicted to make room."""
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        evicted = []
+        while len(self._entries) > self.max_size:
+            evicted.append(self._entries.popitem(last=False)[0])
+        return evicted
+
+    def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    def keys(self) -> Iterator[str]:
+        return iter(list(self._entries))
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteAnswerBackend:
+    """
+    LRU store in a SQLite file, shared by the processes of a host and kept across restarts.
+
+    Exact matches see every process's answers; the near-duplicate index of
+    each process only covers the answers it stored or found at startup.
+    """
+
+    def __init__(self, path: str = ANSWER_CACHE_PATH, max_size: int = ANSWER_CACHE_SIZE):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            "key TEXT PRIMARY KEY, answer TEXT NOT NULL, catalog_version TEXT NOT NULL, "
+            "expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS answers_last_used ON answers (last_used)")
+
+    def get(self, key: str) -> Optional[CachedAnswer]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT answer, catalog_version, expires_at FROM answers WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                self._db.execute("UPDATE answers SET last_used = ? WHERE key = ?", (time.time(), key))
+        return CachedAnswer(*row) if row is not None else None
+
+    def put(self, key: str, entry: CachedAnswer) -> List[str]:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?)",
+                (key, entry.answer, entry.catalog_version, entry.expires_at, time.time()),
+            )
+            (count,) = self._db.execute("SELECT COUNT(*) FROM answers").fetchone()
+            evicted = [
+                row[0] for row in self._db.execute(
+                    "SELECT key FROM answers ORDER BY last_used LIMIT ?", (max(0, count - self.max_size),)
+                )
+            ]
+            self._db.executemany("DELETE FROM answers WHERE key = ?", [(k,) for k in evicted])
+        return evicted
+
+    def delete(self, key: str):
+        with self._lock:
+            self._db.execute("DELETE FROM answers WHERE key = ?", (key,))
+
+    def keys(self) -> Iterator[str]:
+        with self._lock:
+            return iter([row[0] for row in self._db.execute("SELECT key FROM answers")])
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM answers")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+
+
+class AnswerCache:
+    """
+    Answers keyed on the normalized question, with a trigram index for near-duplicates.
+
+    Entries are dropped when looked up after their TTL or against a different
+    catalog version, and evicted least recently used first by the backend.
+    """
+
+    def __init__(self, backend, ttl: float = ANSWER_CACHE_TTL, similarity: float = ANSWER_CACHE_SIMILARITY):
+        self.backend = backend
+        self.ttl = ttl
+        self.similarity = similarity
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._grams: Dict[str, FrozenSet[str]] = {}
+        self._postings: Dict[str, Set[str]] = collections.defaultdict(set)
+        for key in backend.keys():
+            self._index(key)
+
+    def _index(self, key: str):
+        if key in self._grams:
+            return
+        grams = self._grams[key] = trigrams(key)
+        for gram in grams:
+            self._postings[gram].add(key)
+
+    def _unindex(self, key: str):
+        for gram in self._grams.pop(key, ()):
+            keys = self._postings[gram]
+            keys.discard(key)
+            if not keys:
+                del self._postings[gram]
+
+    def _remove(self, key: str):
+        self.backend.delete(key)
+        self._unindex(key)
+
+    def nearest(self, key: str) -> Optional[str]:
+        """The most similar indexed question at or above the threshold, if any."""
+        if self.similarity >= 1:
+            return None
+        grams, words = trigrams(key), content_words(key)
+        overlaps = collections.Counter(other for gram in grams for other in self._postings.get(gram, ()))
+        best, best_score = None, self.similarity
+        for other, overlap in overlaps.items():
+            score = overlap / (len(grams) + len(self._grams[other]) - overlap)
+            if score >= best_score and content_words(other) == words:
+                best, best_score = other, score
+        return best
+
+    def lookup(self, question: str, catalog_version: str) -> Optional[str]:
+        key = normalize(question)
+        match, entry = key, self.backend.get(key)
+        if entry is None and (near := self.nearest(key)) is not None:
+            match, entry = near, self.backend.get(near)
+        if entry is not None and (entry.expires_at < time.time() or entry.catalog_version != catalog_version):
+            self._remove(match)
+            self.invalidations += 1
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if match != key:
+            self.near_hits += 1
+            logger.debug("Answering %r with the cached answer to %r", key, match)
+        return entry.answer
+
+    def store(self, question: str, answer: str, catalog_version: str):
+        if self.backend.max_size <= 0:
+            return
+        key = normalize(question)
+        for evicted in self.backend.put(key, CachedAnswer(answer, catalog_version, time.time() + self.ttl)):
+            self._unindex(evicted)
+        self._index(key)
+
+    def clear(self):
+        self.backend.clear()
+        self._grams.clear()
+        self._postings.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.backend),
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def fingerprint(versions: dict) -> str:
+    """Short hash of a `catalog://versions` document."""
+    return hashlib.sha256(json.dumps(versions, sort_keys=True).encode()).hexdigest()[:16]
+
+
+class CatalogVersion:
+    """
+    Fingerprint of the dataset versions reported by the MCP server, re-read at
+    most every `check_interval` seconds. None while the server cannot be asked,
+    in which case the answer cache is bypassed.
+    """
+
+    def __init__(self, check_interval: float = ANSWER_CACHE_CATALOG_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._version: Optional[str] = None
+        self._checked_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    def _is_fresh(self) -> bool:
+        return self._checked_at is not None and time.monotonic() - self._checked_at < self.check_interval
+
+    async def get(self, mcp_server_pool: MCPServerPool) -> Optional[str]:
+        if self._is_fresh():
+            return self._version
+        async with self._lock:
+            if self._is_fresh():
+                return self._version
+            try:
+                async with mcp_server_pool.acquire() as mcp_server:
+                    result = await mcp_server.session.read_resource(AnyUrl(CATALOG_VERSIONS_URI))
+                version = fingerprint(json.loads(result.contents[0].text))
+            except Exception as e:
+                logger.warning("Could not read the dataset versions, bypassing the answer cache: %s", e)
+                version = None
+            if version != self._version and self._version is not None:
+                logger.info("Dataset versions changed (%s -> %s)", self._version, version)
+            self._version, self._checked_at = version, time.monotonic()
+            return version
+
+
+def create_answer_cache(backend: str = ANSWER_CACHE_BACKEND) -> AnswerCache:
+    if backend == "sqlite":
+        return AnswerCache(SQLiteAnswerBackend())
+    if backend == "memory":
+        return AnswerCache(MemoryAnswerBackend())
+    raise ValueError(f"Unknown ANSWER_CACHE_BACKEND '{backend}', expected 'memory' or 'sqlite'")
+
+
+answer_cache = create_answer_cache()
+catalog_version = CatalogVersion()
+register_stats("answer_cache", answer_cache.stats)
@@ -1,11 +1,33 @@
-from agents import Agent, Runner, set_tracing_disabled
+import asyncio
+from agents import Agent, Runner, RunContextWrapper, handoff
 from agents.extensions.handoff_prompt import RECOMMENDED_PROMPT_PREFIX
+from agents.mcp import MCPServer
+from agents.stream_events import StreamEvent
+from dataclasses import dataclass
+from openai.types.responses import ResponseTextDeltaEvent
 from textwrap import dedent
-from src.agent_.utils import get_mcp_server, get_mcp_config
+from src.agent_.answer_cache import ANSWER_CACHE_ENABLED, answer_cache, catalog_version, question_key
+from src.agent_.schema_digest import SCHEMA_DIGEST_ENABLED, schema_digest
+from src.agent_.single_flight import in_flight_answers
+from src.agent_.utils import MCP_POOL_SIZE, MCPServerPool, get_mcp_config
+from src.llm.admission import BATCH, INTERACTIVE, AdmissionTicket, admitted_as
 from src.llm.model import get_model
-from src.guardrails.input_guardrails import input_guardrail_check
+from src.guardrails.input_guardrails import check_input, raise_for_tripwire
+from src.observability import agent_tracing
+from src.observability.tracing import current_span
+from typing import AsyncIterator, List, Optional, Tuple, Union
+import os
 
-set_tracing_disabled(True)
+# SDK spans feed the local traces and the metrics; nothing is uploaded to OpenAI
+agent_tracing.install()
+
+MCP_ALLOWED_TOOL_NAMES = ["code_executor", "get_file_context"]
+
+STREAM_TOOL_OUTPUT_PREVIEW_CHARS = int(os.getenv("STREAM_TOOL_OUTPUT_PREVIEW_CHARS", "2000"))
+
+# Questions of a /chat/batch request answered at once; more would only queue for an MCP session
+CHAT_BATCH_CONCURRENCY = int(os.getenv("CHAT_BATCH_CONCURRENCY", str(MCP_POOL_SIZE)))
+CHAT_BATCH_MAX_QUESTIONS = int(os.getenv("CHAT_BATCH_MAX_QUESTIONS", "100"))
 
 intake_agent = Agent(
     name = "User Intake Agent",
@@ -16,13 +38,11 @@ intake_agent = Agent(
         If user question is inappropriate, politely decline to answer.
         Otherwise, hand over the conversation to the appropriate agent.
     """),
-    model = get_model(),
-    input_guardrails=[input_guardrail_check]
+    # The input guardrail is run by `run()`, concurrently with this agent's first turn
+    model = get_model()
 )
 
-data_analyst_agent = Agent(
-    name = "Python and Polars Data Analyst Agent",
-    instructions = dedent("""
+ANALYST_INSTRUCTIONS = dedent("""
         
         A helpful agent that receives questions in natural language from users about datasets,
         generates syntactically correct, secure Python code using the Polars framework, and executes it
@@ -31,7 +51,7 @@ data_analyst_agent = Agent(
         Create a plan for your actions to achieve the desired results.
         You will:
             - Analyze the user query;
-            - Use the provided tool to find the relevant file and get its column names (get_file_context)
+            - Find the relevant file and its column names in the datasets listed below, or with the provided tool (get_file_context)
             - With the file name and column names, generate polars code;
             - Execute the generated code using provided tool (code_executor) and return the result
             - Use the result to answer the user query
@@ -40,8 +60,10 @@ data_analyst_agent = Agent(
         
         ## Instructions
                           
-        Use the provided get_file_context tool from MCP server to find the right file
-        and get info on the columns that are part of it.
+        If the file and columns you need are listed under "# Datasets" at the end of these
+        instructions, use them directly and go to the second step. Otherwise, use the provided
+        get_file_context tool from MCP server to find the right file and get info on the columns
+        that are part of it.
 
         With the result from get_file_context, you will receive a list of files and respective
         columns. Use this information for the next step.
@@ -72,18 +94,261 @@ data_analyst_agent = Agent(
         # Third step: Code Execution
 
         Execute the generated code using the provided tool (code_executor) and return the result
-    """),
+""")
+
+SCHEMA_DIGEST_INSTRUCTIONS = dedent("""
+
+    # Datasets
+
+    Every dataset with its row count and columns (name: dtype). Use these paths and column names as they are.
+""")
+
+
+@dataclass
+class AnalysisContext:
+    """Per-run context of the agents."""
+    schema_digest: Optional[str] = None
+
+
+def analyst_instructions(ctx: RunContextWrapper[AnalysisContext], agent: Agent) -> str:
+    """The analyst's instructions, with the dataset schema digest of the run appended when there is one."""
+    digest = ctx.context.schema_digest if ctx.context is not None else None
+    if not digest:
+        return ANALYST_INSTRUCTIONS
+    return f"{ANALYST_INSTRUCTIONS}{SCHEMA_DIGEST_INSTRUCTIONS}{digest}\n"
+
+
+data_analyst_agent = Agent(
+    name = "Python and Polars Data Analyst Agent",
+    instructions = analyst_instructions,
     model = get_model(),
     mcp_config = get_mcp_config()
 )
 
-async def run(question: str):
+def build_agent_graph(mcp_server: MCPServer, guardrail: Optional[asyncio.Future] = None) -> Agent:
+    """
+    Bind the module-level agents to an MCP server for a single run.
+
+    The agents above are templates and are never mutated: each request gets
+    shallow clones wired to its own MCP server, so concurrent runs cannot
+    see each other's handoffs or sessions.
+
+    If a pending guardrail verdict is given, the handoff to the analyst waits
+    for it, so no code is generated or executed before the question is cleared.
+    """
+    analyst = data_analyst_agent.clone(mcp_servers=[mcp_server])
+    if guardrail is None:
+        return intake_agent.clone(handoffs=[analyst])
+
+    async def wait_for_guardrail(ctx: RunContextWrapper):
+        raise_for_tripwire(await guardrail)
+
+    return intake_agent.clone(handoffs=[handoff(analyst, on_handoff=wait_for_guardrail)])
+
+
+async def cached_answer(question: str, mcp_server_pool: MCPServerPool) -> Tuple[Optional[str], Optional[str]]:
+    """
+    The cached answer to a question (or None), and the dataset version to store a
+    fresh answer under (None when answers cannot be cached right now).
+    """
+    if not ANSWER_CACHE_ENABLED:
+        return None, None
+    version = await catalog_version.get(mcp_server_pool)
+    cached = answer_cache.lookup(question, version) if version is not None else None
+    if (current := current_span()) is not None:
+        current.set_attributes(answer_cache="hit" if cached is not None else "miss")
+    return cached, version
+
+
+def store_answer(question: str, answer, version: Optional[str]):
+    if version is not None and isinstance(answer, str):
+        answer_cache.store(question, answer, version)
+
+
+async def answer(question: str, mcp_server_pool: MCPServerPool, priority: str = INTERACTIVE) -> str:
+    """
+    Final answer to a question: cached if it (or a near-duplicate) was answered over the
+    same datasets, else `run`. Concurrent calls with the same question (up to case and whitespace) share one run
+    (at the priority of the call that started it).
+    """
+    cached, version = await cached_answer(question, mcp_server_pool)
+    if cached is not None:
+        return cached
+
+    async def fresh_answer() -> str:
+        response = await run(question, mcp_server_pool, priority)
+        store_answer(question, response.final_output, version)
+        return response.final_output
+
+    return await in_flight_answers.do(question_key(question), fresh_answer)
+
+
+async def answer_batch(
+    questions: List[str], mcp_server_pool: MCPServerPool, concurrency: int = CHAT_BATCH_CONCURRENCY
+) -> List[Union[str, Exception]]:
+    """
+    Answers to many questions, in order, at most `concurrency` agent runs at a time,
+    with their LLM calls admitted after those of interactive requests.
+
+    Questions that differ only in case and whitespace are answered once. A failed
+    question does not fail the batch: its item is the exception instead.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded_answer(question: str) -> str:
+        async with semaphore:
+            return await answer(question, mcp_server_pool, BATCH)
+
+    unique = {}
+    for question in questions:
+        unique.setdefault(question_key(question), question)
+    outcomes = await asyncio.gather(*(bounded_answer(question) for question in unique.values()), return_exceptions=True)
+    by_key = dict(zip(unique, outcomes))
+    for outcome in outcomes:
+        # Cancellation is not a per-question failure
+        if isinstance(outcome, BaseException) and not isinstance(outcome, Exception):
+            raise outcome
+    return [by_key[question_key(question)] for question in questions]
+
+
+async def analysis_context(mcp_server_pool: MCPServerPool) -> AnalysisContext:
+    """Context of a run: the current schema digest, read before a session is taken for the run itself."""
+    digest = await schema_digest.get(mcp_server_pool) if SCHEMA_DIGEST_ENABLED else None
+    return AnalysisContext(schema_digest=digest)
+
+
+async def run(question: str, mcp_server_pool: MCPServerPool, priority: str = INTERACTIVE):
+
+    # The guardrail runs concurrently with the intake agent's first turn;
+    # if it trips, the agent run is cancelled wherever it got to.
+    # Both tasks make their LLM calls under the request's admission ticket.
+    ticket = AdmissionTicket.create(priority)
+    with admitted_as(ticket):
+        guardrail = asyncio.create_task(check_input(question))
+    agent_run = None
+    try:
+        context = await analysis_context(mcp_server_pool)
+        async with mcp_server_pool.acquire() as mcp_server:
+
+            starting_agent = build_agent_graph(mcp_server, guardrail)
+            with admitted_as(ticket):
+                agent_run = asyncio.create_task(Runner.run(
+                    starting_agent = starting_agent, input=question, context=context,
+                    run_config=agent_tracing.agent_run_config("chat"),
+                ))
+
+            await asyncio.wait({guardrail, agent_run}, return_when=asyncio.FIRST_COMPLETED)
+            if agent_run.done() and agent_run.exception() is not None and not guardrail.done():
+                raise agent_run.exception()
+            raise_for_tripwire(await guardrail)
+
+            response = await agent_run
+            return response
+    finally:
+        for task in (guardrail, agent_run):
+            if task is not None and not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+
+def _stream_event_payload(event: StreamEvent) -> Optional[dict]:
+    """Translate an SDK stream event into a client-facing `{"event", "data"}` payload, or None to drop it."""
+    if event.type == "raw_response_event":
+        if isinstance(event.data, ResponseTextDeltaEvent):
+            return {"event": "text_delta", "data": {"delta": event.data.delta}}
+        return None
+
+    if event.type == "agent_updated_stream_event":
+        return {"event": "agent_updated", "data": {"agent": event.new_agent.name}}
+
+    item = event.item
+    if event.name == "handoff_occured":
+        return {"event": "handoff", "data": {"from": item.source_agent.name, "to": item.target_agent.name}}
+    if event.name == "tool_called":
+        return {
+            "event": "tool_called",
+            "data": {
+                "agent": item.agent.name,
+                "tool": getattr(item.raw_item, "name", None),
+                "arguments": getattr(item.raw_item, "arguments", None),
+            },
+        }
+    if event.name == "tool_output":
+        output = str(item.output)
+        return {
+            "event": "tool_output",
+            "data": {
+                "agent": item.agent.name,
+                "output": output[:STREAM_TOOL_OUTPUT_PREVIEW_CHARS],
+                "truncated": len(output) > STREAM_TOOL_OUTPUT_PREVIEW_CHARS,
+            },
+        }
+    return None
+
+
+async def _until_tripwire(events: AsyncIterator[StreamEvent], guardrail: asyncio.Future) -> AsyncIterator[StreamEvent]:
+    """Relay stream events, raising as soon as the guardrail trips instead of at the next event."""
+    try:
+        while True:
+            next_event = asyncio.ensure_future(anext(events))
+            if not guardrail.done():
+                await asyncio.wait({next_event, guardrail}, return_when=asyncio.FIRST_COMPLETED)
+                if not next_event.done():
+                    try:
+                        raise_for_tripwire(guardrail.result())
+                    except BaseException:
+                        next_event.cancel()
+                        await asyncio.gather(next_event, return_exceptions=True)
+                        raise
+            try:
+                yield await next_event
+            except StopAsyncIteration:
+                return
+    finally:
+        await events.aclose()
+
+
+async def run_streamed(question: str, mcp_server_pool: MCPServerPool) -> AsyncIterator[dict]:
+    """
+    Streaming variant of `run`: yields handoff, tool and text-delta payloads as they
+    happen, then a final `final_output` payload.
+
+    Closing the generator (e.g. when the client disconnects) cancels the agent run
+    and the guardrail check. A cached answer is sent as the only payload, with
+    `"cached": true`.
+    """
+    cached, version = await cached_answer(question, mcp_server_pool)
+    if cached is not None:
+        yield {"event": "final_output", "data": {"output": cached, "cached": True}}
+        return
 
-    async with get_mcp_server(allowed_tool_names=["code_executor", "get_file_context"]) as mcp_server:
+    ticket = AdmissionTicket.create(INTERACTIVE)
+    with admitted_as(ticket):
+        guardrail = asyncio.create_task(check_input(question))
+    result = None
+    try:
+        context = await analysis_context(mcp_server_pool)
+        async with mcp_server_pool.acquire() as mcp_server:
 
-        intake_agent.handoffs = [data_analyst_agent]
-        data_analyst_agent.mcp_servers = [mcp_server]
+            starting_agent = build_agent_graph(mcp_server, guardrail)
+            # The streamed run starts its task here, under the ticket
+            with admitted_as(ticket):
+                result = Runner.run_streamed(
+                    starting_agent = starting_agent, input=question, context=context,
+                    run_config=agent_tracing.agent_run_config("chat"),
+                )
 
-        response = await Runner.run(starting_agent = intake_agent, input=question)
-        return response
+            async for event in _until_tripwire(result.stream_events(), guardrail):
+                payload = _stream_event_payload(event)
+                if payload is not None:
+                    yield payload
+            raise_for_tripwire(await guardrail)
 
+            store_answer(question, result.final_output, version)
+            yield {"event": "final_output", "data": {"output": result.final_output}}
+    finally:
+        if result is not None:
+            result.cancel()
+        if not guardrail.done():
+            guardrail.cancel()
+            await asyncio.gather(guardrail, return_exceptions=True)
@@ -0,0 +1,116 @@
+"""
+Schema digest of the MCP server's datasets, for the data analyst's instructions.
+
+Without it the analyst's first move on every question is a `get_file_context`
+call: one more LLM turn (tool call, wait, read the result) before any code is
+written. The digest lists every dataset's path, row count and column dtypes
+in a few compact lines. It is read from the server's `catalog://schema`
+resource at startup and again only when the dataset versions change (checked
+through the answer cache's `CatalogVersion`), and added to the analyst's
+instructions for each run. The analyst still calls `get_file_context` for
+files the digest does not list.
+
+Configuration (environment):
+    SCHEMA_DIGEST_ENABLED       "true" (default) or "false"
+    SCHEMA_DIGEST_MAX_CHARS     size cap of the digest; datasets past it are left to
+                                get_file_context (default 4000, about 1000 tokens)
+"""
+import asyncio
+import json
+import logging
+import os
+from pydantic import AnyUrl
+from typing import List, Optional
+
+from src.agent_.answer_cache import CatalogVersion, catalog_version, fingerprint
+from src.agent_.utils import MCPServerPool
+from src.observability.metrics import register_stats
+
+
+SCHEMA_DIGEST_ENABLED = os.getenv("SCHEMA_DIGEST_ENABLED", "true").lower() == "true"
+SCHEMA_DIGEST_MAX_CHARS = int(os.getenv("SCHEMA_DIGEST_MAX_CHARS", "4000"))
+
+CATALOG_SCHEMA_URI = "catalog://schema"
+
+logger = logging.getLogger(__name__)
+
+
+def approximate_tokens(text: str) -> int:
+    """Rough token count (4 characters per token), enough to size prompt overhead."""
+    return (len(text) + 3) // 4
+
+
+def format_digest(schema: dict, max_chars: int = SCHEMA_DIGEST_MAX_CHARS) -> str:
+    """One line per dataset, `path (rows): column: dtype, ...`, cut at `max_chars`."""
+    lines: List[str] = []
+    datasets = schema.get("datasets", [])
+    size = 0
+    for dataset in datasets:
+        columns = ", ".join(f"{name}: {dtype}" for name, dtype in dataset["dtypes"].items())
+        rows = f" ({dataset['rows']} rows)" if dataset.get("rows") is not None else ""
+        line = f"- {dataset['path']}{rows}: {columns}"
+        if size + len(line) + 1 > max_chars:
+            lines.append(f"- ... {len(datasets) - len(lines)} more datasets, use get_file_context to see them")
+            break
+        lines.append(line)
+        size += len(line) + 1
+    return "\n".join(lines)
+
+
+class SchemaDigest:
+    """
+    The current digest text, rebuilt when the catalog version changes. None when
+    the server cannot be asked, in which case the analyst falls back to the tool.
+    """
+
+    def __init__(self, versions: CatalogVersion = catalog_version, max_chars: int = SCHEMA_DIGEST_MAX_CHARS):
+        self.versions = versions
+        self.max_chars = max_chars
+        self.text: Optional[str] = None
+        self.version: Optional[str] = None
+        self.refreshes = 0
+        self.failures = 0
+        self._lock = asyncio.Lock()
+
+    async def get(self, mcp_server_pool: MCPServerPool) -> Optional[str]:
+        version = await self.versions.get(mcp_server_pool)
+        if version is None:
+            return None
+        if version == self.version:
+            return self.text
+        async with self._lock:
+            if version != self.version:
+                await self._refresh(mcp_server_pool)
+        return self.text
+
+    async def _refresh(self, mcp_server_pool: MCPServerPool):
+        try:
+            async with mcp_server_pool.acquire() as mcp_server:
+                result = await mcp_server.session.read_resource(AnyUrl(CATALOG_SCHEMA_URI))
+            schema = json.loads(result.contents[0].text)
+        except Exception as e:
+            logger.warning("Could not read the dataset schema, the analyst will call get_file_context: %s", e)
+            self.failures += 1
+            self.text = self.version = None
+            return
+        # Versioned by what the digest was built from, which may be newer than the version checked
+        self.text = format_digest(schema, self.max_chars) or None
+        self.version = fingerprint(schema.get("versions", {}))
+        self.refreshes += 1
+        logger.info("Schema digest %s: %s datasets, ~%s tokens", self.version, len(schema.get("datasets", [])), self.tokens)
+
+    @property
+    def tokens(self) -> int:
+        return approximate_tokens(self.text) if self.text else 0
+
+    def stats(self) -> dict:
+        return {
+            "chars": len(self.text) if self.text else 0,
+            "tokens": self.tokens,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+        }
+
+
+schema_digest = SchemaDigest()
+register_stats("schema_digest", schema_digest.stats)
@@ -0,0 +1,94 @@
+"""
+Single-flight coalescing of concurrent identical questions.
+
+Dashboards open in several tabs ask the same question at the same moment.
+The first caller of a key starts the work in its own task; callers that
+arrive while it is in flight wait on that task instead of starting another
+agent run. Waiters are shielded from each other: a caller that goes away
+(client disconnect) only cancels the shared run when it was the last one
+waiting for it.
+"""
+import asyncio
+import logging
+import os
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, TypeVar
+
+from src.observability.metrics import register_stats
+from src.observability.tracing import current_span
+
+
+COALESCE_ENABLED = os.getenv("COALESCE_ENABLED", "true").lower() == "true"
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Call:
+    task: asyncio.Task
+    waiters: int = 0
+
+
+class SingleFlight:
+    """At most one in-flight run per key; concurrent callers of a key share its outcome."""
+
+    def __init__(self, enabled: bool = COALESCE_ENABLED):
+        self.enabled = enabled
+        self.leaders = 0
+        self.followers = 0
+        self.cancelled = 0
+        self._calls: Dict[str, _Call] = {}
+
+    def _forget(self, key: str, call: _Call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def _finished(self, key: str, call: _Call, task: asyncio.Task):
+        self._forget(key, call)
+        # Mark the outcome as retrieved: when every waiter has gone, nobody else will
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Await `fn()`, or the run of it already in flight under `key`."""
+        if not self.enabled:
+            return await fn()
+
+        call = self._calls.get(key)
+        if call is None:
+            call = self._calls[key] = _Call(asyncio.create_task(fn()))
+            call.task.add_done_callback(lambda task: self._finished(key, call, task))
+            self.leaders += 1
+        else:
+            self.followers += 1
+            logger.debug("Joining the in-flight run for %r", key)
+        if (current := current_span()) is not None:
+            current.set_attributes(coalesced=call.waiters > 0)
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # The last waiter left: later callers start afresh instead of joining a cancelled run
+                self._forget(key, call)
+                call.task.cancel()
+                self.cancelled += 1
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight(),
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "cancelled": self.cancelled,
+        }
+
+
+in_flight_answers = SingleFlight()
+register_stats("single_flight", in_flight_answers.stats)
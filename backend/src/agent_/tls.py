@@ -0,0 +1,231 @@
+"""
+TLS settings and shared HTTP transport for calls to internal services (MCP server behind nginx)
+"""
+import logging
+import os
+import ssl
+import threading
+import time
+import httpx
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+
+TLS_CERT_FILE = os.getenv("TLS_CERT_FILE", "/app/certs/agentic-app.crt")
+TLS_KEY_FILE = os.getenv("TLS_KEY_FILE", "/app/certs/agentic-app.key")
+TLS_CA_FILE = os.getenv("TLS_CA_FILE", "/app/certs/ca.crt")
+
+# Seconds between certificate mtime checks; 0 disables reloading
+TLS_RELOAD_INTERVAL = float(os.getenv("TLS_RELOAD_INTERVAL", "60"))
+
+INTERNAL_HOST_MARKERS = ("nginx-proxy", "mcp")
+
+logger = logging.getLogger(__name__)
+
+
+def is_internal_url(url: str) -> bool:
+    """Internal services are reached over mTLS; everything else uses the default trust store."""
+    return url.startswith("https://") and any(marker in url for marker in INTERNAL_HOST_MARKERS)
+
+
+class SSLContextProvider:
+    """
+    Builds the client-side mTLS context once and hands out the cached instance.
+
+    Parsing the CA bundle and the client key pair is done only when the files
+    change: their mtimes are checked at most every `reload_interval` seconds,
+    so certificates can be rotated without restarting the process.
+    """
+
+    def __init__(
+        self,
+        cert_file: str = TLS_CERT_FILE,
+        key_file: str = TLS_KEY_FILE,
+        ca_file: str = TLS_CA_FILE,
+        reload_interval: float = TLS_RELOAD_INTERVAL,
+    ):
+        self.cert_file = cert_file
+        self.key_file = key_file
+        self.ca_file = ca_file
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._context: Optional[ssl.SSLContext] = None
+        self._mtimes: Optional[Tuple[Optional[float], ...]] = None
+        self._checked_at = 0.0
+
+    def _current_mtimes(self) -> Tuple[Optional[float], ...]:
+        mtimes = []
+        for path in (self.ca_file, self.cert_file, self.key_file):
+            try:
+                mtimes.append(os.stat(path).st_mtime)
+            except OSError:
+                mtimes.append(None)
+        return tuple(mtimes)
+
+    def _build(self) -> Optional[ssl.SSLContext]:
+        if not self.ca_file or not os.path.exists(self.ca_file):
+            logger.warning("CA file not found: %s, using default certificate verification", self.ca_file)
+            return None
+
+        # Create SSL context with CA verification
+        context = ssl.create_default_context(cafile=self.ca_file)
+
+        # Load client certificate and key if available
+        if self.cert_file and self.key_file and os.path.exists(self.cert_file) and os.path.exists(self.key_file):
+            try:
+                context.load_cert_chain(self.cert_file, self.key_file)
+            except Exception as e:
+                logger.warning("Failed to load client certificates: %s", e)
+        else:
+            logger.warning("Client certificates not found or incomplete: cert=%s, key=%s", self.cert_file, self.key_file)
+
+        # Set verification mode
+        context.check_hostname = False  # We're using container names in Docker
+        context.verify_mode = ssl.CERT_REQUIRED
+
+        logger.info("Built TLS context: cert=%s, key=%s, ca=%s", self.cert_file, self.key_file, self.ca_file)
+        return context
+
+    def get(self) -> Optional[ssl.SSLContext]:
+        """Return the cached context, rebuilding it first if the certificate files changed."""
+        if self._mtimes is not None and (
+            self.reload_interval <= 0 or time.monotonic() - self._checked_at < self.reload_interval
+        ):
+            return self._context
+
+        with self._lock:
+            self._checked_at = time.monotonic()
+            mtimes = self._current_mtimes()
+            if mtimes != self._mtimes:
+                if self._mtimes is not None:
+                    logger.info("TLS certificate files changed, reloading TLS context")
+                self._context = self._build()
+                self._mtimes = mtimes
+            return self._context
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """Response body that tells its pool when the response is closed."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, release: Callable[[], Awaitable[None]]):
+        self._stream = stream
+        self._release = release
+        self._released = False
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._released:
+                self._released = True
+                await self._release()
+
+
+class SharedAsyncTransport(httpx.AsyncBaseTransport):
+    """
+    One connection pool shared by many `httpx.AsyncClient`s.
+
+    Clients close their transport on exit, which would tear down the pool for
+    everybody else, so `aclose()` is a no-op and the pool is closed once at
+    shutdown through `shutdown()`. When the TLS context is rotated, new requests
+    go to a fresh pool; the superseded one is closed as soon as its last open
+    response is, and at the latest by `shutdown()`.
+    """
+
+    def __init__(self, ssl_context_provider: SSLContextProvider, **transport_kwargs):
+        self._ssl_context_provider = ssl_context_provider
+        self._transport_kwargs = transport_kwargs
+        self._context: Optional[ssl.SSLContext] = None
+        self._transport: Optional[httpx.AsyncHTTPTransport] = None
+        # Open responses per pool, and the pools replaced by a rotation that still have some
+        self._open: Dict[httpx.AsyncHTTPTransport, int] = {}
+        self._superseded: List[httpx.AsyncHTTPTransport] = []
+
+    def _current(self) -> httpx.AsyncHTTPTransport:
+        context = self._ssl_context_provider.get()
+        if self._transport is None or context is not self._context:
+            if self._transport is not None:
+                self._superseded.append(self._transport)
+            self._transport = httpx.AsyncHTTPTransport(
+                verify=context if context is not None else True,
+                **self._transport_kwargs,
+            )
+            self._context = context
+        return self._transport
+
+    async def _close_idle_superseded(self):
+        idle = [transport for transport in self._superseded if not self._open.get(transport)]
+        for transport in idle:
+            self._superseded.remove(transport)
+            self._open.pop(transport, None)
+            await transport.aclose()
+            logger.debug("Closed the connection pool of a rotated TLS context")
+
+    async def _release(self, transport: httpx.AsyncHTTPTransport):
+        self._open[transport] -= 1
+        if transport in self._superseded:
+            await self._close_idle_superseded()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        transport = self._current()
+        if self._superseded:
+            await self._close_idle_superseded()
+        self._open[transport] = self._open.get(transport, 0) + 1
+        try:
+            response = await transport.handle_async_request(request)
+        except BaseException:
+            await self._release(transport)
+            raise
+        response.stream = _ReleasingStream(response.stream, lambda: self._release(transport))
+        return response
+
+    async def aclose(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        transports = self._superseded + ([self._transport] if self._transport is not None else [])
+        self._transport, self._superseded = None, []
+        self._open.clear()
+        for transport in transports:
+            await transport.aclose()
+
+
+_ssl_context_provider = SSLContextProvider()
+_transports: Dict[str, SharedAsyncTransport] = {}
+
+
+def get_ssl_context_provider() -> SSLContextProvider:
+    return _ssl_context_provider
+
+
+def get_internal_transport() -> SharedAsyncTransport:
+    """Process-wide mTLS connection pool for internal services."""
+    if "internal" not in _transports:
+        _transports["internal"] = SharedAsyncTransport(_ssl_context_provider)
+    return _transports["internal"]
+
+
+def create_mcp_http_client(
+    headers: Optional[Dict[str, str]] = None,
+    timeout: Optional[httpx.Timeout] = None,
+    auth: Optional[httpx.Auth] = None,
+) -> httpx.AsyncClient:
+    """Drop-in for `mcp.shared._httpx_utils.create_mcp_http_client` backed by the shared mTLS pool."""
+    return httpx.AsyncClient(
+        transport=get_internal_transport(),
+        headers=headers,
+        timeout=timeout if timeout is not None else httpx.Timeout(30.0),
+        auth=auth,
+        follow_redirects=True,
+    )
+
+
+async def close_transports():
+    """Close every shared connection pool; call once at application shutdown."""
+    transports = list(_transports.values())
+    _transports.clear()
+    for transport in transports:
+        await transport.shutdown()
@@ -1,23 +1,74 @@
+import asyncio
+import logging
 import os
+import time
+from contextlib import asynccontextmanager
 from agents.mcp import MCPServerStreamableHttp, MCPServerStreamableHttpParams, create_static_tool_filter
 from agents.agent import MCPConfig
-from typing import List
+from mcp import types
+from mcp.client.streamable_http import streamablehttp_client
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+from src.agent_.tls import TLS_CA_FILE, TLS_CERT_FILE, TLS_KEY_FILE, create_mcp_http_client
+from src.observability.agent_tracing import current_traceparent
 
 
 MCP_SERVER_URL = os.getenv("MCP_SERVER_URL", "https://nginx-proxy/mcp")
-TLS_KEY_FILE = os.getenv("TLS_KEY_FILE", "/app/certs/agentic-app.key")
-TLS_CERT_FILE = os.getenv("TLS_CERT_FILE", "/app/certs/agentic-app.crt")
-TLS_CA_FILE = os.getenv("TLS_CA_FILE", "/app/certs/ca.crt")
+
+MCP_POOL_SIZE = int(os.getenv("MCP_POOL_SIZE", "4"))
+MCP_POOL_HEALTH_CHECK_INTERVAL = float(os.getenv("MCP_POOL_HEALTH_CHECK_INTERVAL", "30"))
+MCP_POOL_PING_TIMEOUT = float(os.getenv("MCP_POOL_PING_TIMEOUT", "5"))
+
+logger = logging.getLogger(__name__)
+
+
+class MTLSMCPServerStreamableHttp(MCPServerStreamableHttp):
+    """Streamable-HTTP MCP server whose HTTP clients use the shared mTLS connection pool."""
+
+    def create_streams(self):
+        return streamablehttp_client(
+            url=self.params["url"],
+            headers=self.params.get("headers", None),
+            timeout=self.params.get("timeout", 5),
+            sse_read_timeout=self.params.get("sse_read_timeout", 60 * 5),
+            terminate_on_close=self.params.get("terminate_on_close", True),
+            httpx_client_factory=create_mcp_http_client,
+        )
+
+    async def call_tool(self, tool_name: str, arguments: Optional[Dict[str, Any]]) -> types.CallToolResult:
+        """
+        Call a tool with the caller's trace context in the request's `_meta.traceparent`.
+
+        Sessions are pooled and their HTTP requests are sent from the session's
+        own background task, so a per-call HTTP header cannot carry it; the
+        JSON-RPC body passes through nginx unchanged.
+        """
+        traceparent = current_traceparent()
+        session = self.session
+        if traceparent is None or session is None:
+            return await super().call_tool(tool_name, arguments)
+
+        request = types.ClientRequest(types.CallToolRequest(
+            method="tools/call",
+            params=types.CallToolRequestParams(name=tool_name, arguments=arguments, _meta={"traceparent": traceparent}),
+        ))
+
+        async def call() -> types.CallToolResult:
+            result = await session.send_request(request, types.CallToolResult)
+            if not result.isError:
+                await session._validate_tool_result(tool_name, result)
+            return result
+
+        return await self._run_with_retries(call)
 
 
 def get_mcp_server(allowed_tool_names: List[str], url: str = MCP_SERVER_URL, timeout: int = 30) -> MCPServerStreamableHttp:
     
     static_tool_filter = create_static_tool_filter(allowed_tool_names=allowed_tool_names)
     
-    # The httpx_patch will handle TLS certificates automatically
+    # TLS certificates are handled by the shared mTLS transport
     params = MCPServerStreamableHttpParams(url=url, timeout=timeout)
     
-    mcp_server = MCPServerStreamableHttp(
+    mcp_server = MTLSMCPServerStreamableHttp(
         params = params,
         cache_tools_list=True,
         tool_filter=static_tool_filter
@@ -34,3 +85,133 @@ def get_mcp_config() -> MCPConfig:
         tls_enabled=True
     )
 
+
+class _PooledMCPServer:
+    """
+    A single connected MCP server owned by a background task.
+
+    The streamable-HTTP transport is built on anyio task groups, which must be
+    entered and exited from the same task. Each pooled connection therefore lives
+    in its own task for its whole lifetime, and `close()` just signals that task.
+    """
+
+    def __init__(self, server: MCPServerStreamableHttp):
+        self.server = server
+        self.last_checked = time.monotonic()
+        self._ready = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._error: Optional[BaseException] = None
+        self._task = asyncio.create_task(self._serve())
+
+    async def _serve(self):
+        try:
+            async with self.server:
+                self._ready.set()
+                await self._closing.wait()
+        except Exception as e:
+            self._error = e
+            logger.warning("MCP session ended: %s", e)
+        finally:
+            self._ready.set()
+
+    @property
+    def alive(self) -> bool:
+        return not self._task.done() and self.server.session is not None
+
+    async def wait_ready(self):
+        await self._ready.wait()
+        if not self.alive:
+            raise ConnectionError(f"MCP server connection failed: {self._error or 'session closed'}")
+
+    async def is_healthy(self, health_check_interval: float, ping_timeout: float) -> bool:
+        if not self._ready.is_set():
+            # Still connecting; `wait_ready` reports the outcome
+            return True
+        if not self.alive:
+            return False
+        if time.monotonic() - self.last_checked < health_check_interval:
+            return True
+        try:
+            await asyncio.wait_for(self.server.session.send_ping(), timeout=ping_timeout)
+        except Exception as e:
+            logger.warning("MCP session health check failed: %s", e)
+            return False
+        self.last_checked = time.monotonic()
+        return True
+
+    async def close(self):
+        self._closing.set()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+
+class MCPServerPool:
+    """
+    App-lifespan pool of connected `MCPServerStreamableHttp` sessions.
+
+    Sessions are opened once at startup, so steady-state requests skip the TLS
+    handshake, the MCP `initialize` round-trip and (thanks to `cache_tools_list`)
+    the `list_tools` call. MCP sessions multiplex requests, so a session can be
+    shared: `acquire()` hands out the least busy one. Idle sessions are pinged
+    before reuse and reconnected when they are found dead.
+    """
+
+    def __init__(
+        self,
+        allowed_tool_names: List[str],
+        size: int = MCP_POOL_SIZE,
+        url: str = MCP_SERVER_URL,
+        timeout: int = 30,
+        health_check_interval: float = MCP_POOL_HEALTH_CHECK_INTERVAL,
+        ping_timeout: float = MCP_POOL_PING_TIMEOUT,
+        server_factory: Optional[Callable[[], MCPServerStreamableHttp]] = None,
+    ):
+        if size < 1:
+            raise ValueError(f"MCP pool size must be at least 1, got {size}")
+        self.size = size
+        self.health_check_interval = health_check_interval
+        self.ping_timeout = ping_timeout
+        self._server_factory = server_factory or (
+            lambda: get_mcp_server(allowed_tool_names=allowed_tool_names, url=url, timeout=timeout)
+        )
+        self._slots: List[_PooledMCPServer] = []
+        self._slot_locks: List[asyncio.Lock] = []
+        self._in_flight: List[int] = []
+
+    async def start(self):
+        """Open all pooled sessions. Failed connections are retried lazily on `acquire()`."""
+        self._slots = [_PooledMCPServer(self._server_factory()) for _ in range(self.size)]
+        self._slot_locks = [asyncio.Lock() for _ in range(self.size)]
+        self._in_flight = [0] * self.size
+        results = await asyncio.gather(*(slot.wait_ready() for slot in self._slots), return_exceptions=True)
+        failed = [r for r in results if isinstance(r, BaseException)]
+        if failed:
+            logger.warning("%s/%s MCP sessions failed to connect at startup: %s", len(failed), self.size, failed[0])
+        logger.info("MCP server pool started with %s/%s sessions", self.size - len(failed), self.size)
+
+    async def close(self):
+        slots, self._slots = self._slots, []
+        await asyncio.gather(*(slot.close() for slot in slots))
+
+    async def _healthy_slot(self, index: int) -> _PooledMCPServer:
+        async with self._slot_locks[index]:
+            slot = self._slots[index]
+            if not await slot.is_healthy(self.health_check_interval, self.ping_timeout):
+                logger.info("Reconnecting MCP session in pool slot %s", index)
+                await slot.close()
+                slot = _PooledMCPServer(self._server_factory())
+                self._slots[index] = slot
+            await slot.wait_ready()
+            return slot
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[MCPServerStreamableHttp]:
+        """Borrow the least busy connected MCP server for the duration of a request."""
+        if not self._slots:
+            raise RuntimeError("MCP server pool is not started. Make sure you call `start()` first.")
+        index = min(range(len(self._slots)), key=self._in_flight.__getitem__)
+        self._in_flight[index] += 1
+        try:
+            slot = await self._healthy_slot(index)
+            yield slot.server
+        finally:
+            self._in_flight[index] -= 1
@@ -1,16 +1,86 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from src.agent_.data_analysis import (
+    answer, answer_batch, run_streamed, CHAT_BATCH_CONCURRENCY, CHAT_BATCH_MAX_QUESTIONS, MCP_ALLOWED_TOOL_NAMES
+)
+from src.agent_.schema_digest import SCHEMA_DIGEST_ENABLED, schema_digest
+from src.agent_.tls import close_transports
+from src.agent_.utils import MCPServerPool
+from src.api.streaming import SSE_HEADERS, error_data, sse_stream
+from src.llm.admission import AdmissionTimeout
+from src.llm.model import model_registry
+from src.observability.logs import configure_logging
+from src.observability.metrics import render_metrics
+from src.observability.middleware import TracingMiddleware
+from typing import List, Optional
 
-# Apply httpx patches before importing anything that uses httpx
-from src.agent_.httpx_patch import apply_patches
-apply_patches()
 
-from src.agent_.data_analysis import run
+configure_logging()
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One long-lived pool of MCP sessions shared by every /chat request
+    mcp_server_pool = MCPServerPool(allowed_tool_names=MCP_ALLOWED_TOOL_NAMES)
+    await mcp_server_pool.start()
+    app.state.mcp_server_pool = mcp_server_pool
+    if SCHEMA_DIGEST_ENABLED:
+        # Read once up front so the first questions already skip get_file_context
+        await schema_digest.get(mcp_server_pool)
+    try:
+        yield
+    finally:
+        await mcp_server_pool.close()
+        await model_registry.close()
+        await close_transports()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(TracingMiddleware)
+
+
+@app.exception_handler(AdmissionTimeout)
+async def admission_timeout_handler(request: Request, error: AdmissionTimeout):
+    # Overloaded rather than failed: clients may come back later
+    return JSONResponse(status_code=503, content={"detail": str(error)}, headers={"Retry-After": "5"})
 
 
 @app.post("/chat")
-async def chat_endpoint(question: str):
+async def chat_endpoint(question: str, request: Request):
+
+    return await answer(question, request.app.state.mcp_server_pool)
+
+
+class ChatBatchRequest(BaseModel):
+    questions: List[str] = Field(min_length=1, max_length=CHAT_BATCH_MAX_QUESTIONS)
+    # Agent runs at a time, capped at CHAT_BATCH_CONCURRENCY
+    concurrency: Optional[int] = Field(default=None, ge=1)
+
+
+@app.post("/chat/batch")
+async def chat_batch_endpoint(batch: ChatBatchRequest, request: Request):
+
+    concurrency = min(batch.concurrency or CHAT_BATCH_CONCURRENCY, CHAT_BATCH_CONCURRENCY)
+    outcomes = await answer_batch(batch.questions, request.app.state.mcp_server_pool, concurrency)
+    return {
+        "results": [
+            {"question": question, "error": error_data(outcome)} if isinstance(outcome, Exception)
+            else {"question": question, "answer": outcome}
+            for question, outcome in zip(batch.questions, outcomes)
+        ]
+    }
+
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(question: str, request: Request):
+
+    events = run_streamed(question, request.app.state.mcp_server_pool)
+    return StreamingResponse(sse_stream(events), media_type="text/event-stream", headers=SSE_HEADERS)
+
 
-    response = await run(question)
-    return response.final_output
\ No newline at end of file
+@app.get("/metrics")
+async def metrics_endpoint():
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
@@ -0,0 +1,98 @@
+import asyncio
+import json
+import logging
+import os
+from agents import InputGuardrailTripwireTriggered
+from typing import AsyncIterator, List
+
+
+# Max payloads buffered ahead of a slow client before the agent stream is paused
+STREAM_BUFFER_SIZE = int(os.getenv("STREAM_BUFFER_SIZE", "64"))
+# Seconds of silence (e.g. during code execution) before a keep-alive comment is sent
+STREAM_KEEPALIVE_INTERVAL = float(os.getenv("STREAM_KEEPALIVE_INTERVAL", "15"))
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    # Disable response buffering in nginx so events are flushed as they happen
+    "X-Accel-Buffering": "no",
+}
+
+_DONE = object()
+
+logger = logging.getLogger(__name__)
+
+
+def format_sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def error_data(error: Exception) -> dict:
+    """Client-facing description of a failed run (also used for the items of /chat/batch)."""
+    if isinstance(error, InputGuardrailTripwireTriggered):
+        return {"type": "guardrail_tripwire", "message": "Question rejected by input guardrail"}
+    return {"type": type(error).__name__, "message": str(error)}
+
+
+def _error_payload(error: Exception) -> dict:
+    return {"event": "error", "data": error_data(error)}
+
+
+def _coalesce(payloads: List[dict]) -> List[dict]:
+    """Merge runs of consecutive text deltas into one payload."""
+    merged: List[dict] = []
+    for payload in payloads:
+        if payload["event"] == "text_delta" and merged and merged[-1]["event"] == "text_delta":
+            merged[-1] = {"event": "text_delta", "data": {"delta": merged[-1]["data"]["delta"] + payload["data"]["delta"]}}
+        else:
+            merged.append(payload)
+    return merged
+
+
+async def sse_stream(payloads: AsyncIterator[dict]) -> AsyncIterator[str]:
+    """
+    Serve `{"event", "data"}` payloads as server-sent events.
+
+    A pump task reads the payloads into a bounded buffer. If the client reads
+    slower than the agent produces, the pump blocks on the full buffer, and
+    whatever piled up is sent as one frame with its text deltas merged. When
+    the response is torn down (client disconnect), the pump and the payload
+    generator are closed, which cancels the agent run behind it.
+    """
+    buffer: asyncio.Queue = asyncio.Queue(maxsize=STREAM_BUFFER_SIZE)
+
+    async def pump():
+        try:
+            async for payload in payloads:
+                await buffer.put(payload)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Streaming run failed: %s", e)
+            await buffer.put(_error_payload(e))
+        finally:
+            await payloads.aclose()
+        await buffer.put(_DONE)
+
+    pump_task = asyncio.create_task(pump())
+    try:
+        while True:
+            try:
+                first = await asyncio.wait_for(buffer.get(), timeout=STREAM_KEEPALIVE_INTERVAL)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+
+            pending = [first]
+            while not buffer.empty():
+                pending.append(buffer.get_nowait())
+
+            done = pending[-1] is _DONE
+            if done:
+                pending.pop()
+            if pending:
+                yield "".join(format_sse(p["event"], p["data"]) for p in _coalesce(pending))
+            if done:
+                return
+    finally:
+        pump_task.cancel()
+        await asyncio.gather(pump_task, return_exceptions=True)
@@ -1,17 +1,29 @@
 from src.llm.model import get_model
 from agents import (
     input_guardrail,
-    InputGuardrailResult,
     Agent,
     Runner,
     TResponseInputItem,
     GuardrailFunctionOutput,
+    InputGuardrailTripwireTriggered,
     RunContextWrapper
 )
+from agents.guardrail import InputGuardrailResult as GuardrailRunResult
+from collections import OrderedDict
 from pydantic import BaseModel
+from src.observability.agent_tracing import agent_run_config
+from src.observability.logs import preview
+from src.observability.metrics import register_stats
+from typing import Any, Optional, Tuple
 import logging
+import os
+import time
 
-logging.basicConfig(level=logging.DEBUG)
+
+logger = logging.getLogger(__name__)
+
+GUARDRAIL_CACHE_SIZE = int(os.getenv("GUARDRAIL_CACHE_SIZE", "1024"))
+GUARDRAIL_CACHE_TTL = float(os.getenv("GUARDRAIL_CACHE_TTL", "300"))
 
 class InputGuardrailResult(BaseModel):
     is_safe: bool
@@ -42,15 +54,90 @@ guardrail_agent = Agent(
     model = get_model()
 )
 
+class GuardrailVerdictCache:
+    """
+    Bounded, TTL'd LRU cache of guardrail verdicts keyed on the normalized question.
+
+    Dashboards ask the same questions over and over; a cache hit skips the
+    guardrail LLM round-trip entirely.
+    """
+
+    def __init__(self, max_size: int = GUARDRAIL_CACHE_SIZE, ttl: float = GUARDRAIL_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, Tuple[float, InputGuardrailResult]] = OrderedDict()
+
+    @staticmethod
+    def normalize(question: str) -> str:
+        return " ".join(question.casefold().split())
+
+    def get(self, question: str) -> Optional[InputGuardrailResult]:
+        key = self.normalize(question)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, question: str, verdict: InputGuardrailResult):
+        if self.max_size <= 0:
+            return
+        key = self.normalize(question)
+        self._entries[key] = (time.monotonic() + self.ttl, verdict)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+guardrail_cache = GuardrailVerdictCache()
+register_stats("guardrail_cache", guardrail_cache.stats)
+
+
+async def check_input(input: str | list[TResponseInputItem], context: Any = None) -> GuardrailFunctionOutput:
+    """Get the guardrail verdict for an input, from the cache when the question was seen recently."""
+    verdict = guardrail_cache.get(input) if isinstance(input, str) else None
+    if verdict is None:
+        result = await Runner.run(guardrail_agent, input, context=context, run_config=agent_run_config("guardrail"))
+        verdict = result.final_output
+        if isinstance(input, str):
+            guardrail_cache.put(input, verdict)
+    logger.debug("Guardrail check result: %s", preview(verdict))
+    return GuardrailFunctionOutput(
+        output_info=verdict,
+        tripwire_triggered=verdict.is_safe is False
+    )
+
+
 @input_guardrail
 async def input_guardrail_check(
     ctx: RunContextWrapper[None],
     agent: Agent,
     input: str | list[TResponseInputItem]
 ):
-    result = await Runner.run(guardrail_agent, input, context=ctx.context)
-    logging.info(f"[DEBUG] Guardrail check result: {result}")
-    return GuardrailFunctionOutput(
-        output_info=result.final_output,
-        tripwire_triggered=result.final_output.is_safe is False
-    )
\ No newline at end of file
+    return await check_input(input, context=ctx.context)
+
+
+def raise_for_tripwire(output: GuardrailFunctionOutput):
+    """Raise the same exception the SDK raises when `input_guardrail_check` trips."""
+    if output.tripwire_triggered:
+        raise InputGuardrailTripwireTriggered(
+            GuardrailRunResult(guardrail=input_guardrail_check, output=output)
+        )
\ No newline at end of file
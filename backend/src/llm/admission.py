@@ -0,0 +1,432 @@
+"""
+Admission control in front of the LLM endpoints.
+
+Every model call first gets admitted by its model's `ModelScheduler`, which
+holds the call until:
+
+    - the model's request and token budgets (token buckets refilled
+      continuously) have room for it; the tokens of a call are estimated from its
+      input and settled against the usage it reports,
+    - fewer than `max_in_flight` calls to the model are running, and
+    - no rate-limit backoff is in force (a 429 pauses the whole model, not
+      just the call that got it).
+
+Waiting calls are served interactive before batch, and by earliest deadline
+within a class. A call still waiting at its deadline fails with
+`AdmissionTimeout` instead of adding to the pile-up. Rate limits (429),
+connection errors and 5xx responses are retried with jittered exponential
+backoff (honouring `Retry-After`), each retry going through admission again.
+
+The class and deadline of the calls of a request are set with
+`admitted_as(AdmissionTicket.create(priority))` around the tasks that make them.
+
+Configuration (environment):
+    LLM_ADMISSION_ENABLED           "true" (default) or "false"
+    LLM_REQUESTS_PER_MINUTE         request budget per model, 0 (default) = unlimited
+    LLM_TOKENS_PER_MINUTE           token budget per model, 0 (default) = unlimited
+    LLM_MAX_IN_FLIGHT               concurrent calls per model, 0 (default) = unlimited
+    LLM_BUDGET_BURST_SECONDS        seconds of a budget usable at once (default 1: providers
+                                    enforce per-minute limits over much shorter windows)
+    LLM_MODEL_BUDGETS               per-model overrides as JSON, e.g.
+                                    {"gpt-4.1": {"requests_per_minute": 500, "tokens_per_minute": 30000}}
+    LLM_ADMISSION_TIMEOUT           seconds an interactive request may wait for its calls (default 30)
+    LLM_BATCH_ADMISSION_TIMEOUT     same for batch requests (default 300)
+    LLM_RETRY_ATTEMPTS              retries per call (default 6)
+    LLM_RETRY_BASE_DELAY            first backoff in seconds, doubled per retry (default 0.5)
+    LLM_RETRY_MAX_DELAY             backoff cap in seconds (default 20)
+"""
+import asyncio
+import contextlib
+import contextvars
+import heapq
+import itertools
+import json
+import logging
+import os
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+import openai
+from agents import Model, ModelResponse
+
+from src.observability.metrics import LLM_ADMISSION_WAIT_SECONDS, LLM_RETRIES, register_stats
+
+
+LLM_ADMISSION_ENABLED = os.getenv("LLM_ADMISSION_ENABLED", "true").lower() == "true"
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "0"))
+LLM_BUDGET_BURST_SECONDS = float(os.getenv("LLM_BUDGET_BURST_SECONDS", "1"))
+LLM_MODEL_BUDGETS = os.getenv("LLM_MODEL_BUDGETS", "")
+
+LLM_ADMISSION_TIMEOUT = float(os.getenv("LLM_ADMISSION_TIMEOUT", "30"))
+LLM_BATCH_ADMISSION_TIMEOUT = float(os.getenv("LLM_BATCH_ADMISSION_TIMEOUT", "300"))
+
+LLM_RETRY_ATTEMPTS = int(os.getenv("LLM_RETRY_ATTEMPTS", "6"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "20"))
+
+# Output tokens reserved for a call that does not set `max_tokens`, settled against its usage
+LLM_ADMISSION_OUTPUT_TOKENS = 256
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+# Lower is served first
+PRIORITIES = {INTERACTIVE: 0, BATCH: 1}
+ADMISSION_TIMEOUTS = {INTERACTIVE: LLM_ADMISSION_TIMEOUT, BATCH: LLM_BATCH_ADMISSION_TIMEOUT}
+
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionTimeout(Exception):
+    """An LLM call could not be admitted before its request's deadline."""
+
+    def __init__(self, model: str, waited: float):
+        super().__init__(f"LLM call to '{model}' not admitted after {waited:.1f}s, the service is overloaded")
+        self.model = model
+        self.waited = waited
+
+
+class TokenBucket:
+    """`per_minute` units refilled continuously, up to `burst_seconds` worth; <= 0 is unlimited. May go into debt."""
+
+    def __init__(self, per_minute: float, burst_seconds: float = LLM_BUDGET_BURST_SECONDS):
+        self.unlimited = per_minute <= 0
+        self.rate = per_minute / 60
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` can be taken (a call bigger than the bucket waits for a full one)."""
+        if self.unlimited:
+            return 0.0
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount: float, now: float):
+        if not self.unlimited:
+            self._refill(now)
+            self.level -= amount
+
+    def give_back(self, amount: float):
+        """Return (or, negative, charge) units after the real cost of a call is known."""
+        if not self.unlimited:
+            self._refill(time.monotonic())
+            self.level = min(self.capacity, self.level + amount)
+
+
+@dataclass(frozen=True)
+class AdmissionTicket:
+    """Class and deadline shared by the LLM calls of one request."""
+    priority: str
+    # time.monotonic() after which its calls are no longer admitted
+    deadline: float
+
+    @classmethod
+    def create(cls, priority: str = INTERACTIVE) -> "AdmissionTicket":
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown LLM priority '{priority}', expected one of {sorted(PRIORITIES)}")
+        return cls(priority, time.monotonic() + ADMISSION_TIMEOUTS[priority])
+
+
+_ticket: contextvars.ContextVar[Optional[AdmissionTicket]] = contextvars.ContextVar("llm_admission_ticket", default=None)
+
+
+@contextlib.contextmanager
+def admitted_as(ticket: AdmissionTicket) -> Iterator[AdmissionTicket]:
+    """LLM calls made by tasks created inside the block are admitted under `ticket`."""
+    token = _ticket.set(ticket)
+    try:
+        yield ticket
+    finally:
+        _ticket.reset(token)
+
+
+def current_ticket() -> AdmissionTicket:
+    return _ticket.get() or AdmissionTicket.create()
+
+
+@dataclass(order=True)
+class _Waiter:
+    rank: int
+    deadline: float
+    sequence: int
+    tokens: float = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    enqueued: float = field(compare=False)
+
+
+class ModelScheduler:
+    """Budgets, in-flight cap and priority/deadline queue of the calls to one model."""
+
+    def __init__(self, model: str, requests_per_minute: float = 0, tokens_per_minute: float = 0, max_in_flight: int = 0):
+        self.model = model
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.admitted = 0
+        self.timeouts = 0
+        self.retries = 0
+        self._queue: List[_Waiter] = []
+        self._sequence = itertools.count()
+        self._paused_until = 0.0
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def _blocked_for(self, tokens: float, now: float) -> float:
+        """Seconds until a call of `tokens` could start; inf while the in-flight cap is reached."""
+        if self.max_in_flight and self.in_flight >= self.max_in_flight:
+            return float("inf")
+        return max(self._paused_until - now, self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+
+    def _start(self, tokens: float, now: float):
+        self.requests.take(1, now)
+        self.tokens.take(tokens, now)
+        self.in_flight += 1
+        self.admitted += 1
+
+    async def admit(self, tokens: float, ticket: AdmissionTicket):
+        """Wait until a call of about `tokens` may start; call `release` when it ends."""
+        started = time.monotonic()
+        if not self._queue and self._blocked_for(tokens, started) == 0:
+            self._start(tokens, started)
+            LLM_ADMISSION_WAIT_SECONDS.labels(self.model, ticket.priority, "admitted").observe(0)
+            return
+
+        waiter = _Waiter(PRIORITIES[ticket.priority], ticket.deadline, next(self._sequence), tokens,
+                         asyncio.get_running_loop().create_future(), started)
+        heapq.heappush(self._queue, waiter)
+        self._dispatch()
+        try:
+            await waiter.future
+        except AdmissionTimeout:
+            self.timeouts += 1
+            LLM_ADMISSION_WAIT_SECONDS.labels(self.model, ticket.priority, "timeout").observe(time.monotonic() - started)
+            raise
+        except asyncio.CancelledError:
+            future = waiter.future
+            if future.done() and not future.cancelled() and future.exception() is None:
+                # Admitted just as the caller went away: hand the slot on
+                self.release()
+            else:
+                # Still queued, or timed out (and already dropped from the queue) just as the caller went away
+                if waiter in self._queue:
+                    self._queue.remove(waiter)
+                    heapq.heapify(self._queue)
+                self._dispatch()
+            raise
+        LLM_ADMISSION_WAIT_SECONDS.labels(self.model, ticket.priority, "admitted").observe(time.monotonic() - started)
+
+    def release(self):
+        self.in_flight -= 1
+        self._dispatch()
+
+    def pause(self, seconds: float):
+        """Hold every call to the model back for `seconds` (after a rate limit)."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _dispatch(self):
+        """Start the waiters that can start, expire the late ones, and wake up again when the next one could start."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        now = time.monotonic()
+
+        expired = [waiter for waiter in self._queue if waiter.deadline <= now]
+        if expired:
+            self._queue = [waiter for waiter in self._queue if waiter.deadline > now]
+            heapq.heapify(self._queue)
+            for waiter in expired:
+                if not waiter.future.done():
+                    waiter.future.set_exception(AdmissionTimeout(self.model, now - waiter.enqueued))
+
+        wake_in = float("inf")
+        while self._queue:
+            head = self._queue[0]
+            if head.future.done():
+                heapq.heappop(self._queue)
+                continue
+            wake_in = self._blocked_for(head.tokens, now)
+            if wake_in > 0:
+                break
+            heapq.heappop(self._queue)
+            self._start(head.tokens, now)
+            head.future.set_result(None)
+
+        if self._queue:
+            # A release also dispatches, so an in-flight cap alone needs no timer
+            wake_in = min(wake_in, min(waiter.deadline for waiter in self._queue) - now)
+            if wake_in != float("inf"):
+                self._timer = asyncio.get_running_loop().call_later(max(wake_in, 0.001), self._dispatch)
+
+    def queue_depth(self, priority: Optional[str] = None) -> int:
+        if priority is None:
+            return len(self._queue)
+        return sum(1 for waiter in self._queue if waiter.rank == PRIORITIES[priority])
+
+
+def estimate_tokens(system_instructions: Optional[str], input: Any, max_tokens: Optional[int]) -> int:
+    """Rough cost of a call (4 characters per token), settled against the usage it reports."""
+    text_chars = len(system_instructions or "") + len(input if isinstance(input, str) else json.dumps(input, default=str))
+    return text_chars // 4 + (max_tokens or LLM_ADMISSION_OUTPUT_TOKENS)
+
+
+def retry_after(error: Exception) -> float:
+    """Seconds the server asked to wait (`retry-after-ms`/`retry-after` headers), 0 if it did not say."""
+    response = getattr(error, "response", None)
+    headers = response.headers if response is not None else {}
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return 0.0
+
+
+def retry_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff, so retries of calls that failed together do not collide again."""
+    return random.uniform(0, min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * 2 ** (attempt - 1)))
+
+
+def _retry_reason(error: Exception) -> str:
+    if isinstance(error, openai.RateLimitError):
+        return "rate_limit"
+    if isinstance(error, openai.APIConnectionError):
+        return "connection"
+    return "server_error"
+
+
+class ScheduledModel(Model):
+    """A model whose calls go through its scheduler, with retries of retryable errors."""
+
+    def __init__(self, model: Model, name: str, scheduler: ModelScheduler):
+        self.model = model
+        self.name = name
+        self.scheduler = scheduler
+
+    async def _retry_or_raise(self, error: Exception, attempt: int, ticket: AdmissionTicket):
+        server_delay = retry_after(error)
+        delay = server_delay + retry_delay(attempt)
+        if attempt > LLM_RETRY_ATTEMPTS or time.monotonic() + delay >= ticket.deadline:
+            raise error
+        if isinstance(error, openai.RateLimitError):
+            # Everyone waits what the server asked for; the jitter is this call's own
+            self.scheduler.pause(server_delay)
+        reason = _retry_reason(error)
+        self.scheduler.retries += 1
+        LLM_RETRIES.labels(self.name, reason).inc()
+        logger.info("Retrying LLM call to '%s' in %.2fs (attempt %s, %s)", self.name, delay, attempt, reason)
+        await asyncio.sleep(delay)
+
+    def _settle(self, estimated: float, usage) -> None:
+        used = (getattr(usage, "input_tokens", 0) or 0) + (getattr(usage, "output_tokens", 0) or 0)
+        self.scheduler.tokens.give_back(estimated - used if used else 0)
+
+    async def get_response(self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing,
+                           *, previous_response_id=None, prompt=None) -> ModelResponse:
+        ticket = current_ticket()
+        tokens = estimate_tokens(system_instructions, input, model_settings.max_tokens)
+        for attempt in itertools.count(1):
+            await self.scheduler.admit(tokens, ticket)
+            error = None
+            try:
+                response = await self.model.get_response(
+                    system_instructions, input, model_settings, tools, output_schema, handoffs, tracing,
+                    previous_response_id=previous_response_id, prompt=prompt,
+                )
+            except RETRYABLE_ERRORS as e:
+                error = e
+            finally:
+                self.scheduler.release()
+            if error is None:
+                self._settle(tokens, response.usage)
+                return response
+            # A rejected or failed call used none of its budget
+            self.scheduler.tokens.give_back(tokens)
+            await self._retry_or_raise(error, attempt, ticket)
+
+    async def stream_response(self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing,
+                              *, previous_response_id=None, prompt=None) -> AsyncIterator[Any]:
+        """Streamed call; retried only if it failed before its first event."""
+        ticket = current_ticket()
+        tokens = estimate_tokens(system_instructions, input, model_settings.max_tokens)
+        for attempt in itertools.count(1):
+            await self.scheduler.admit(tokens, ticket)
+            error = usage = None
+            started = False
+            try:
+                async for event in self.model.stream_response(
+                    system_instructions, input, model_settings, tools, output_schema, handoffs, tracing,
+                    previous_response_id=previous_response_id, prompt=prompt,
+                ):
+                    started = True
+                    if getattr(event, "type", None) == "response.completed":
+                        usage = event.response.usage
+                    yield event
+            except RETRYABLE_ERRORS as e:
+                if started:
+                    raise
+                error = e
+            finally:
+                self.scheduler.release()
+            if error is None:
+                self._settle(tokens, usage)
+                return
+            self.scheduler.tokens.give_back(tokens)
+            await self._retry_or_raise(error, attempt, ticket)
+
+
+class AdmissionController:
+    """One scheduler per model name, with budgets from the environment."""
+
+    def __init__(self, budgets: Optional[Dict[str, dict]] = None):
+        self.budgets = dict(budgets or {})
+        self.schedulers: Dict[str, ModelScheduler] = {}
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        return cls(json.loads(LLM_MODEL_BUDGETS) if LLM_MODEL_BUDGETS else None)
+
+    def scheduler(self, model: str) -> ModelScheduler:
+        if model not in self.schedulers:
+            budget = {
+                "requests_per_minute": LLM_REQUESTS_PER_MINUTE,
+                "tokens_per_minute": LLM_TOKENS_PER_MINUTE,
+                "max_in_flight": LLM_MAX_IN_FLIGHT,
+                **self.budgets.get(model, {}),
+            }
+            logger.info("LLM admission budget for '%s': %s", model, budget)
+            self.schedulers[model] = ModelScheduler(model, **budget)
+        return self.schedulers[model]
+
+    def wrap(self, model: Model, name: str) -> ScheduledModel:
+        return ScheduledModel(model, name, self.scheduler(name))
+
+    def stats(self) -> dict:
+        schedulers = list(self.schedulers.values())
+        stats = {
+            "queue_depth": sum(scheduler.queue_depth() for scheduler in schedulers),
+            "in_flight": sum(scheduler.in_flight for scheduler in schedulers),
+            "admitted": sum(scheduler.admitted for scheduler in schedulers),
+            "timeouts": sum(scheduler.timeouts for scheduler in schedulers),
+            "retries": sum(scheduler.retries for scheduler in schedulers),
+        }
+        for priority in PRIORITIES:
+            stats[f"queue_depth_{priority}"] = sum(scheduler.queue_depth(priority) for scheduler in schedulers)
+        return stats
+
+
+admission_controller = AdmissionController.from_env()
+register_stats("llm_admission", admission_controller.stats)
@@ -1,18 +1,140 @@
-from openai import AsyncOpenAI
-from agents import OpenAIChatCompletionsModel
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+from agents import Model, OpenAIChatCompletionsModel
+from dataclasses import dataclass, field
+from src.agent_.tls import get_internal_transport, is_internal_url
+from src.llm.admission import LLM_ADMISSION_ENABLED, AdmissionController, admission_controller
+from src.observability.logs import preview
+from typing import Dict, Optional, Tuple
+import httpx
+import json
+import logging
 import os
 
 
-def get_model():
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4.1")
 
-    client = AsyncOpenAI(
-        base_url=os.getenv("OPENAI_API_ENDPOINT"),
-        api_key=os.getenv("OPENAI_API_KEY")
-    )
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "true").lower() == "true"
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30"))
 
-    model = OpenAIChatCompletionsModel(
-        model="gpt-4.1",
-        openai_client=client
-    )
+# Extra named endpoints as JSON, e.g.
+# {"local": {"base_url": "http://llm:8080/v1", "api_key_env": "LOCAL_LLM_KEY", "max_connections": 10}}
+LLM_ENDPOINTS = os.getenv("LLM_ENDPOINTS", "")
 
-    return model
\ No newline at end of file
+DEFAULT_ENDPOINT = "default"
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class LLMEndpoint:
+    """
+    An OpenAI-compatible endpoint and the connection pool settings used to reach it.
+
+    Every endpoint gets exactly one pool, so `max_connections` is the cap on
+    connections to that host.
+    """
+    base_url: Optional[str] = None
+    api_key: Optional[str] = field(default=None, repr=False)
+    http2: bool = LLM_HTTP2
+    max_connections: int = LLM_MAX_CONNECTIONS
+    max_keepalive_connections: int = LLM_MAX_KEEPALIVE_CONNECTIONS
+    keepalive_expiry: float = LLM_KEEPALIVE_EXPIRY
+
+    @classmethod
+    def from_config(cls, config: dict) -> "LLMEndpoint":
+        config = dict(config)
+        api_key_env = config.pop("api_key_env", None)
+        if api_key_env:
+            config["api_key"] = os.getenv(api_key_env)
+        return cls(**config)
+
+    def create_http_client(self) -> httpx.AsyncClient:
+        if self.base_url and is_internal_url(self.base_url):
+            # Internal endpoints (behind nginx) share the mTLS connection pool with the MCP clients
+            return DefaultAsyncHttpxClient(transport=get_internal_transport())
+        return DefaultAsyncHttpxClient(
+            http2=self.http2,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+        )
+
+
+class ModelRegistry:
+    """
+    Process-wide registry of OpenAI clients and models.
+
+    Clients are built once per named endpoint and models once per
+    (model, endpoint) pair, so all agents calling the same endpoint share one
+    pool of warm keep-alive connections. With an admission controller, models
+    are wrapped so their calls are scheduled and retried by it (the clients'
+    own retries are then turned off).
+    """
+
+    def __init__(self, endpoints: Optional[Dict[str, LLMEndpoint]] = None, admission: Optional[AdmissionController] = None):
+        self._endpoints: Dict[str, LLMEndpoint] = dict(endpoints or {})
+        self._clients: Dict[str, AsyncOpenAI] = {}
+        self._models: Dict[Tuple[str, str], Model] = {}
+        self.admission = admission
+
+    @classmethod
+    def from_env(cls) -> "ModelRegistry":
+        endpoints = {
+            DEFAULT_ENDPOINT: LLMEndpoint(
+                base_url=os.getenv("OPENAI_API_ENDPOINT"),
+                api_key=os.getenv("OPENAI_API_KEY"),
+            )
+        }
+        if LLM_ENDPOINTS:
+            for name, config in json.loads(LLM_ENDPOINTS).items():
+                endpoints[name] = LLMEndpoint.from_config(config)
+        return cls(endpoints, admission_controller if LLM_ADMISSION_ENABLED else None)
+
+    def register_endpoint(self, name: str, endpoint: LLMEndpoint):
+        if name in self._clients:
+            raise ValueError(f"Endpoint '{name}' already has a client and cannot be redefined")
+        self._endpoints[name] = endpoint
+
+    def get_client(self, endpoint: str = DEFAULT_ENDPOINT) -> AsyncOpenAI:
+        if endpoint not in self._clients:
+            if endpoint not in self._endpoints:
+                raise KeyError(f"Unknown LLM endpoint '{endpoint}', known endpoints: {sorted(self._endpoints)}")
+            config = self._endpoints[endpoint]
+            logger.info("Creating OpenAI client for endpoint '%s': %s", endpoint, preview(config))
+            retries = {"max_retries": 0} if self.admission is not None else {}
+            self._clients[endpoint] = AsyncOpenAI(
+                base_url=config.base_url,
+                api_key=config.api_key,
+                http_client=config.create_http_client(),
+                **retries,
+            )
+        return self._clients[endpoint]
+
+    def get_model(self, model: str = OPENAI_MODEL, endpoint: str = DEFAULT_ENDPOINT) -> Model:
+        key = (model, endpoint)
+        if key not in self._models:
+            chat_model = OpenAIChatCompletionsModel(
+                model=model,
+                openai_client=self.get_client(endpoint)
+            )
+            self._models[key] = chat_model if self.admission is None else self.admission.wrap(chat_model, model)
+        return self._models[key]
+
+    async def close(self):
+        clients = list(self._clients.values())
+        self._clients.clear()
+        self._models.clear()
+        for client in clients:
+            await client.close()
+
+
+model_registry = ModelRegistry.from_env()
+
+
+def get_model(model: str = OPENAI_MODEL, endpoint: str = DEFAULT_ENDPOINT) -> Model:
+
+    return model_registry.get_model(model, endpoint)
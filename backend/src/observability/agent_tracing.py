@@ -0,0 +1,149 @@
+"""
+Bridge from the Agents SDK's tracing to the backend's spans and metrics.
+
+The SDK already wraps every agent turn, LLM call, tool call, handoff and
+guardrail in a span. `AgentSpanProcessor` replaces the SDK's default
+processors (which upload traces to OpenAI) and turns those spans into local
+`Span`s in the trace of the current HTTP request, observing the LLM, tool
+and agent metrics on the way. Runs join the request's trace through
+`agent_run_config()`.
+"""
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from agents import RunConfig
+from agents.tracing import Span as AgentSpan, Trace, TracingProcessor, get_current_span, set_trace_processors
+
+from src.observability.metrics import (
+    AGENT_HANDOFFS,
+    AGENT_RUN_SECONDS,
+    LLM_REQUEST_SECONDS,
+    LLM_TOKENS,
+    TOOL_CALL_SECONDS,
+)
+from src.observability.tracing import Span, current_span, export_span
+
+
+_TRACE_PREFIX = "trace_"
+_SPAN_PREFIX = "span_"
+# Span data fields that hold prompts, completions or tool payloads; never exported
+_PAYLOAD_FIELDS = {"input", "output", "model_config", "result", "data"}
+
+logger = logging.getLogger(__name__)
+
+
+def _trace_id(agent_trace_id: str) -> str:
+    return agent_trace_id.removeprefix(_TRACE_PREFIX)
+
+
+def _span_id(agent_span_id: str) -> str:
+    # SDK span ids carry 24 hex digits; W3C span ids have 16
+    return agent_span_id.removeprefix(_SPAN_PREFIX)[:16]
+
+
+def _timestamp(value: Optional[str]) -> Optional[float]:
+    return datetime.fromisoformat(value).timestamp() if value else None
+
+
+def current_traceparent() -> Optional[str]:
+    """W3C `traceparent` of the innermost SDK span (e.g. the tool call being made), else of the request span."""
+    agent_span = get_current_span()
+    if agent_span is not None and agent_span.trace_id.startswith(_TRACE_PREFIX):
+        return f"00-{_trace_id(agent_span.trace_id)}-{_span_id(agent_span.span_id)}-01"
+    span = current_span()
+    return span.traceparent if span is not None else None
+
+
+def agent_run_config(workflow_name: str) -> RunConfig:
+    """RunConfig placing the SDK trace of a run in the current request's trace, without prompts or outputs."""
+    span = current_span()
+    if span is None:
+        return RunConfig(workflow_name=workflow_name, trace_include_sensitive_data=False)
+    return RunConfig(
+        workflow_name=workflow_name,
+        trace_id=f"{_TRACE_PREFIX}{span.trace_id}",
+        trace_metadata={"parent_span_id": span.span_id},
+        trace_include_sensitive_data=False,
+    )
+
+
+class AgentSpanProcessor(TracingProcessor):
+    def __init__(self):
+        self._lock = threading.Lock()
+        # SDK trace id -> [parent span id, runs open in it]; a guardrail run and the agent run share a trace
+        self._parents: Dict[str, list] = {}
+
+    def on_trace_start(self, trace: Trace) -> None:
+        parent = ((trace.export() or {}).get("metadata") or {}).get("parent_span_id")
+        with self._lock:
+            entry = self._parents.setdefault(trace.trace_id, [parent, 0])
+            entry[1] += 1
+
+    def on_trace_end(self, trace: Trace) -> None:
+        with self._lock:
+            entry = self._parents.get(trace.trace_id)
+            if entry is not None:
+                entry[1] -= 1
+                if entry[1] <= 0:
+                    del self._parents[trace.trace_id]
+
+    def on_span_start(self, span: AgentSpan[Any]) -> None:
+        pass
+
+    def on_span_end(self, span: AgentSpan[Any]) -> None:
+        try:
+            self._record(span)
+        except Exception as e:
+            logger.warning("Could not record agent span: %s", e)
+
+    def _record(self, agent_span: AgentSpan[Any]):
+        data = agent_span.span_data.export()
+        kind = data.get("type", "span")
+        start, end = _timestamp(agent_span.started_at), _timestamp(agent_span.ended_at)
+        if start is None or end is None:
+            return
+        status = "error" if agent_span.error else "ok"
+        self._observe(kind, data, end - start, status)
+
+        if agent_span.parent_id:
+            parent_id = _span_id(agent_span.parent_id)
+        else:
+            with self._lock:
+                parent_id = (self._parents.get(agent_span.trace_id) or [None])[0]
+        attributes = {key: value for key, value in data.items() if key not in _PAYLOAD_FIELDS and value is not None}
+        if agent_span.error:
+            attributes["error"] = agent_span.error.get("message")
+        name = data.get("name") or data.get("to_agent") or data.get("server")
+        export_span(Span(
+            f"agent.{kind}/{name}" if name else f"agent.{kind}",
+            _trace_id(agent_span.trace_id), _span_id(agent_span.span_id), parent_id,
+            start, end, status, attributes,
+        ))
+
+    @staticmethod
+    def _observe(kind: str, data: Dict[str, Any], seconds: float, status: str):
+        if kind == "generation":
+            model = data.get("model") or "unknown"
+            LLM_REQUEST_SECONDS.labels(model, status).observe(seconds)
+            for token_kind, tokens in (data.get("usage") or {}).items():
+                if tokens is not None:
+                    LLM_TOKENS.labels(model, token_kind.removesuffix("_tokens")).observe(tokens)
+        elif kind == "function":
+            TOOL_CALL_SECONDS.labels(data.get("name"), status).observe(seconds)
+        elif kind == "agent":
+            AGENT_RUN_SECONDS.labels(data.get("name")).observe(seconds)
+        elif kind == "handoff":
+            AGENT_HANDOFFS.labels(data.get("from_agent"), data.get("to_agent")).inc()
+
+    def shutdown(self) -> None:
+        pass
+
+    def force_flush(self) -> None:
+        pass
+
+
+def install():
+    """Route the SDK's spans to `AgentSpanProcessor` only, so nothing is uploaded to OpenAI."""
+    set_trace_processors([AgentSpanProcessor()])
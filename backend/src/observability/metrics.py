@@ -0,0 +1,37 @@
+"""
+Prometheus metrics of the backend, served on `/metrics`.
+
+LLM, tool, agent and handoff metrics are derived from the Agents SDK spans
+(see `src.observability.agent_tracing`); HTTP metrics come from the tracing
+middleware, LLM admission metrics from `src.llm.admission`. Component stats
+kept elsewhere (e.g. the guardrail cache) are registered with
+`register_stats` and read at scrape time.
+"""
+from prometheus_client import Counter, Histogram
+
+from src.observability.stats import register_stats, render_metrics  # noqa: F401  (re-exported)
+
+
+_SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+_TOKEN_BUCKETS = (16, 64, 256, 1024, 2048, 4096, 8192, 16384, 32768, 65536, 131072)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_seconds", "HTTP request latency, until the last byte of the response",
+    ["method", "path", "status"], buckets=_SECONDS_BUCKETS,
+)
+LLM_REQUEST_SECONDS = Histogram(
+    "llm_request_seconds", "LLM call latency", ["model", "status"], buckets=_SECONDS_BUCKETS
+)
+LLM_TOKENS = Histogram("llm_tokens", "Tokens per LLM call", ["model", "kind"], buckets=_TOKEN_BUCKETS)
+TOOL_CALL_SECONDS = Histogram(
+    "agent_tool_call_seconds", "Tool call latency as seen by the agent", ["tool", "status"], buckets=_SECONDS_BUCKETS
+)
+AGENT_RUN_SECONDS = Histogram(
+    "agent_run_seconds", "Time an agent was active within a run", ["agent"], buckets=_SECONDS_BUCKETS
+)
+AGENT_HANDOFFS = Counter("agent_handoffs_total", "Handoffs between agents", ["source", "target"])
+LLM_ADMISSION_WAIT_SECONDS = Histogram(
+    "llm_admission_wait_seconds", "Time an LLM call waited in the admission queue",
+    ["model", "priority", "outcome"], buckets=_SECONDS_BUCKETS,
+)
+LLM_RETRIES = Counter("llm_retries_total", "LLM calls retried after a retryable error", ["model", "reason"])
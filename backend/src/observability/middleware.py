@@ -0,0 +1,53 @@
+"""
+ASGI middleware opening the root span of every HTTP request.
+
+The span continues an incoming `traceparent` header, ends when the last
+byte of the response is sent (so streamed responses are timed in full) and
+is returned to the client as a `traceparent` response header.
+"""
+import time
+
+from src.observability.metrics import HTTP_REQUEST_SECONDS
+from src.observability.tracing import span
+
+
+# Scraping /metrics should not show up in its own latency histogram
+UNTRACED_PATHS = {"/metrics"}
+
+
+class TracingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in UNTRACED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        traceparent = headers.get(b"traceparent", b"").decode("latin-1") or None
+        method, path = scope["method"], scope["path"]
+        started = time.perf_counter()
+        status = 500
+
+        with span(f"{method} {path}", traceparent=traceparent, method=method, path=path) as current:
+
+            async def send_with_trace(message):
+                nonlocal status
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    message = {
+                        **message,
+                        "headers": [*message.get("headers", []), (b"traceparent", current.traceparent.encode())],
+                    }
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_trace)
+            finally:
+                current.set_attributes(status=status)
+                if status >= 500:
+                    current.status = "error"
+                # Unrouted paths share one label so scanners cannot blow up the series count
+                route = path if status != 404 else "unmatched"
+                HTTP_REQUEST_SECONDS.labels(method, route, str(status)).observe(time.perf_counter() - started)
@@ -0,0 +1,41 @@
+"""
+Component stats exposed as Prometheus gauges.
+
+Components that already keep counters (caches, pools, queues) register a
+`stats()` callable with `register_stats`; its numeric values are read at
+scrape time instead of being mirrored into metrics as they change.
+
+Identical copy in backend/ and mcp_server/ (each service is built and
+deployed on its own); change both together.
+"""
+from typing import Any, Callable, Dict
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+
+class _StatsCollector(Collector):
+    """Exposes the numeric values of registered `stats()` callables as gauges named `<prefix>_<key>`."""
+
+    def __init__(self):
+        self.sources: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    def collect(self):
+        for prefix, stats in list(self.sources.items()):
+            for key, value in stats().items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    yield GaugeMetricFamily(f"{prefix}_{key}", f"{prefix} {key.replace('_', ' ')}", value=value)
+
+
+_stats_collector = _StatsCollector()
+REGISTRY.register(_stats_collector)
+
+
+def register_stats(prefix: str, stats: Callable[[], Dict[str, Any]]):
+    _stats_collector.sources[prefix] = stats
+
+
+def render_metrics():
+    """Body and content type of a `/metrics` response."""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
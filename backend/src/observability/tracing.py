@@ -0,0 +1,179 @@
+"""
+Minimal OpenTelemetry-style tracing for the service's request stages.
+
+A `span(...)` block times one stage. Spans nest through a context variable
+and carry W3C trace context (`traceparent`), so a trace started by a caller
+continues across services. Finished spans are handed to a local exporter;
+nothing leaves the process.
+
+Configuration, from the environment:
+    TRACING_ENABLED     "false" stops spans from being recorded and exported (default true)
+    TRACE_EXPORTER      "memory" (recent spans kept in `exporter.spans`), "log" (one record per
+                        span on the `src.observability.tracing` logger) or "jsonl" (one JSON
+                        object per line appended to TRACE_EXPORT_FILE); default memory
+    TRACE_BUFFER_SIZE   spans kept by the memory exporter (default 1024)
+    TRACE_EXPORT_FILE   file written by the jsonl exporter (default ./traces.jsonl)
+
+Identical copy in backend/ and mcp_server/ (each service is built and
+deployed on its own); change both together.
+"""
+import collections
+import contextvars
+import json
+import logging
+import os
+import re
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, Deque, Dict, Iterator, Optional, Tuple
+
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "memory")
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "1024"))
+TRACE_EXPORT_FILE = os.getenv("TRACE_EXPORT_FILE", "./traces.jsonl")
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str] = None
+    start: float = field(default_factory=time.time)
+    end: Optional[float] = None
+    status: str = "ok"
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    @property
+    def duration(self) -> Optional[float]:
+        return None if self.end is None else self.end - self.start
+
+    def set_attributes(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**asdict(self), "duration": self.duration}
+
+
+class MemoryExporter:
+    def __init__(self, size: int = TRACE_BUFFER_SIZE):
+        self.spans: Deque[Span] = collections.deque(maxlen=size)
+
+    def export(self, span: Span):
+        self.spans.append(span)
+
+    def trace(self, trace_id: str):
+        return [span for span in list(self.spans) if span.trace_id == trace_id]
+
+
+class LogExporter:
+    def export(self, span: Span):
+        logger.info("span %s", span.name, extra={"span": span.to_dict()})
+
+
+class JsonlExporter:
+    def __init__(self, path: str = TRACE_EXPORT_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock, open(self.path, "a") as f:
+            f.write(line + "\n")
+
+
+def _create_exporter(name: str):
+    if name == "log":
+        return LogExporter()
+    if name == "jsonl":
+        return JsonlExporter()
+    return MemoryExporter()
+
+
+exporter = _create_exporter(TRACE_EXPORTER)
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+
+def set_exporter(new_exporter):
+    global exporter
+    exporter = new_exporter
+
+
+def new_trace_id() -> str:
+    return secrets.token_hex(16)
+
+
+def new_span_id() -> str:
+    return secrets.token_hex(8)
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[Tuple[str, str]]:
+    """(trace id, parent span id) of a W3C `traceparent` header, or None if it is missing or malformed."""
+    match = _TRACEPARENT.match(value.strip().lower()) if value else None
+    return match.groups() if match else None
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def export_span(span: Span):
+    if not TRACING_ENABLED:
+        return
+    try:
+        exporter.export(span)
+    except Exception as e:
+        logger.warning("Could not export span %s: %s", span.name, e)
+
+
+def record_span(name: str, start: float, end: float, parent: Optional[Span] = None, **attributes) -> Optional[Span]:
+    """Export a child span for a stage that was timed elsewhere (e.g. in another process)."""
+    parent = parent or current_span()
+    if parent is None:
+        return None
+    span = Span(name, parent.trace_id, new_span_id(), parent.span_id, start, end, attributes=attributes)
+    export_span(span)
+    return span
+
+
+@contextmanager
+def span(name: str, traceparent: Optional[str] = None, **attributes) -> Iterator[Span]:
+    """
+    Time a block as a span. It continues `traceparent` if one is given (a
+    request from another service), otherwise the current span's trace, and
+    otherwise starts a new trace.
+    """
+    remote = parse_traceparent(traceparent)
+    parent = current_span()
+    if remote is not None:
+        trace_id, parent_id = remote
+    elif parent is not None:
+        trace_id, parent_id = parent.trace_id, parent.span_id
+    else:
+        trace_id, parent_id = new_trace_id(), None
+
+    current = Span(name, trace_id, new_span_id(), parent_id, attributes=attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.status = "error"
+        current.attributes.setdefault("error", f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end = time.time()
+        export_span(current)
@@ -0,0 +1,5 @@
+import os
+
+# The agents build their model clients at import; no request ever reaches the API in the tests
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
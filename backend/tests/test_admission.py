@@ -0,0 +1,48 @@
+"""`ModelScheduler` slot accounting when callers go away while queued."""
+import asyncio
+import time
+
+import pytest
+
+from src.llm.admission import INTERACTIVE, AdmissionTicket, ModelScheduler
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_cancelled_waiter_releases_no_slot():
+    async def scenario():
+        scheduler = ModelScheduler("model", max_in_flight=1)
+        ticket = AdmissionTicket.create()
+        await scheduler.admit(10, ticket)
+        waiting = asyncio.create_task(scheduler.admit(10, ticket))
+        await _settle()
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert (scheduler.in_flight, scheduler.queue_depth()) == (1, 0)
+        scheduler.release()
+        return scheduler.in_flight
+
+    assert asyncio.run(scenario()) == 0
+
+
+def test_waiter_timed_out_and_cancelled_together_releases_no_slot():
+    async def scenario():
+        scheduler = ModelScheduler("model", max_in_flight=1)
+        await scheduler.admit(10, AdmissionTicket.create())
+        waiting = asyncio.create_task(scheduler.admit(10, AdmissionTicket(INTERACTIVE, time.monotonic() + 0.01)))
+        await _settle()
+        # Expire the waiter and cancel its caller before it gets to run again
+        time.sleep(0.02)
+        scheduler._dispatch()
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert (scheduler.in_flight, scheduler.queue_depth()) == (1, 0)
+        scheduler.release()
+        return scheduler.in_flight
+
+    assert asyncio.run(scenario()) == 0
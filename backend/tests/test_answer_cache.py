@@ -0,0 +1,41 @@
+"""Keys and near-duplicate matching of the answer cache."""
+import pytest
+
+from benchmarks.near_duplicates import CASES
+from src.agent_.answer_cache import AnswerCache, MemoryAnswerBackend, normalize
+
+
+@pytest.mark.parametrize("question, other", [
+    ("employees with salary > 50000", "employees with salary < 50000"),
+    ("employees with salary > 50000", "employees with salary >= 50000"),
+    ("sales >= 100", "sales = 100"),
+    ("sales = 100", "sales != 100"),
+    ("sales <= 100", "sales < 100"),
+    ("temperature above -5", "temperature above 5"),
+    ("growth above 5%", "growth above 5"),
+])
+def test_operators_and_signs_change_the_key(question, other):
+    assert normalize(question) != normalize(other)
+
+
+@pytest.mark.parametrize("question, other", [
+    ("What is the average salary?", "what is the average   salary"),
+    ("Revenue per product!", "revenue, per product"),
+    ("Year-over-year growth", "year over year growth"),
+])
+def test_harmless_punctuation_keeps_the_key(question, other):
+    assert normalize(question) == normalize(other)
+
+
+def test_questions_differing_in_an_operator_are_not_served_each_others_answer():
+    cache = AnswerCache(MemoryAnswerBackend(), similarity=0.8)
+    cache.store("Which employees have a salary > 50000?", "the high earners", "v1")
+    assert cache.lookup("Which employees have a salary < 50000?", "v1") is None
+    assert cache.lookup("which employees have a salary > 50000", "v1") == "the high earners"
+
+
+@pytest.mark.parametrize("cached, asked, served", CASES)
+def test_near_duplicates(cached, asked, served):
+    cache = AnswerCache(MemoryAnswerBackend(), similarity=0.9)
+    cache.store(cached, "answer", "v1")
+    assert (cache.lookup(asked, "v1") is not None) == served
@@ -0,0 +1,110 @@
+"""Concurrent `answer()` calls against a fake agent run: coalescing and cancellation."""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.agent_ import data_analysis
+from src.agent_.single_flight import SingleFlight
+
+
+class FakeRunner:
+    """Stands in for `data_analysis.run`: counts runs and holds each one until released."""
+
+    def __init__(self):
+        self.questions = []
+        self.cancelled = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self, question, mcp_server_pool, priority=data_analysis.INTERACTIVE):
+        self.questions.append(question)
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return SimpleNamespace(final_output=f"answer to {question}")
+
+
+@pytest.fixture
+def runner(monkeypatch):
+    async def no_cached_answer(question, mcp_server_pool):
+        return None, None
+
+    fake = FakeRunner()
+    monkeypatch.setattr(data_analysis, "run", fake)
+    monkeypatch.setattr(data_analysis, "cached_answer", no_cached_answer)
+    monkeypatch.setattr(data_analysis, "in_flight_answers", SingleFlight(enabled=True))
+    return fake
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_identical_questions_share_one_run(runner):
+    async def scenario():
+        questions = ["What is the average salary?", "what is the average  salary?", "What is the average salary?"]
+        calls = [asyncio.create_task(data_analysis.answer(question, None)) for question in questions]
+        await _settle()
+        runner.release.set()
+        return await asyncio.gather(*calls)
+
+    answers = asyncio.run(scenario())
+    assert runner.questions == ["What is the average salary?"]
+    assert answers == ["answer to What is the average salary?"] * 3
+
+
+def test_cancelled_waiter_does_not_cancel_the_shared_run(runner):
+    async def scenario():
+        leader = asyncio.create_task(data_analysis.answer("Revenue per product?", None))
+        follower = asyncio.create_task(data_analysis.answer("Revenue per product?", None))
+        await _settle()
+        leader.cancel()
+        await _settle()
+        runner.release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(scenario()) == "answer to Revenue per product?"
+    assert len(runner.questions) == 1
+    assert runner.cancelled == 0
+
+
+def test_last_waiter_leaving_cancels_the_run(runner):
+    async def scenario():
+        calls = [asyncio.create_task(data_analysis.answer("Revenue per product?", None)) for _ in range(2)]
+        await _settle()
+        for call in calls:
+            call.cancel()
+        await asyncio.gather(*calls, return_exceptions=True)
+        await _settle()
+
+    asyncio.run(scenario())
+    assert runner.cancelled == 1
+    assert data_analysis.in_flight_answers.in_flight() == 0
+
+
+def test_different_questions_get_their_own_runs(runner):
+    questions = ["Orders with price > 5?", "Orders with price < 5?", "Orders with price -5?", "Orders with price*quantity?",
+                 "Orders with price+quantity?"]
+
+    async def scenario():
+        calls = [asyncio.create_task(data_analysis.answer(question, None)) for question in questions]
+        await _settle()
+        runner.release.set()
+        return await asyncio.gather(*calls)
+
+    assert asyncio.run(scenario()) == [f"answer to {question}" for question in questions]
+    assert sorted(runner.questions) == sorted(questions)
+
+
+def test_batch_answers_duplicates_once_and_keeps_different_questions_apart(runner):
+    questions = ["Rows where x > 1?", "rows where  x > 1?", "Rows where x < 1?", "Rows where x >= 1?"]
+    runner.release.set()
+
+    answers = asyncio.run(data_analysis.answer_batch(questions, None))
+    assert answers == [f"answer to {question}" for question in ["Rows where x > 1?"] * 2 + questions[2:]]
+    assert sorted(runner.questions) == sorted(["Rows where x > 1?", "Rows where x < 1?", "Rows where x >= 1?"])
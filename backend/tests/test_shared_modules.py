@@ -0,0 +1,21 @@
+"""The modules both services carry a copy of must not drift apart."""
+import pathlib
+
+import pytest
+
+
+BACKEND = pathlib.Path(__file__).resolve().parents[1]
+MCP_SERVER = BACKEND.parent / "mcp_server"
+
+SHARED_MODULES = [
+    "src/observability/logs.py",
+    "src/observability/tracing.py",
+    "src/observability/stats.py",
+    "benchmarks/results.py",
+]
+
+
+@pytest.mark.skipif(not MCP_SERVER.is_dir(), reason="mcp_server/ is not checked out next to backend/")
+@pytest.mark.parametrize("module", SHARED_MODULES)
+def test_copies_are_identical(module):
+    assert (BACKEND / module).read_bytes() == (MCP_SERVER / module).read_bytes()
@@ -0,0 +1,167 @@
+"""
+Microbenchmarks of the code_executor building blocks over growing synthetic datasets.
+
+For every size in `--sizes` a deterministic sales-like CSV (id, region,
+product, price, quantity, date) is generated in a temporary data directory,
+then these are timed:
+
+    analyzer/<n> stmts       ASTSafetyAnalyzer.analyze on snippets of n statements
+    pipeline/<rows>          SecureCodePipeline.run of a scan + group-by query (no result cache),
+                             reading the CSV and, "(dataset cache)", from the resident frame cache
+    serializer/<rows>        ExecutionResultSerializer.serialize_result of the whole frame
+                             (preview + export to a result:// file once it exceeds RESULT_MAX_ROWS)
+    get_file_context/<rows>  the MCP tool, warm (re-list, nothing changed) and cold (file changed,
+                             schema re-inferred)
+
+Columnar dataset copies and the dataset cache are disabled for the plain
+pipeline, so its numbers are CSV scans and do not depend on a background
+conversion having finished. Results are
+saved under benchmarks/results/; pass an earlier result file as `--compare`
+to see the change.
+
+Usage:
+    uv run python -m benchmarks.microbench --sizes 1000,100000,1000000 --label baseline
+    uv run python -m benchmarks.microbench --compare benchmarks/results/<file>.json
+"""
+import argparse
+import asyncio
+import logging
+import os
+import pathlib
+import tempfile
+import time
+
+import polars as pl
+
+from benchmarks import results
+
+
+ANALYZER_STATEMENTS = (1, 10, 100)
+
+QUERY = (
+    "lazy_df = pl.scan_csv(\"{path}\")\n"
+    "result = lazy_df.group_by(\"region\").agg(\n"
+    "    (pl.col(\"price\") * pl.col(\"quantity\")).sum().alias(\"revenue\"),\n"
+    "    pl.col(\"quantity\").mean().alias(\"avg_quantity\"),\n"
+    ").sort(\"region\").collect()\n"
+    "result"
+)
+
+
+def synthetic_dataset(rows: int) -> pl.DataFrame:
+    """Deterministic pseudo-random rows (no RNG, so every run sees the same data)."""
+    i = pl.int_range(0, rows, eager=True)
+    return pl.DataFrame({
+        "id": i,
+        "region": pl.select(pl.format("region_{}", pl.lit(i * 7 % 8))).to_series(),
+        "product": pl.select(pl.format("product_{}", pl.lit(i * 31 % 97))).to_series(),
+        "price": (i * 7919 % 10_000) / 100,
+        "quantity": i * 13 % 20 + 1,
+        "date": pl.date_range(pl.date(2020, 1, 1), pl.date(2024, 12, 31), eager=True).gather(i % 1827),
+    })
+
+
+def analyzer_snippet(statements: int) -> str:
+    lines = [
+        f"step_{n} = pl.scan_csv(\"./data/sales.csv\").filter(pl.col(\"price\") > {n}).select(pl.col(\"quantity\").sum())"
+        for n in range(statements)
+    ]
+    return "\n".join(lines + [f"step_{statements - 1}.collect()"])
+
+
+def measure(fn, iterations: int, setup=None) -> list:
+    """Seconds per call, after one untimed warm-up call; `setup` runs untimed before every call."""
+    if setup:
+        setup()
+    fn()
+    timings = []
+    for _ in range(iterations):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def run(args, workdir: pathlib.Path) -> dict:
+    # Imported here so the environment set up by `main` is in place first
+    from src.api.server import get_file_context
+    from src.catalog.frames import DatasetFrameCache, cached_polars
+    from src.security.analyzer import ASTSafetyAnalyzer
+    from src.security.pipeline import SecureCodePipeline
+
+    metrics = {}
+
+    def record(name: str, timings: list):
+        metrics[name] = results.summarize(timings)
+        stats = metrics[name]
+        print(f"{name:<36} p50={stats['p50']:10.3f}ms p95={stats['p95']:10.3f}ms ({len(timings)} runs)")
+
+    analyzer = ASTSafetyAnalyzer()
+    for statements in ANALYZER_STATEMENTS:
+        snippet = analyzer_snippet(statements)
+        record(f"analyzer/{statements} stmts", measure(lambda: analyzer.analyze(snippet), args.iterations * 10))
+
+    pipeline = SecureCodePipeline()
+    pipeline.result_cache = None
+    loop = asyncio.new_event_loop()
+    for rows in args.sizes:
+        directory = workdir / f"rows_{rows}"
+        directory.mkdir()
+        path = directory / "sales.csv"
+        frame = synthetic_dataset(rows)
+        frame.write_csv(path)
+        iterations = max(3, args.iterations // max(1, rows // 100_000))
+
+        code = QUERY.format(path=path)
+        if (outcome := pipeline.run(code)).get("status") != "success":
+            raise RuntimeError(f"Benchmark query failed: {outcome}")
+        record(f"pipeline/{rows}", measure(lambda: pipeline.run(code), iterations))
+
+        cached_pl = cached_polars(DatasetFrameCache(data_dir=str(directory)), pl)
+        cached = SecureCodePipeline(allowed_globals={**pipeline.executor.allowed_globals, "pl": cached_pl, "polars": cached_pl})
+        cached.result_cache = None
+        record(f"pipeline/{rows} (dataset cache)", measure(lambda: cached.run(code), iterations))
+        record(f"serializer/{rows}", measure(lambda: pipeline.serializer.serialize_result(frame), iterations))
+
+        call_tool = lambda: loop.run_until_complete(get_file_context.fn(path=str(directory)))
+        record(f"get_file_context/{rows} (warm)", measure(call_tool, args.iterations * 10))
+
+        def touch():
+            stat = path.stat()
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+        record(f"get_file_context/{rows} (cold)", measure(call_tool, args.iterations, setup=touch))
+    loop.close()
+    return metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000", help="Comma-separated dataset row counts")
+    parser.add_argument("--iterations", type=int, default=20, help="Timed runs per benchmark (fewer for big datasets)")
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--compare", help="Earlier result file to compare against")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+    args.sizes = [int(size) for size in args.sizes.split(",")]
+
+    with tempfile.TemporaryDirectory(prefix="mcp-microbench-") as tmp:
+        workdir = pathlib.Path(tmp)
+        os.environ["CATALOG_REFRESH_INTERVAL"] = "0"
+        os.environ["RESULT_EXPORT_DIR"] = str(workdir / "results")
+        os.environ["COLUMNAR_ENABLED"] = "false"
+        os.environ["DATASET_CACHE_ENABLED"] = "false"
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+        logging.disable(logging.INFO)
+        metrics = run(args, workdir)
+
+    params = {key: value for key, value in vars(args).items() if key not in ("compare", "label")}
+    print()
+    results.print_table(metrics, results.load(args.compare) if args.compare else None)
+    if not args.no_save:
+        print(f"saved {results.save('microbench', args.label, params, metrics)}")
+
+
+if __name__ == "__main__":
+    main()
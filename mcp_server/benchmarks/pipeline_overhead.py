@@ -0,0 +1,115 @@
+"""
+Per-call overhead of `SecureCodePipeline.run`, before and after the single-pass rewrite.
+
+"legacy" replays the previous control flow: the analyzer parses the source,
+`exec` compiles it again from text, the last line is split off and `eval`ed
+(re-running it), and the serializer parses the source a third time.
+"single-pass (cold)" parses and compiles once per call, "single-pass (warm)"
+hits the compiled-snippet cache. Snippets run against a tiny in-memory frame
+so the numbers are pipeline overhead, not Polars work.
+
+Usage:
+    uv run python -m benchmarks.pipeline_overhead --iterations 2000
+"""
+import argparse
+import ast
+import logging
+import statistics
+import time
+
+import polars as pl
+
+from src.security.pipeline import SecureCodePipeline
+
+
+SNIPPETS = {
+    "one-liner": "small.height",
+    "typical": (
+        "# Average value per group\n"
+        "lazy_df = small.lazy()\n"
+        "result = lazy_df.group_by(\"g\").agg(pl.col(\"v\").mean().alias(\"avg\")).sort(\"g\").collect()\n"
+        "result\n"
+    ),
+    "long": "\n".join(
+        [f"# step {i}\nstep_{i} = small.filter(pl.col(\"v\") > {i}).select(pl.col(\"v\").sum())" for i in range(30)]
+        + ["step_29"]
+    ),
+}
+
+
+def legacy_serialize(pipeline: SecureCodePipeline, code_string: str, global_scope: dict):
+    """The previous serializer: parse the source again and look up the final bare name."""
+    tree = ast.parse(code_string.strip())
+    value = None
+    if tree.body:
+        last_stmt = tree.body[-1]
+        if isinstance(last_stmt, ast.Expr) and isinstance(last_stmt.value, ast.Name):
+            value = global_scope.get(last_stmt.value.id)
+    return pipeline.serializer.serialize_result(value)
+
+
+def legacy_run(pipeline: SecureCodePipeline, code_string: str, extra_globals: dict):
+    safe, issues = pipeline.ast_analyzer.analyze(code_string)
+    if not safe:
+        raise ValueError(f"Unsafe code detected: {issues}")
+
+    execution_globals = pipeline.executor.allowed_globals.copy()
+    execution_globals.update(extra_globals)
+    exec(code_string, execution_globals)
+
+    result = None
+    if code_string.strip().split('\n')[-1].strip() and not code_string.strip().split('\n')[-1].strip().startswith('#'):
+        last_line = code_string.strip().split('\n')[-1].strip()
+        if '=' not in last_line:
+            try:
+                result = eval(last_line, execution_globals)
+            except:
+                result = None
+
+    return legacy_serialize(pipeline, code_string, execution_globals)
+
+
+def cold_run(pipeline: SecureCodePipeline, code_string: str, extra_globals: dict):
+    pipeline._compiled.clear()
+    return pipeline.run(code_string, extra_globals)
+
+
+def warm_run(pipeline: SecureCodePipeline, code_string: str, extra_globals: dict):
+    return pipeline.run(code_string, extra_globals)
+
+
+def measure(run, pipeline: SecureCodePipeline, code_string: str, extra_globals: dict, iterations: int) -> float:
+    """Median microseconds per call."""
+    run(pipeline, code_string, extra_globals)
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        run(pipeline, code_string, extra_globals)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=1000)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    # Unrestricted, like the pipeline being compared against (see benchmarks.restricted_execution for that axis)
+    pipeline = SecureCodePipeline(restricted=False)
+    pipeline.result_cache = None
+    extra_globals = {"small": pl.DataFrame({"g": ["a", "b", "a", "c"], "v": [1, 2, 3, 4]})}
+
+    runs = {"legacy": legacy_run, "single-pass (cold)": cold_run, "single-pass (warm)": warm_run}
+    print(f"{'snippet':<12}" + "".join(f"{name:>22}" for name in runs) + f"{'speedup (warm)':>16}")
+    for name, code_string in SNIPPETS.items():
+        medians = {run_name: measure(run, pipeline, code_string, extra_globals, args.iterations) for run_name, run in runs.items()}
+        print(
+            f"{name:<12}"
+            + "".join(f"{median:>19.1f} us" for median in medians.values())
+            + f"{medians['legacy'] / medians['single-pass (warm)']:>15.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Equivalence and cost of the query optimizer's rewrites of generated Polars code.
+
+Each snippet below is written the way models tend to write it (eager reads,
+`.collect()` before filtering). It runs through SecureCodePipeline twice,
+as written (optimizer off) and rewritten (optimizer on), over the sample
+datasets in ./data and over a synthetic CSV of `--rows` rows. The serialized
+results must be identical; the run exits non-zero if any differ.
+
+Each variant runs in a fresh process, so the reported peak memory (max RSS)
+is that variant's own, next to its p50/p95 time.
+
+Usage:
+    uv run python -m benchmarks.query_optimizer --rows 2000000 --label baseline
+    uv run python -m benchmarks.query_optimizer --compare benchmarks/results/<file>.json
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import pathlib
+import resource
+import sys
+import tempfile
+
+from benchmarks import results
+from benchmarks.microbench import measure, synthetic_dataset
+from src.observability.logs import preview
+
+
+SAMPLE_SNIPPETS = {
+    "employees/filter": (
+        "df = pl.read_csv(\"./data/employee_data.csv\")\n"
+        "result = df.filter(pl.col(\"salary\") > 60000).select([\"name\", \"salary\"])\n"
+        "result"
+    ),
+    "employees/group_by": (
+        "df = pl.read_csv(\"./data/employee_data.csv\")\n"
+        "df.group_by(\"department\").agg(pl.col(\"salary\").mean()).sort(\"department\")"
+    ),
+    "weather/head": "pl.scan_csv(\"./data/weather_data.csv\").collect().sort(\"temperature\", descending=True).head(5)",
+    "sales/columns": "pl.read_csv(\"./data/sample_sales.csv\", columns=[\"product\", \"quantity\"]).sum()",
+    "sales/columns_reordered": "pl.read_csv(\"./data/sample_sales.csv\", columns=[\"quantity\", \"product\"])",
+    "sales/column_index": "pl.read_csv(\"./data/sample_sales.csv\", columns=[2])",
+    "sales/column_indices": "pl.read_csv(\"./data/sample_sales.csv\", columns=[0, 2])",
+    "sales/columns_mixed": "pl.read_csv(\"./data/sample_sales.csv\", columns=[\"product\", 3])",
+    "sales/columns+row_index": (
+        "pl.read_csv(\"./data/sample_sales.csv\", columns=[\"price\"], row_index_name=\"row\").head(3)"
+    ),
+}
+
+SYNTHETIC_SNIPPETS = {
+    "synthetic/filter": (
+        "df = pl.read_csv(\"{path}\")\n"
+        "result = df.filter(pl.col(\"price\") > 99.5).select([\"id\", \"price\"])\n"
+        "result"
+    ),
+    "synthetic/collect+head": "pl.scan_csv(\"{path}\").collect().filter(pl.col(\"region\") == \"region_3\").head(10)",
+    "synthetic/group_by": (
+        "df = pl.read_csv(\"{path}\")\n"
+        "df.group_by(\"region\").agg((pl.col(\"price\") * pl.col(\"quantity\")).sum().alias(\"revenue\")).sort(\"region\")"
+    ),
+    "synthetic/unbounded": "pl.read_csv(\"{path}\").filter(pl.col(\"quantity\") > 2)",
+}
+
+
+def run_variant(snippet: str, optimized: bool, iterations: int, queue):
+    """Child process: time the snippet and report its result and the process's peak RSS."""
+    from src.security.governor import error_result
+    from src.security.pipeline import SecureCodePipeline
+
+    logging.disable(logging.INFO)
+    pipeline = SecureCodePipeline()
+    pipeline.result_cache = None
+    if not optimized:
+        pipeline.optimizer = None
+    try:
+        outcome = pipeline.run(snippet)
+    except Exception as e:
+        # Reported like the executor worker does, so the parent is not left waiting
+        outcome = error_result("execution_error", str(e))
+    timings = measure(lambda: pipeline.run(snippet), iterations) if outcome.get("status") == "success" else []
+    peak_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((outcome, timings, peak_kib / 1024))
+
+
+def compare(name: str, snippet: str, iterations: int, metrics: dict) -> bool:
+    context = multiprocessing.get_context("spawn")
+    outcomes = {}
+    for variant, optimized in (("original", False), ("optimized", True)):
+        queue = context.Queue()
+        process = context.Process(target=run_variant, args=(snippet, optimized, iterations, queue))
+        process.start()
+        outcome, timings, peak_mb = queue.get()
+        process.join()
+        outcomes[variant] = outcome
+        if timings:
+            metrics[f"{name} ({variant})"] = {**results.summarize(timings), "peak_rss_mb": peak_mb}
+            stats = metrics[f"{name} ({variant})"]
+            print(f"{name + ' (' + variant + ')':<36} p50={stats['p50']:10.3f}ms p95={stats['p95']:10.3f}ms "
+                  f"peak={peak_mb:8.1f}MB")
+
+    original, optimized = outcomes["original"], outcomes["optimized"]
+    if original.get("status") != "success":
+        # Invalid snippets must fail the same way once rewritten
+        print(f"{name}: snippet failed: {preview(original)}")
+        if optimized != original:
+            print(f"{name}: optimized failure differs: {preview(optimized)}")
+            return False
+        return True
+    expected, actual = comparable(original), comparable(optimized)
+    if isinstance(actual, dict) and "row_limit" in actual:
+        # A limited result is the first `row_limit` rows of the original one
+        rows, columns = expected["shape"]
+        expected["shape"] = (min(rows, actual.pop("row_limit")), columns)
+    if optimized.get("status") != "success" or actual != expected:
+        print(f"{name}: results differ\n  original:  {preview(original)}\n  optimized: {preview(optimized)}")
+        return False
+    return True
+
+
+def comparable(outcome: dict):
+    """The serialized result without the exported file's URI (a fresh one per run)."""
+    result = outcome.get("result")
+    if isinstance(result, dict):
+        result = {key: value for key, value in result.items() if key != "resource"}
+        if "shape" in result:
+            result["shape"] = tuple(result["shape"])
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Rows of the synthetic dataset")
+    parser.add_argument("--iterations", type=int, default=5, help="Timed runs per variant")
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--compare", help="Earlier result file to compare against")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    metrics, equivalent = {}, True
+    with tempfile.TemporaryDirectory(prefix="mcp-optimizer-") as tmp:
+        workdir = pathlib.Path(tmp)
+        # Inherited by the variant processes: measure the scans, not the resident/columnar copies
+        os.environ["RESULT_EXPORT_DIR"] = str(workdir / "results")
+        os.environ["COLUMNAR_ENABLED"] = "false"
+        os.environ["DATASET_CACHE_ENABLED"] = "false"
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+        path = workdir / "sales.csv"
+        synthetic_dataset(args.rows).write_csv(path)
+
+        snippets = {**SAMPLE_SNIPPETS, **{name: code.format(path=path) for name, code in SYNTHETIC_SNIPPETS.items()}}
+        for name, snippet in snippets.items():
+            equivalent = compare(name, snippet, args.iterations, metrics) and equivalent
+
+    params = {key: value for key, value in vars(args).items() if key not in ("compare", "label")}
+    print()
+    results.print_table(metrics, results.load(args.compare) if args.compare else None)
+    if not args.no_save:
+        print(f"saved {results.save('query_optimizer', args.label, params, metrics)}")
+    print("results identical" if equivalent else "RESULTS DIFFER")
+    sys.exit(0 if equivalent else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Load test for one or more MCP server replicas behind nginx.
+
+Opens `--sessions` MCP sessions through the proxy and has each one call
+`code_executor` back to back for `--duration` seconds with a CPU-bound
+Polars query (a fresh constant per call, so the result cache never answers).
+Reports throughput, latency percentiles and how the sessions and calls were
+spread over the replicas (read from the replica prefix of the session ids).
+
+Run it once per replica count and compare the throughput, e.g.:
+
+    docker compose up -d
+    uv run python -m benchmarks.replica_scaling --label 1-replica
+    docker compose --profile replicas up -d
+    uv run python -m benchmarks.replica_scaling --label 3-replicas
+
+Replicas on the same host share its cores: to see scaling on one machine,
+cap the workers per replica (e.g. EXECUTOR_POOL_SIZE=2) so one replica
+cannot saturate the host by itself. Against a single server without nginx,
+pass `--url http://127.0.0.1:8000/mcp`.
+"""
+import argparse
+import asyncio
+import collections
+import json
+import ssl
+import statistics
+import time
+from typing import Optional
+
+import httpx
+from mcp import ClientSession
+from mcp.client.streamable_http import streamablehttp_client
+
+
+QUERY = "pl.int_range(0, {rows}, eager=True).to_frame(\"x\").select((pl.col(\"x\") * {salt} % 1013).sum()).item()"
+
+
+def client_factory(cert: Optional[str], key: Optional[str], ca: Optional[str]):
+    verify = True
+    if ca or cert:
+        verify = ssl.create_default_context(cafile=ca)
+        if cert:
+            verify.load_cert_chain(cert, key)
+
+    def create(headers=None, timeout=None, auth=None) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            headers=headers, timeout=timeout or httpx.Timeout(30, read=300), auth=auth, verify=verify
+        )
+
+    return create
+
+
+async def session_worker(args, factory, deadline: float, salts, latencies, calls_per_replica, errors, replicas):
+    async with streamablehttp_client(args.url, httpx_client_factory=factory) as (read, write, get_session_id):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            session_id = get_session_id() or ""
+            replica = session_id.partition(".")[0] if "." in session_id else "-"
+            replicas[replica] += 1
+            while time.perf_counter() < deadline:
+                code = QUERY.format(rows=args.rows, salt=next(salts))
+                started = time.perf_counter()
+                result = await session.call_tool("code_executor", {"code": code})
+                latencies.append(time.perf_counter() - started)
+                text = result.content[0].text if result.content else ""
+                if result.isError or json.loads(text or "{}").get("status") == "error":
+                    errors.append(text[:200])
+                calls_per_replica[replica] += 1
+
+
+async def load(args) -> int:
+    factory = client_factory(args.cert, args.key, args.ca)
+    salts = iter(range(1, 1 << 62))
+    latencies, errors = [], []
+    calls_per_replica, replicas = collections.Counter(), collections.Counter()
+
+    start = time.perf_counter()
+    deadline = start + args.duration
+    await asyncio.gather(*(
+        session_worker(args, factory, deadline, salts, latencies, calls_per_replica, errors, replicas)
+        for _ in range(args.sessions)
+    ))
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    print(f"[{args.label}] sessions={args.sessions} rows={args.rows} wall={wall:.1f}s calls={len(latencies)}")
+    print(f"throughput={len(latencies) / wall:.1f} calls/s errors={len(errors)}")
+    print(
+        f"latency p50={quantiles[49] * 1000:.1f}ms p95={quantiles[94] * 1000:.1f}ms "
+        f"p99={quantiles[98] * 1000:.1f}ms max={latencies[-1] * 1000:.1f}ms"
+    )
+    for replica in sorted(replicas):
+        print(f"  {replica}: {replicas[replica]} sessions, {calls_per_replica[replica]} calls")
+    for error in errors[:5]:
+        print(f"  error: {error}")
+    return 1 if errors else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="https://localhost:8443/mcp")
+    parser.add_argument("--cert", default="../certs/agentic-app.crt", help="Client certificate for mTLS")
+    parser.add_argument("--key", default="../certs/agentic-app.key")
+    parser.add_argument("--ca", default="../certs/ca.crt")
+    parser.add_argument("--sessions", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--rows", type=int, default=2_000_000, help="Rows processed per call")
+    parser.add_argument("--label", default="run")
+    args = parser.parse_args()
+    if args.url.startswith("http://"):
+        args.cert = args.key = args.ca = None
+    raise SystemExit(asyncio.run(load(args)))
+
+
+if __name__ == "__main__":
+    main()
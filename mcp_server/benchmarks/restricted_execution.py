@@ -0,0 +1,119 @@
+"""
+Cost of running `code_executor` snippets under RestrictedPython.
+
+Compares, per snippet:
+    unrestricted       plain `exec` of the cached compiled snippet
+    restricted         the pipeline's restricted mode: cached `compile_restricted`
+                       output, prebuilt guarded globals, lightweight guards
+    naive restricted   what the old `RestrictedPythonExecutor.execute` did on every
+                       call: `compile_restricted`, `safe_globals.copy()`, `safer_getattr`
+
+Snippets are representative analyst queries over an in-memory frame of
+`--rows` rows, so the difference is sandbox overhead on top of real Polars work.
+
+Usage:
+    uv run python -m benchmarks.restricted_execution --rows 100000 --iterations 200
+"""
+import argparse
+import logging
+import statistics
+import time
+
+import polars as pl
+from RestrictedPython import compile_restricted, safe_globals
+from RestrictedPython.Guards import full_write_guard, guarded_iter_unpack_sequence, guarded_unpack_sequence, safer_getattr
+from RestrictedPython.PrintCollector import PrintCollector
+
+from benchmarks.pipeline_overhead import legacy_serialize
+from src.security.pipeline import SecureCodePipeline
+from src.security.restricted_executor import guarded_inplacevar
+
+
+SNIPPETS = {
+    "group_by": (
+        "result = sales.lazy().group_by(\"state\").agg(pl.col(\"amount\").sum().alias(\"total\")).sort(\"total\").collect()\n"
+        "result\n"
+    ),
+    "filter_top_n": (
+        "top = sales.lazy().filter(pl.col(\"amount\") > 500).sort(\"amount\", descending=True).head(10).collect()\n"
+        "top\n"
+    ),
+    "python_loop": (
+        "totals = {}\n"
+        "for state, amount in sales.head(2000).select([\"state\", \"amount\"]).iter_rows():\n"
+        "    totals[state] = totals.get(state, 0) + amount\n"
+        "totals\n"
+    ),
+    "multi_step": (
+        "monthly = sales.lazy().with_columns(pl.col(\"day\").mod(30).alias(\"month\"))\n"
+        "by_month = monthly.group_by(\"month\").agg(pl.col(\"amount\").mean().alias(\"avg\"), pl.len().alias(\"n\"))\n"
+        "best = by_month.sort(\"avg\", descending=True).head(3).collect()\n"
+        "best\n"
+    ),
+}
+
+
+def naive_restricted_run(pipeline: SecureCodePipeline, code_string: str, extra_globals: dict):
+    byte_code = compile_restricted(code_string, '<user_code>', 'exec')
+    restricted_globals = safe_globals.copy()
+    restricted_globals.update({
+        '_getattr_': safer_getattr,
+        '_getitem_': lambda obj, key: obj[key],
+        '_getiter_': iter,
+        '_write_': full_write_guard,
+        '_print_': PrintCollector,
+        '_inplacevar_': guarded_inplacevar,
+        '_unpack_sequence_': guarded_unpack_sequence,
+        '_iter_unpack_sequence_': guarded_iter_unpack_sequence,
+        'pl': pl,
+    })
+    restricted_globals.update(extra_globals)
+    exec(byte_code, restricted_globals)
+    return legacy_serialize(pipeline, code_string, restricted_globals)
+
+
+def measure(run, code_string: str, extra_globals: dict, iterations: int) -> float:
+    """Median milliseconds per call."""
+    run(code_string, extra_globals)
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        run(code_string, extra_globals)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    sales = pl.DataFrame({
+        "day": pl.int_range(args.rows, eager=True),
+        "state": pl.Series(["CA", "NY", "TX", "WA", "FL"] * (args.rows // 5 + 1))[:args.rows],
+        "amount": (pl.int_range(args.rows, eager=True) * 7919 % 1000).cast(pl.Float64),
+    })
+    extra_globals = {"sales": sales}
+
+    unrestricted = SecureCodePipeline(restricted=False)
+    restricted = SecureCodePipeline(restricted=True)
+    for pipeline in (unrestricted, restricted):
+        pipeline.result_cache = None
+
+    runs = {
+        "unrestricted": unrestricted.run,
+        "restricted": restricted.run,
+        "naive restricted": lambda code, extra: naive_restricted_run(restricted, code, extra),
+    }
+    print(f"{args.rows} rows, median of {args.iterations} runs")
+    print(f"{'snippet':<14}" + "".join(f"{name:>19}" for name in runs) + f"{'overhead':>11}")
+    for name, code_string in SNIPPETS.items():
+        medians = {run_name: measure(run, code_string, extra_globals, args.iterations) for run_name, run in runs.items()}
+        overhead = medians["restricted"] / medians["unrestricted"] - 1
+        print(f"{name:<14}" + "".join(f"{median:>16.3f} ms" for median in medians.values()) + f"{overhead:>10.1%}")
+
+
+if __name__ == "__main__":
+    main()
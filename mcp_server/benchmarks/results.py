@@ -0,0 +1,109 @@
+"""
+Storing and comparing benchmark results.
+
+Every run is written as one JSON file under `benchmarks/results/` (named
+after the benchmark, label and time), holding the parameters, the git
+revision and a flat `{metric: {stat: value}}` table. Passing an earlier file
+as `--compare` prints the relative change of every metric next to the new
+numbers.
+
+Identical copy in backend/ and mcp_server/ (each service is built and
+deployed on its own); change both together.
+"""
+import datetime
+import json
+import math
+import pathlib
+import platform
+import subprocess
+import statistics
+from typing import Dict, List, Optional
+
+
+RESULTS_DIR = pathlib.Path(__file__).parent / "results"
+
+# Stats compared by `compare`, in the order they are printed
+COMPARED_STATS = ("p50", "p95", "p99", "throughput")
+
+
+def percentile(sorted_samples: List[float], q: float) -> float:
+    """Nearest-rank percentile of already sorted samples."""
+    if not sorted_samples:
+        return math.nan
+    index = max(0, math.ceil(q / 100 * len(sorted_samples)) - 1)
+    return sorted_samples[index]
+
+
+def summarize(samples: List[float], wall: Optional[float] = None) -> Dict[str, float]:
+    """Latency stats in milliseconds, plus events per second if the wall time is given."""
+    samples = sorted(samples)
+    stats = {
+        "count": len(samples),
+        "mean": statistics.fmean(samples) * 1000 if samples else math.nan,
+        "p50": percentile(samples, 50) * 1000,
+        "p95": percentile(samples, 95) * 1000,
+        "p99": percentile(samples, 99) * 1000,
+        "max": samples[-1] * 1000 if samples else math.nan,
+    }
+    if wall:
+        stats["throughput"] = len(samples) / wall
+    return stats
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def save(benchmark: str, label: str, params: dict, metrics: Dict[str, dict], directory: pathlib.Path = RESULTS_DIR) -> pathlib.Path:
+    started = datetime.datetime.now(datetime.timezone.utc)
+    document = {
+        "benchmark": benchmark,
+        "label": label,
+        "timestamp": started.isoformat(timespec="seconds"),
+        "git": git_revision(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "params": params,
+        "metrics": metrics,
+    }
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{benchmark}-{label}-{started:%Y%m%dT%H%M%S}.json"
+    path.write_text(json.dumps(document, indent=2, allow_nan=True))
+    return path
+
+
+def load(path: str) -> dict:
+    return json.loads(pathlib.Path(path).read_text())
+
+
+def print_table(metrics: Dict[str, dict], baseline: Optional[dict] = None):
+    """
+    Print one row per latency metric (others, e.g. token counts, are left to the
+    benchmark); with a baseline, add the change against it (negative latency = faster).
+    """
+    baseline_metrics = (baseline or {}).get("metrics", {})
+    width = max([len(name) for name in metrics] + [6])
+    print(f"{'metric':<{width}} {'count':>7}" + "".join(f"{stat:>18}" for stat in COMPARED_STATS))
+    for name, stats in metrics.items():
+        if not any(stat in stats for stat in COMPARED_STATS):
+            continue
+        before = baseline_metrics.get(name, {})
+        cells = []
+        for stat in COMPARED_STATS:
+            value = stats.get(stat)
+            if value is None:
+                cells.append(f"{'-':>18}")
+                continue
+            unit = "/s" if stat == "throughput" else "ms"
+            cell = f"{value:.2f}{unit}"
+            if stat in before and before[stat]:
+                cell += f" {(value - before[stat]) / before[stat]:+.0%}"
+            cells.append(f"{cell:>18}")
+        print(f"{name:<{width}} {stats.get('count', 0):>7}" + "".join(cells))
+    if baseline:
+        print(f"(compared with {baseline['label']} @ {baseline['git']}, {baseline['timestamp']})")
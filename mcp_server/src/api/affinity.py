@@ -0,0 +1,45 @@
+"""
+Session affinity for running several MCP server replicas behind nginx.
+
+Streamable-HTTP sessions live in the memory of the replica that created them
+(as do exported `result://` files). A replica started with `MCP_REPLICA_ID`
+prefixes the session ids it hands out with `<replica id>.`, which nginx maps
+back to that replica's upstream; the prefix is stripped again before the
+request reaches the MCP transport.
+"""
+import os
+
+
+# Name of this replica as the load balancer knows it (e.g. "mcp-server-2"); empty disables the prefix
+MCP_REPLICA_ID = os.getenv("MCP_REPLICA_ID", "")
+
+SESSION_ID_HEADER = b"mcp-session-id"
+
+
+class SessionAffinityMiddleware:
+    def __init__(self, app, replica_id: str = MCP_REPLICA_ID):
+        self.app = app
+        self.prefix = f"{replica_id}.".encode()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = [
+            (name, value.removeprefix(self.prefix) if name == SESSION_ID_HEADER else value)
+            for name, value in scope["headers"]
+        ]
+
+        async def send_with_replica(message):
+            if message["type"] == "http.response.start":
+                message = {
+                    **message,
+                    "headers": [
+                        (name, self.prefix + value if name.lower() == SESSION_ID_HEADER else value)
+                        for name, value in message.get("headers", [])
+                    ],
+                }
+            await send(message)
+
+        await self.app({**scope, "headers": headers}, receive, send_with_replica)
@@ -1,54 +1,97 @@
+from contextlib import contextmanager
 from fastmcp import FastMCP
-from typing import List
+from fastmcp.server.dependencies import get_context, get_http_headers
+from starlette.requests import Request
+from starlette.middleware import Middleware
+from starlette.responses import JSONResponse, Response
+from typing import List, Optional
+import asyncio
 import os
-from src.security.pipeline import SecureCodePipeline
+import time
+from src.api.affinity import MCP_REPLICA_ID, SessionAffinityMiddleware
+from src.catalog.columnar import COLUMNAR_ENABLED, get_columnar_store
+from src.catalog.datasets import DATA_DIR, DatasetCatalog, get_catalog
+from src.security.result_cache import result_cache
+from src.security.serialization import RESULT_EXPORT_FORMAT, RESULT_EXPORT_MIME_TYPES, export_path
+from src.security.worker_pool import executor_pool
+from src.observability.logs import configure_logging, preview
+from src.observability.metrics import TOOL_CALL_SECONDS, register_stats, render_metrics
+from src.observability.tracing import span
 import logging
-import pathlib
 
 
-
-logging.basicConfig(level = "DEBUG")
+configure_logging()
+logger = logging.getLogger(__name__)
 
 MCP_TRANSPORT = os.getenv("MCP_TRANSPORT", "http")
 
 mcp = FastMCP("Data Analysis MCP Server")
 
+register_stats("result_cache", result_cache.stats)
+register_stats("executor_pool", lambda: {"queue_depth": executor_pool.queue_depth, "workers": executor_pool.size})
+register_stats("dataset_cache", executor_pool.dataset_cache_stats)
+
+
+def _incoming_traceparent() -> Optional[str]:
+    """Trace context of the calling request: `_meta.traceparent` of the MCP request, else the HTTP header."""
+    try:
+        meta = get_context().request_context.meta
+    except (RuntimeError, LookupError, ValueError):
+        return None
+    return getattr(meta, "traceparent", None) or get_http_headers().get("traceparent")
+
+
+@contextmanager
+def tool_span(tool: str, **attributes):
+    """Trace and time a tool call; mark the span's status "error" for calls that return an error."""
+    started = time.perf_counter()
+    with span(f"mcp.tool/{tool}", traceparent=_incoming_traceparent(), tool=tool, **attributes) as current:
+        try:
+            yield current
+        finally:
+            TOOL_CALL_SECONDS.labels(tool, current.status).observe(time.perf_counter() - started)
+
+
+async def _fresh_catalog(path: str, extension: str = "csv") -> DatasetCatalog:
+    """The catalog of a directory, re-listed first if it is due for a refresh."""
+    catalog = get_catalog(path, extension)
+    if catalog.is_stale and await asyncio.to_thread(catalog.refresh) and COLUMNAR_ENABLED:
+        # New or changed datasets get their columnar copy rebuilt in the background
+        get_columnar_store().sync(dataset.path for dataset in catalog.list())
+    return catalog
+
+
 @mcp.tool
-async def get_file_context(path: str = "./data", extension: str = "csv") -> List[dict]:
+async def get_file_context(path: str = "./data", extension: str = "csv", keyword: str = "") -> List[dict]:
     """
-        Reads files with the target extension and tries to fetch its headers.
+        Lists the dataset files with the target extension, with their headers and schema.
 
         Args:
-            path (str): The file path to read.
+            path (str): The directory to look for files in.
             extension (str, optional): The file extension to filter by. Defaults to "csv".
+            keyword (str, optional): Only return files whose name or column names contain
+                this keyword (case-insensitive). Defaults to "" (all files).
 
         Returns:
-            List[dict]: A list of dictionaries containing the file headers.
+            List[dict]: A list of dictionaries describing each file.
             Example:
                 [
-                    {"file": "employees.csv", "headers": ["name", "salary"]},
-                    {"file": "weather.csv", "headers": ["location", "degrees", "date"]}
+                    {"file": "employees.csv", "headers": ["name", "salary"],
+                     "dtypes": {"name": "String", "salary": "Int64"}, "rows": 15, "size_bytes": 683, "delimiter": ","},
+                    {"file": "weather.csv", "headers": ["location", "degrees", "date"], ...}
                 ]
         Raises:
             FileNotFoundError: If the path is not found or has no files.
     """
 
-    file_headers = []
-    path = pathlib.Path(path)
-    logging.info(f"Looking for files in {path} with extension {extension}")
-    file_list = [f for f in os.listdir(path) if f.endswith(f".{extension}")]
-    logging.info(f"Found files: {file_list}")
-
-    if len(file_list) == 0:
-        logging.warning(f"No files found in {path} with extension {extension}")
+    with tool_span("get_file_context", keyword=keyword) as current:
+        catalog = await _fresh_catalog(path, extension)
+        datasets = catalog.list(keyword)
+        if len(datasets) == 0:
+            logger.warning("No files found in %s with extension %s matching '%s'", path, extension, keyword)
 
-    for file in file_list:
-        with open(os.path.join(path, file), "r") as f:
-            headers = f.readline().strip().split(",")
-            file_headers.append({"file": file, "headers": headers})
-
-    logging.info(f"File headers found: {file_headers}")
-    return file_headers
+        current.set_attributes(datasets=len(datasets))
+        return [dataset.to_dict() for dataset in datasets]
 
 @mcp.tool
 async def code_executor(code: str):
@@ -60,22 +103,90 @@ async def code_executor(code: str):
         Returns:
             dict: The result of the executed code or an error message.
     """
-    print(f"[DEBUG] code_executor called with code: {repr(code)}")
-    
-    try:
-        pipeline = SecureCodePipeline()
-        result = pipeline.run(code)
-        logging.info(f"[DEBUG] Pipeline result: {result}")
-        logging.info(f"[DEBUG] Pipeline result type: {type(result)}")
+    logger.debug("code_executor called with code: %s", preview(code))
+
+    with tool_span("code_executor", code_chars=len(code)) as current:
+        try:
+            result = await executor_pool.run(code)
+            logger.debug("code_executor result: %s", preview(result))
+        except Exception as e:
+            logger.exception("code_executor failed")
+            result = {"status": "error", "message": str(e)}
+        if result.get("status") == "error":
+            current.status = "error"
+            current.set_attributes(error_type=result.get("error_type"))
         return result
-    except Exception as e:
-        logging.info(f"[DEBUG] Exception in code_executor: {e}")
-        return {"status": "error", "message": str(e)}
+
+@mcp.resource("result://{result_id}", mime_type=RESULT_EXPORT_MIME_TYPES[RESULT_EXPORT_FORMAT])
+def get_result(result_id: str) -> bytes:
+    """
+        Full result of a code_executor call whose inline result was truncated,
+        as an Arrow IPC or Parquet file. The URI is in the `resource` field of the result.
+    """
+
+    path = export_path(result_id)
+    if path is None or not os.path.exists(path):
+        raise FileNotFoundError(f"Result {result_id} not found or expired")
+    with open(path, "rb") as f:
+        return f.read()
+
+@mcp.resource("catalog://versions", mime_type="application/json")
+async def catalog_versions() -> dict:
+    """
+        Version of every dataset file as `{"file": [mtime_ns, size_bytes]}`. Clients caching
+        answers derived from the datasets compare it to drop answers over changed files.
+    """
+
+    catalog = await _fresh_catalog(DATA_DIR)
+    return {dataset.file: list(dataset.version) for dataset in catalog.list()}
+
+@mcp.resource("catalog://schema", mime_type="application/json")
+async def catalog_schema() -> dict:
+    """
+        Compact schema of every readable dataset (path, row count, column dtypes in order),
+        with the versions it was built from in the format of `catalog://versions`. Clients
+        put it in the model's context so the model does not have to call get_file_context.
+    """
+
+    catalog = await _fresh_catalog(DATA_DIR)
+    datasets = catalog.list()
+    return {
+        "versions": {dataset.file: list(dataset.version) for dataset in datasets},
+        "datasets": [
+            {"path": dataset.path, "rows": dataset.rows, "dtypes": dataset.dtypes}
+            for dataset in datasets if dataset.error is None
+        ],
+    }
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics(request: Request) -> Response:
+    """Prometheus metrics of the tools, the executor pool and the result cache."""
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
+
+@mcp.custom_route("/health", methods=["GET"])
+async def health(request: Request) -> JSONResponse:
+    """Liveness for the load balancer and the container healthcheck: 503 while no executor worker is up."""
+    workers = executor_pool.alive_workers
+    return JSONResponse(
+        {"replica": MCP_REPLICA_ID or None, "workers": workers, "queue_depth": executor_pool.queue_depth},
+        status_code=200 if workers else 503,
+    )
 
 if __name__ == "__main__":
-    
-    # Simply run without the middleware for now
+
+    # Scan the datasets once up front so the first get_file_context call is served from memory
+    catalog = get_catalog(DATA_DIR)
+    catalog.refresh(force=True)
+    if COLUMNAR_ENABLED:
+        get_columnar_store().sync(dataset.path for dataset in catalog.list())
+
+    # Fork the code executor workers before serving so the first call doesn't pay for it
+    executor_pool.start()
+
     # The ProxyHeadersMiddleware is mainly needed when behind a reverse proxy
-    # Since we're handling TLS termination at NGINX level, we can skip this
-    mcp.run(transport=MCP_TRANSPORT, host="0.0.0.0", port=8000)
+    # Since we're handling TLS termination at NGINX level, we can skip it.
+    # Replicas tag their session ids so nginx can route a session back to them.
+    middleware = [Middleware(SessionAffinityMiddleware)] if MCP_REPLICA_ID else None
+    mcp.run(transport=MCP_TRANSPORT, host="0.0.0.0", port=8000, middleware=middleware)
 
@@ -0,0 +1,301 @@
+"""
+Columnar copies of the CSV datasets.
+
+Every CSV in the data directory is materialized once into Arrow IPC (memory
+mapped, uncompressed) or Parquet, and `code_executor` scans of the CSV are
+answered from that copy instead of re-parsing the text on every run.
+"""
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import threading
+import types
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Set
+
+import polars as pl
+
+from src.catalog.datasets import DATA_DIR
+from src.catalog.frames import DATASET_CACHE_ENABLED, cached_polars, dataset_frame_cache
+
+
+logger = logging.getLogger(__name__)
+
+
+# "ipc" (Arrow IPC, memory-mapped on read) or "parquet"
+COLUMNAR_FORMAT = os.getenv("COLUMNAR_FORMAT", "ipc")
+COLUMNAR_CACHE_DIR = os.getenv("COLUMNAR_CACHE_DIR", "./data/.columnar")
+COLUMNAR_ENABLED = os.getenv("COLUMNAR_ENABLED", "true").lower() == "true"
+COLUMNAR_HASH_CHUNK_BYTES = 1024 * 1024
+
+COLUMNAR_EXTENSIONS = {"ipc": "arrow", "parquet": "parquet"}
+
+# Keyword arguments of `scan_csv`/`read_csv` that mean the same thing on the columnar readers.
+# Any other argument changes how the text is parsed, so those calls keep reading the CSV.
+_SCAN_PASSTHROUGH_KWARGS = {"n_rows", "cache", "rechunk", "row_index_name", "row_index_offset"}
+_READ_PASSTHROUGH_KWARGS = {"n_rows", "columns", "rechunk", "row_index_name", "row_index_offset"}
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while chunk := f.read(COLUMNAR_HASH_CHUNK_BYTES):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ColumnarStore:
+    """
+    Materializes CSV files into columnar copies and resolves CSV paths to them.
+
+    Copies are named after the content hash of their source and indexed in a
+    `manifest.json` next to them, keyed by source path together with its mtime
+    and size. A copy is only used while its source is unchanged; a changed or
+    unknown source is read as CSV and (re)converted in the background.
+    The copies are written with polars' default CSV options, so they hold
+    exactly what a plain `pl.scan_csv(path)` of the source would return.
+
+    The server and every executor worker have their own store over the same
+    directory: conversions and manifest updates take an exclusive `flock` on
+    `manifest.lock`, so a file is converted once and no process overwrites
+    another's manifest entries.
+    """
+
+    def __init__(self, data_dir: str, cache_dir: str = COLUMNAR_CACHE_DIR, format: str = COLUMNAR_FORMAT):
+        if format not in COLUMNAR_EXTENSIONS:
+            raise ValueError(f"Unsupported columnar format '{format}', expected one of {sorted(COLUMNAR_EXTENSIONS)}")
+        self.data_dir = os.path.realpath(data_dir)
+        self.cache_dir = cache_dir
+        self.format = format
+        self._manifest_path = os.path.join(cache_dir, "manifest.json")
+        self._lock_path = os.path.join(cache_dir, "manifest.lock")
+        self._manifest: Dict[str, dict] = {}
+        self._manifest_mtime_ns: Optional[int] = None
+        self._lock = threading.Lock()
+        self._materialize_lock = threading.Lock()
+        self._pending: Set[str] = set()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _load_manifest(self):
+        """Re-read the manifest if another process (or an earlier run) rewrote it."""
+        try:
+            mtime_ns = os.stat(self._manifest_path).st_mtime_ns
+        except OSError:
+            return
+        if mtime_ns == self._manifest_mtime_ns:
+            return
+        try:
+            with open(self._manifest_path) as f:
+                self._manifest = json.load(f)
+            self._manifest_mtime_ns = mtime_ns
+        except (OSError, ValueError) as e:
+            logger.warning("Could not read columnar manifest %s: %s", self._manifest_path, e)
+
+    def _save_manifest(self):
+        tmp_path = f"{self._manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self._manifest_path)
+        self._manifest_mtime_ns = os.stat(self._manifest_path).st_mtime_ns
+
+    @contextmanager
+    def _exclusive(self):
+        """Hold the store's lock against the other threads and processes converting into it."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with self._materialize_lock, open(self._lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def is_dataset(self, source) -> bool:
+        """Only plain CSV paths directly inside the data directory are materialized (no globs, buffers or URLs)."""
+        if not isinstance(source, (str, os.PathLike)):
+            return False
+        path = os.path.realpath(source)
+        return os.path.dirname(path) == self.data_dir and path.endswith(".csv")
+
+    def resolve(self, source) -> Optional[str]:
+        """Path of an up-to-date columnar copy of `source`, or None if it has to be read as CSV."""
+        if not self.is_dataset(source):
+            return None
+        path = os.path.realpath(source)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+
+        with self._lock:
+            self._load_manifest()
+            entry = self._manifest.get(path)
+        if (
+            entry is not None
+            and entry["format"] == self.format
+            and entry["mtime_ns"] == stat.st_mtime_ns
+            and entry["size"] == stat.st_size
+            and os.path.exists(entry["path"])
+        ):
+            return entry["path"]
+        return None
+
+    def materialize(self, source: str) -> Optional[str]:
+        """Convert `source` unless an up-to-date copy exists. Returns the copy's path, or None on failure."""
+        path = os.path.realpath(source)
+        if (columnar_path := self.resolve(path)) is not None:
+            return columnar_path
+
+        with self._exclusive():
+            # Another process may have converted it while this one waited for the lock
+            if (columnar_path := self.resolve(path)) is not None:
+                return columnar_path
+            try:
+                stat = os.stat(path)
+                digest = file_hash(path)
+                columnar_path = os.path.join(
+                    os.path.realpath(self.cache_dir),
+                    f"{os.path.basename(path)[:-len('.csv')]}-{digest}.{COLUMNAR_EXTENSIONS[self.format]}",
+                )
+                if not os.path.exists(columnar_path):
+                    self._convert(path, columnar_path)
+                    logger.info("Materialized %s as %s", path, columnar_path)
+            except Exception as e:
+                logger.warning("Could not materialize %s as %s, it will be read as CSV: %s", path, self.format, e)
+                return None
+
+            with self._lock:
+                self._load_manifest()
+                previous = self._manifest.get(path)
+                self._manifest[path] = {
+                    "mtime_ns": stat.st_mtime_ns,
+                    "size": stat.st_size,
+                    "hash": digest,
+                    "format": self.format,
+                    "path": columnar_path,
+                }
+                self._save_manifest()
+                if previous is not None and previous["path"] != columnar_path:
+                    self._remove_unreferenced(previous["path"])
+        return columnar_path
+
+    def _convert(self, path: str, columnar_path: str):
+        tmp_path = f"{columnar_path}.{os.getpid()}.tmp"
+        lazy_frame = pl.scan_csv(path)
+        try:
+            if self.format == "ipc":
+                lazy_frame.sink_ipc(tmp_path, compression="uncompressed")
+            else:
+                lazy_frame.sink_parquet(tmp_path)
+            os.replace(tmp_path, columnar_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _remove_unreferenced(self, columnar_path: str):
+        if any(entry["path"] == columnar_path for entry in self._manifest.values()):
+            return
+        try:
+            os.remove(columnar_path)
+        except OSError:
+            pass
+
+    def schedule(self, source: str):
+        """Materialize `source` on the background worker, once at a time per file."""
+        path = os.path.realpath(source)
+        with self._lock:
+            if path in self._pending:
+                return
+            self._pending.add(path)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="columnar")
+
+        def run():
+            try:
+                self.materialize(path)
+            finally:
+                with self._lock:
+                    self._pending.discard(path)
+
+        self._executor.submit(run)
+
+    def sync(self, sources):
+        """Schedule conversion of every dataset that has no up-to-date copy."""
+        for source in sources:
+            if self.is_dataset(source) and self.resolve(source) is None:
+                self.schedule(source)
+
+
+def columnar_polars(store: ColumnarStore, on_miss: Optional[Callable[[str], None]] = None) -> types.ModuleType:
+    """
+    A stand-in for the `polars` module whose `scan_csv`/`read_csv` read the
+    columnar copy of a dataset when one is up to date. Everything else is polars.
+
+    `on_miss` is called with the path of a dataset that had to be read as CSV.
+    """
+    scan_columnar = pl.scan_ipc if store.format == "ipc" else pl.scan_parquet
+    read_columnar = pl.read_ipc if store.format == "ipc" else pl.read_parquet
+
+    def _columnar_source(source, kwargs, passthrough) -> Optional[str]:
+        if not kwargs.keys() <= passthrough:
+            return None
+        columnar_path = store.resolve(source)
+        if columnar_path is None and on_miss is not None and store.is_dataset(source):
+            on_miss(os.path.realpath(source))
+        return columnar_path
+
+    def scan_csv(source, **kwargs):
+        columnar_path = _columnar_source(source, kwargs, _SCAN_PASSTHROUGH_KWARGS)
+        if columnar_path is None:
+            return pl.scan_csv(source, **kwargs)
+        return scan_columnar(columnar_path, **kwargs)
+
+    def read_csv(source, **kwargs):
+        columnar_path = _columnar_source(source, kwargs, _READ_PASSTHROUGH_KWARGS)
+        if columnar_path is None:
+            return pl.read_csv(source, **kwargs)
+        return read_columnar(columnar_path, **kwargs)
+
+    scan_csv.__doc__ = pl.scan_csv.__doc__
+    read_csv.__doc__ = pl.read_csv.__doc__
+
+    module = types.ModuleType("polars", pl.__doc__)
+    module.__dict__.update({name: value for name, value in vars(pl).items() if not name.startswith("__")})
+    # Attributes polars itself resolves lazily
+    module.__getattr__ = lambda name: getattr(pl, name)
+    module.scan_csv = scan_csv
+    module.read_csv = read_csv
+    return module
+
+
+_stores: Dict[str, ColumnarStore] = {}
+_user_polars: Optional[types.ModuleType] = None
+
+
+def get_columnar_store(data_dir: str = DATA_DIR) -> ColumnarStore:
+    """Return the process-wide columnar store for a data directory."""
+    key = os.path.realpath(data_dir)
+    if key not in _stores:
+        _stores[key] = ColumnarStore(data_dir)
+    return _stores[key]
+
+
+def get_polars() -> types.ModuleType:
+    """
+    The `polars` module handed to user code: dataset reads are served from the
+    resident frame cache, loaded from the columnar copies (each layer unless
+    DATASET_CACHE_ENABLED / COLUMNAR_ENABLED is off).
+    """
+    global _user_polars
+    if _user_polars is None:
+        module = pl
+        if COLUMNAR_ENABLED:
+            store = get_columnar_store()
+            module = columnar_polars(store, on_miss=store.schedule)
+        if DATASET_CACHE_ENABLED:
+            module = cached_polars(dataset_frame_cache, module)
+        _user_polars = module
+    return _user_polars
@@ -0,0 +1,153 @@
+import csv
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import polars as pl
+
+
+logger = logging.getLogger(__name__)
+
+
+DATA_DIR = os.getenv("DATA_DIR", "./data")
+# Seconds between directory re-scans; changed files are re-parsed, unchanged ones served from memory
+CATALOG_REFRESH_INTERVAL = float(os.getenv("CATALOG_REFRESH_INTERVAL", "5"))
+CATALOG_SNIFF_BYTES = 64 * 1024
+CATALOG_INFER_SCHEMA_ROWS = 1000
+
+
+@dataclass
+class DatasetInfo:
+    file: str
+    path: str
+    size_bytes: int
+    mtime_ns: int
+    headers: List[str] = field(default_factory=list)
+    dtypes: Dict[str, str] = field(default_factory=dict)
+    rows: Optional[int] = None
+    delimiter: str = ","
+    error: Optional[str] = None
+
+    @property
+    def version(self) -> Tuple[int, int]:
+        return self.mtime_ns, self.size_bytes
+
+    def matches(self, keyword: str) -> bool:
+        keyword = keyword.casefold()
+        return keyword in self.file.casefold() or any(keyword in header.casefold() for header in self.headers)
+
+    def to_dict(self) -> dict:
+        info = asdict(self)
+        del info["path"], info["mtime_ns"]
+        if info["error"] is None:
+            del info["error"]
+        return info
+
+
+def _sniff_dialect(sample: str) -> type[csv.Dialect] | csv.Dialect:
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=",;\t|")
+    except csv.Error:
+        return csv.excel
+
+
+def inspect_csv(path: str, stat: os.stat_result) -> DatasetInfo:
+    """Parse the header with a sniffed CSV dialect, then infer dtypes and count rows with polars."""
+    info = DatasetInfo(
+        file=os.path.basename(path),
+        path=path,
+        size_bytes=stat.st_size,
+        mtime_ns=stat.st_mtime_ns,
+    )
+    try:
+        with open(path, "r", newline="") as f:
+            sample = f.read(CATALOG_SNIFF_BYTES)
+        dialect = _sniff_dialect(sample)
+        info.delimiter = dialect.delimiter
+        info.headers = next(csv.reader(sample.splitlines(), dialect), [])
+
+        lazy_frame = pl.scan_csv(
+            path,
+            separator=info.delimiter,
+            quote_char=dialect.quotechar or '"',
+            infer_schema_length=CATALOG_INFER_SCHEMA_ROWS,
+        )
+        info.dtypes = {name: str(dtype) for name, dtype in lazy_frame.collect_schema().items()}
+        info.rows = lazy_frame.select(pl.len()).collect().item()
+    except Exception as e:
+        logger.warning("Could not inspect dataset %s: %s", path, e)
+        info.error = str(e)
+    return info
+
+
+class DatasetCatalog:
+    """
+    In-memory index of the datasets in a directory.
+
+    The directory is scanned once up front. Afterwards it is re-listed at most
+    every `refresh_interval` seconds, and only files whose mtime or size
+    changed are parsed again, so lookups are served from memory.
+    """
+
+    def __init__(self, path: str, extension: str = "csv", refresh_interval: float = CATALOG_REFRESH_INTERVAL):
+        self.path = path
+        self.extension = extension
+        self.refresh_interval = refresh_interval
+        self._datasets: Dict[str, DatasetInfo] = {}
+        self._refreshed_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_stale(self) -> bool:
+        return self._refreshed_at is None or time.monotonic() - self._refreshed_at >= self.refresh_interval
+
+    def refresh(self, force: bool = False) -> bool:
+        """Re-list the directory and re-parse changed files. Returns True if anything changed."""
+        with self._lock:
+            if not force and not self.is_stale:
+                return False
+
+            suffix = f".{self.extension}"
+            current: Dict[str, DatasetInfo] = {}
+            changed = False
+            with os.scandir(self.path) as entries:
+                for entry in entries:
+                    if not entry.name.endswith(suffix) or not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                    known = self._datasets.get(entry.name)
+                    if known is not None and known.version == (stat.st_mtime_ns, stat.st_size):
+                        current[entry.name] = known
+                    else:
+                        current[entry.name] = inspect_csv(entry.path, stat)
+                        changed = True
+
+            changed = changed or current.keys() != self._datasets.keys()
+            if changed:
+                logger.info("Dataset catalog for %s updated: %s", self.path, sorted(current))
+            self._datasets = dict(sorted(current.items()))
+            self._refreshed_at = time.monotonic()
+            return changed
+
+    def list(self, keyword: Optional[str] = None) -> List[DatasetInfo]:
+        datasets = list(self._datasets.values())
+        if keyword:
+            datasets = [dataset for dataset in datasets if dataset.matches(keyword)]
+        return datasets
+
+    def get(self, file: str) -> Optional[DatasetInfo]:
+        return self._datasets.get(file)
+
+
+_catalogs: Dict[Tuple[str, str], DatasetCatalog] = {}
+
+
+def get_catalog(path: str, extension: str = "csv") -> DatasetCatalog:
+    """Return the process-wide catalog for a directory, creating it on first use."""
+    key = (os.path.realpath(path), extension)
+    if key not in _catalogs:
+        _catalogs[key] = DatasetCatalog(path, extension)
+    return _catalogs[key]
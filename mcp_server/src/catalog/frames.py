@@ -0,0 +1,189 @@
+"""
+Resident copies of the hot datasets, shared by the code_executor runs of a worker.
+
+The first plain `pl.scan_csv`/`pl.read_csv` of a dataset in the data
+directory loads it into a DataFrame (from its columnar copy when there is
+one); later runs in the same worker get a lazy/eager view of that frame
+instead of reading the file again. Frames are kept under a memory budget
+with LRU or LFU eviction, and a frame whose file changed (mtime or size) is
+dropped and reloaded on its next use.
+
+Each executor worker process has its own cache, so the budget is per worker.
+"""
+import logging
+import os
+import threading
+import types
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+import polars as pl
+
+from src.catalog.datasets import DATA_DIR
+
+
+logger = logging.getLogger(__name__)
+
+
+DATASET_CACHE_ENABLED = os.getenv("DATASET_CACHE_ENABLED", "true").lower() == "true"
+# Memory budget per executor worker, by polars' estimate of the frames' size
+DATASET_CACHE_MAX_BYTES = int(os.getenv("DATASET_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# Files bigger than this on disk are never loaded whole: scans of them keep their pushdowns
+DATASET_CACHE_MAX_FILE_BYTES = int(os.getenv("DATASET_CACHE_MAX_FILE_BYTES", str(32 * 1024 * 1024)))
+# "lru" evicts the least recently used frame, "lfu" the least used one (least recently used among ties)
+DATASET_CACHE_POLICY = os.getenv("DATASET_CACHE_POLICY", "lru")
+
+# Counters of `stats()` that count events (the others are sizes)
+FRAME_CACHE_EVENTS = ("hits", "misses", "evictions", "invalidations")
+
+# Keyword arguments that do not change what a plain read returns (`n_rows` is applied to the cached frame)
+_PASSTHROUGH_KWARGS = {"n_rows", "cache", "rechunk"}
+
+
+@dataclass
+class _Entry:
+    frame: pl.DataFrame
+    version: Tuple[int, int]
+    size_bytes: int
+    uses: int = 0
+
+
+class DatasetFrameCache:
+    """Memory-budgeted cache of dataset DataFrames keyed by path, valid while the file's mtime and size are unchanged."""
+
+    def __init__(
+        self,
+        data_dir: str = DATA_DIR,
+        max_bytes: int = DATASET_CACHE_MAX_BYTES,
+        max_file_bytes: int = DATASET_CACHE_MAX_FILE_BYTES,
+        policy: str = DATASET_CACHE_POLICY,
+    ):
+        if policy not in ("lru", "lfu"):
+            raise ValueError(f"Unsupported dataset cache policy '{policy}', expected 'lru' or 'lfu'")
+        self.data_dir = os.path.realpath(data_dir)
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self.policy = policy
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def is_dataset(self, source) -> bool:
+        """Only plain CSV paths directly inside the data directory are cached (no globs, buffers or URLs)."""
+        if not isinstance(source, (str, os.PathLike)):
+            return False
+        path = os.path.realpath(source)
+        return os.path.dirname(path) == self.data_dir and path.endswith(".csv")
+
+    def get(self, source, load: Callable[[str], pl.DataFrame]) -> Optional[pl.DataFrame]:
+        """
+        The frame of a dataset, loaded with `load(path)` on a miss. None if the
+        dataset is not cacheable (not in the data directory, missing, too big).
+        """
+        if not self.is_dataset(source):
+            return None
+        path = os.path.realpath(source)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        version = (stat.st_mtime_ns, stat.st_size)
+        if stat.st_size > self.max_file_bytes:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.version != version:
+                self._remove(path)
+                self.invalidations += 1
+                entry = None
+            if entry is not None:
+                entry.uses += 1
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry.frame
+            self.misses += 1
+
+        frame = load(path)
+        size_bytes = frame.estimated_size()
+        if size_bytes > self.max_bytes:
+            logger.info("Not caching %s: %s bytes exceed the dataset cache budget", path, size_bytes)
+            return frame
+
+        with self._lock:
+            if path in self._entries:
+                self._remove(path)
+            self._entries[path] = _Entry(frame, version, size_bytes, uses=1)
+            self.total_bytes += size_bytes
+            while self.total_bytes > self.max_bytes:
+                self._remove(self._victim())
+                self.evictions += 1
+        return frame
+
+    def _victim(self) -> str:
+        if self.policy == "lfu":
+            # min() keeps the first of equal counts, i.e. the least recently used
+            return min(self._entries, key=lambda path: self._entries[path].uses)
+        return next(iter(self._entries))
+
+    def _remove(self, path: str):
+        entry = self._entries.pop(path)
+        self.total_bytes -= entry.size_bytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+def cached_polars(frames: DatasetFrameCache, base: types.ModuleType) -> types.ModuleType:
+    """
+    A stand-in for the `polars` module `base` whose `scan_csv`/`read_csv` of a
+    dataset return a view of its cached frame. Other calls, and reads with
+    parsing options, go to `base`.
+    """
+
+    def _cached_frame(source, kwargs) -> Optional[pl.DataFrame]:
+        if not kwargs.keys() <= _PASSTHROUGH_KWARGS:
+            return None
+        frame = frames.get(source, base.read_csv)
+        if frame is not None and kwargs.get("n_rows") is not None:
+            frame = frame.head(kwargs["n_rows"])
+        return frame
+
+    def scan_csv(source, **kwargs):
+        frame = _cached_frame(source, kwargs)
+        return base.scan_csv(source, **kwargs) if frame is None else frame.lazy()
+
+    def read_csv(source, **kwargs):
+        frame = _cached_frame(source, kwargs)
+        # A clone shares the column buffers, so in-place methods cannot change the cached frame
+        return base.read_csv(source, **kwargs) if frame is None else frame.clone()
+
+    scan_csv.__doc__ = pl.scan_csv.__doc__
+    read_csv.__doc__ = pl.read_csv.__doc__
+
+    module = types.ModuleType("polars", pl.__doc__)
+    module.__dict__.update({name: value for name, value in vars(base).items() if not name.startswith("__")})
+    module.__getattr__ = lambda name: getattr(pl, name)
+    module.scan_csv = scan_csv
+    module.read_csv = read_csv
+    return module
+
+
+dataset_frame_cache = DatasetFrameCache()
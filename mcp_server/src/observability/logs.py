@@ -0,0 +1,101 @@
+"""
+Logging setup shared by the service's modules.
+
+Modules log through `logging.getLogger(__name__)` with %-style arguments, so
+nothing is formatted unless the record is emitted. Large payloads (results,
+code, configs) are wrapped in `preview(...)`, which truncates their text only
+when a handler actually renders the record.
+
+Configuration, from the environment:
+    LOG_LEVEL           root level, or OFF to disable logging entirely (default INFO)
+    LOG_LEVELS          per-logger levels, e.g. "src.security=DEBUG,httpx=WARNING"
+    LOG_FORMAT          "json" (one object per line) or "text" (default json)
+    LOG_PREVIEW_CHARS   characters of a payload kept by `preview` (default 200)
+
+Identical copy in backend/ and mcp_server/ (each service is built and
+deployed on its own); change both together.
+"""
+import json
+import logging
+import os
+import sys
+import time
+from typing import Any, Dict, Optional
+
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# httpx logs every request at INFO
+LOG_LEVELS = os.getenv("LOG_LEVELS", "httpx=WARNING")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_PREVIEW_CHARS = int(os.getenv("LOG_PREVIEW_CHARS", "200"))
+
+# Attributes every LogRecord has; anything else was passed through `extra=` and is emitted as a field
+_RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+
+class preview:
+    """Deferred, truncated `str()` of a value, for use as a logging argument."""
+
+    __slots__ = ("value", "limit")
+
+    def __init__(self, value: Any, limit: Optional[int] = None):
+        self.value = value
+        self.limit = LOG_PREVIEW_CHARS if limit is None else limit
+
+    def __str__(self) -> str:
+        text = str(self.value)
+        if len(text) <= self.limit:
+            return text
+        return f"{text[:self.limit]}... ({len(text)} chars)"
+
+    __repr__ = __str__
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message, `extra` fields and the exception if any."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def _parse_levels(spec: str) -> Dict[str, str]:
+    levels = {}
+    for item in spec.split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging(level: str = LOG_LEVEL, levels: str = LOG_LEVELS, log_format: str = LOG_FORMAT):
+    """Install the root handler; replaces any handler configured before (e.g. by basicConfig)."""
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+
+    if level == "OFF":
+        # logging.disable short-circuits every call before a record is even created
+        logging.disable(logging.CRITICAL)
+        return
+    logging.disable(logging.NOTSET)
+
+    handler = logging.StreamHandler(sys.stderr)
+    if log_format == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    root.addHandler(handler)
+    root.setLevel(level)
+    for name, logger_level in _parse_levels(levels).items():
+        logging.getLogger(name).setLevel(logger_level)
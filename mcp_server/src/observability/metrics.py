@@ -0,0 +1,61 @@
+"""
+Prometheus metrics of the MCP server, served on `/metrics`.
+
+Per-call values (tool latency, executor job usage) are histograms observed
+as calls finish. Component stats that are already kept elsewhere (result
+cache, executor queue) are registered with `register_stats` and read at
+scrape time instead of being mirrored.
+"""
+from prometheus_client import Counter, Histogram
+
+from src.catalog.frames import FRAME_CACHE_EVENTS
+from src.observability.stats import register_stats, render_metrics  # noqa: F401  (re-exported)
+from src.security.governor import JobUsage
+
+
+_SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+_BYTES_BUCKETS = tuple(2 ** power for power in range(10, 34, 2))
+
+TOOL_CALL_SECONDS = Histogram(
+    "mcp_tool_call_seconds", "MCP tool call latency", ["tool", "status"], buckets=_SECONDS_BUCKETS
+)
+EXECUTOR_JOBS = Counter("executor_jobs_total", "code_executor jobs by outcome", ["outcome"])
+EXECUTOR_QUEUE_SECONDS = Histogram(
+    "executor_queue_seconds", "Time a job waited for a free worker", buckets=_SECONDS_BUCKETS
+)
+EXECUTOR_WALL_SECONDS = Histogram("executor_wall_seconds", "Wall time of a job in its worker", buckets=_SECONDS_BUCKETS)
+EXECUTOR_CPU_SECONDS = Histogram("executor_cpu_seconds", "CPU time of a job (all threads)", buckets=_SECONDS_BUCKETS)
+EXECUTOR_STAGE_SECONDS = Histogram(
+    "executor_stage_seconds", "Time of a job's compile, execute and serialize stages", ["stage"],
+    buckets=_SECONDS_BUCKETS,
+)
+EXECUTOR_PEAK_RSS_BYTES = Histogram(
+    "executor_peak_rss_bytes", "Peak resident memory of the worker while running a job", buckets=_BYTES_BUCKETS
+)
+EXECUTOR_RESULT_BYTES = Histogram(
+    "executor_result_bytes", "Size of a job's serialized result", buckets=_BYTES_BUCKETS
+)
+DATASET_CACHE_EVENTS = Counter(
+    "dataset_cache_events_total", "Dataset frame cache hits, misses, evictions and invalidations in the workers",
+    ["event"],
+)
+
+
+def observe_job(usage: JobUsage):
+    EXECUTOR_JOBS.labels(usage.error_type or "ok").inc()
+    if usage.error_type in ("queue_full", "no_workers"):
+        # Rejected before reaching a worker
+        return
+    EXECUTOR_QUEUE_SECONDS.observe(usage.queue_seconds)
+    EXECUTOR_WALL_SECONDS.observe(usage.wall_seconds)
+    if usage.cpu_seconds:
+        EXECUTOR_CPU_SECONDS.observe(usage.cpu_seconds)
+    if usage.peak_rss_bytes:
+        EXECUTOR_PEAK_RSS_BYTES.observe(usage.peak_rss_bytes)
+    if usage.result_bytes:
+        EXECUTOR_RESULT_BYTES.observe(usage.result_bytes)
+    for stage, seconds in usage.stages.items():
+        EXECUTOR_STAGE_SECONDS.labels(stage).observe(seconds)
+    for event in FRAME_CACHE_EVENTS:
+        if usage.dataset_cache.get(event):
+            DATASET_CACHE_EVENTS.labels(event).inc(usage.dataset_cache[event])
@@ -30,7 +30,9 @@ class ASTSafetyAnalyzer(ast.NodeVisitor):
         self.generic_visit(node)
 
     def analyze(self, code_string):
+        return self.analyze_tree(ast.parse(code_string))
+
+    def analyze_tree(self, tree):
         self.unsafe = []
-        tree = ast.parse(code_string)
         self.visit(tree)
         return not self.unsafe, self.unsafe
\ No newline at end of file
@@ -0,0 +1,147 @@
+"""
+Resource limits and accounting for `code_executor` jobs.
+
+Limits are enforced in two places: the worker process applies kernel limits
+to itself (address space, CPU seconds per job, Polars thread count), and the
+parent watches wall-clock time and resident memory while it waits.
+"""
+import collections
+import os
+import resource
+import signal
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, Deque, Dict, Optional
+
+
+EXECUTOR_TIMEOUT = float(os.getenv("EXECUTOR_TIMEOUT", "60"))
+# CPU seconds (all threads) a single job may use; 0 disables the limit
+EXECUTOR_CPU_LIMIT = int(os.getenv("EXECUTOR_CPU_LIMIT", "120"))
+# Resident memory a worker may use while running a job; 0 disables the check
+EXECUTOR_MEMORY_LIMIT_MB = int(os.getenv("EXECUTOR_MEMORY_LIMIT_MB", "2048"))
+# Virtual address space cap of a worker (RLIMIT_AS); 0 disables it. Polars reserves far more
+# address space than it touches, so keep this well above the resident limit if used.
+EXECUTOR_ADDRESS_SPACE_MB = int(os.getenv("EXECUTOR_ADDRESS_SPACE_MB", "0"))
+# Polars threads per worker; 0 splits the machine's cores evenly between the workers
+EXECUTOR_POLARS_THREADS = int(os.getenv("EXECUTOR_POLARS_THREADS", "0"))
+# Largest result (pickled) a worker may send back
+EXECUTOR_MAX_RESULT_BYTES = int(os.getenv("EXECUTOR_MAX_RESULT_BYTES", str(8 * 1024 * 1024)))
+# Finished jobs kept for export
+EXECUTOR_RECENT_JOBS = 256
+
+
+class ResourceLimitExceeded(Exception):
+    """A job crossed one of its limits; `error_type` is the machine-readable reason."""
+
+    def __init__(self, error_type: str, message: str):
+        super().__init__(message)
+        self.error_type = error_type
+
+
+@dataclass(frozen=True)
+class ResourceLimits:
+    timeout: float = EXECUTOR_TIMEOUT
+    cpu_seconds: int = EXECUTOR_CPU_LIMIT
+    memory_mb: int = EXECUTOR_MEMORY_LIMIT_MB
+    address_space_mb: int = EXECUTOR_ADDRESS_SPACE_MB
+    polars_threads: int = EXECUTOR_POLARS_THREADS
+    max_result_bytes: int = EXECUTOR_MAX_RESULT_BYTES
+
+    def threads_per_worker(self, pool_size: int) -> int:
+        if self.polars_threads > 0:
+            return self.polars_threads
+        return max(1, (os.cpu_count() or 1) // max(1, pool_size))
+
+
+@dataclass
+class JobUsage:
+    """What a job consumed; `error_type` is None for jobs that finished within their limits."""
+    queue_seconds: float = 0.0
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    peak_rss_bytes: int = 0
+    result_bytes: int = 0
+    # Seconds per pipeline stage (compile, execute, serialize) as timed in the worker
+    stages: Dict[str, float] = field(default_factory=dict)
+    # Dataset frame cache events of the job (hits, misses, evictions, invalidations),
+    # and the frames (entries, bytes) resident in its worker afterwards
+    dataset_cache: Dict[str, int] = field(default_factory=dict)
+    error_type: Optional[str] = None
+    finished_at: float = field(default_factory=time.time)
+
+
+def error_result(error_type: str, message: str) -> Dict[str, Any]:
+    return {"status": "error", "error_type": error_type, "message": message}
+
+
+def apply_worker_limits(limits: ResourceLimits, pool_size: int):
+    """Called once in a fresh worker, before Polars starts its thread pool."""
+    os.environ["POLARS_MAX_THREADS"] = str(limits.threads_per_worker(pool_size))
+    if limits.address_space_mb:
+        cap = limits.address_space_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (cap, cap))
+
+
+def process_cpu_seconds() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+@contextmanager
+def cpu_limit(seconds: int):
+    """
+    Let the current job use `seconds` more CPU seconds. RLIMIT_CPU counts the
+    whole process, so the soft limit is moved to "used so far + budget" for
+    each job; crossing it delivers SIGXCPU, which terminates the worker.
+    """
+    if not seconds:
+        yield
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = int(process_cpu_seconds()) + seconds + 1
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+    try:
+        yield
+    finally:
+        resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+
+
+def exit_reason(exitcode: Optional[int]) -> ResourceLimitExceeded:
+    """Map how a worker died to the limit it crossed."""
+    if exitcode == -signal.SIGXCPU:
+        return ResourceLimitExceeded("cpu_limit", "Execution exceeded its CPU time limit")
+    if exitcode == -signal.SIGKILL:
+        return ResourceLimitExceeded("memory_limit", "Execution was killed, most likely out of memory")
+    return ResourceLimitExceeded("crashed", f"Executor worker crashed (exit code {exitcode})")
+
+
+class ResourceGovernor:
+    """Aggregates the usage of finished jobs, per outcome, for export."""
+
+    def __init__(self, recent: int = EXECUTOR_RECENT_JOBS):
+        self._lock = threading.Lock()
+        self._recent: Deque[JobUsage] = collections.deque(maxlen=recent)
+        self.jobs: Dict[str, int] = collections.Counter()
+        self.totals: Dict[str, float] = collections.Counter()
+
+    def record(self, usage: JobUsage):
+        with self._lock:
+            self._recent.append(usage)
+            self.jobs[usage.error_type or "ok"] += 1
+            self.totals["queue_seconds"] += usage.queue_seconds
+            self.totals["wall_seconds"] += usage.wall_seconds
+            self.totals["cpu_seconds"] += usage.cpu_seconds
+            self.totals["result_bytes"] += usage.result_bytes
+
+    def recent(self):
+        with self._lock:
+            return [asdict(usage) for usage in self._recent]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            peak_rss = max((usage.peak_rss_bytes for usage in self._recent), default=0)
+            return {"jobs": dict(self.jobs), "totals": dict(self.totals), "recent_peak_rss_bytes": peak_rss}
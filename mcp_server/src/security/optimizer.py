@@ -0,0 +1,327 @@
+"""
+Rewrites generated Polars code so the lazy engine sees as much of the query as possible.
+
+Models often load a whole file eagerly (`pl.read_csv`) or `.collect()` a
+frame and only then filter it, which keeps Polars from pushing filters,
+projections and limits into the scan. `QueryOptimizer` runs after the safety
+analysis, on a copy of the snippet's AST:
+
+    - `pl.read_csv("<path>", ...)` becomes `pl.scan_csv("<path>", ...).collect()`
+      (`columns=[<names>]` becomes a `.select(...)` of those names in file
+      order; column indices, or names not given as literals, keep the read eager)
+    - `.collect()` is moved past the frame methods that follow it
+      (`.collect().filter(e).head(5)` -> `.filter(e).head(5).collect()`,
+      `.group_by(k).agg(...)` included), as long as their arguments are
+      Polars expressions or literals
+    - a frame collected into a variable that is used exactly once, later, at
+      the top level, stays lazy and is collected at that use instead, so the
+      use's methods join the plan
+    - the final result, if it is a collected frame, is limited to
+      `row_limit` rows (plus one, so the pipeline can tell it was cut)
+
+With the `src.security.optimizer` logger at DEBUG, the rewrites and the
+`explain()` plan of the final result are logged.
+"""
+import ast
+import copy
+import os
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+
+OPTIMIZER_ENABLED = os.getenv("OPTIMIZER_ENABLED", "true").lower() == "true"
+# Rows of the final result frame; 0 disables the limit
+OPTIMIZER_ROW_LIMIT = int(os.getenv("OPTIMIZER_ROW_LIMIT", "100000"))
+
+POLARS_NAMES = {"pl", "polars"}
+
+# DataFrame methods that mean the same on a LazyFrame (and return one)
+LAZY_METHODS = {
+    "filter", "select", "with_columns", "with_row_index", "sort", "head", "limit", "tail", "slice",
+    "unique", "drop", "drop_nulls", "fill_null", "fill_nan", "rename", "cast", "explode", "reverse",
+    "top_k", "bottom_k", "sum", "mean", "median", "min", "max", "std", "var", "count", "null_count",
+}
+# Methods of a group-by that turn it back into a frame
+GROUP_BY_METHODS = {
+    "agg", "head", "tail", "sum", "mean", "median", "min", "max", "first", "last", "len", "count", "n_unique",
+}
+
+# `read_csv` keyword arguments that `scan_csv` takes with the same meaning
+SCAN_CSV_KWARGS = {
+    "has_header", "separator", "comment_prefix", "quote_char", "skip_rows", "schema", "schema_overrides",
+    "null_values", "missing_utf8_is_empty_string", "ignore_errors", "try_parse_dates", "infer_schema",
+    "infer_schema_length", "n_rows", "low_memory", "rechunk", "skip_rows_after_header",
+    "row_index_name", "row_index_offset", "eol_char", "raise_if_empty", "truncate_ragged_lines", "decimal_comma",
+}
+
+_SCOPES = (ast.For, ast.AsyncFor, ast.While, ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef,
+           ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)
+
+
+@dataclass
+class OptimizedQuery:
+    tree: ast.Module
+    rewrites: List[str] = field(default_factory=list)
+    # The lazy plan of the final result, for `explain()`; only set when building it again reads no data
+    plan: Optional[ast.expr] = None
+    # Rows the final result is cut to, if the limit was applied
+    row_limit: Optional[int] = None
+
+
+def _method_call(node, names=None) -> bool:
+    return (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Attribute)
+        and (names is None or node.func.attr in names)
+    )
+
+
+def _is_collect(node) -> bool:
+    """A plain `<frame>.collect()` (no engine options)."""
+    return _method_call(node, {"collect"}) and not node.args and not node.keywords
+
+
+def _polars_call(node, name: str) -> bool:
+    return (
+        _method_call(node, {name})
+        and isinstance(node.func.value, ast.Name)
+        and node.func.value.id in POLARS_NAMES
+    )
+
+
+def _is_plan_safe(node) -> bool:
+    """Literals, and expressions built from `pl.*` calls: valid as arguments of both frame kinds."""
+    if isinstance(node, ast.Constant):
+        return True
+    if isinstance(node, (ast.List, ast.Tuple)):
+        return all(_is_plan_safe(element) for element in node.elts)
+    if isinstance(node, ast.Dict):
+        return all(key is not None and _is_plan_safe(key) for key in node.keys) and all(map(_is_plan_safe, node.values))
+    if isinstance(node, ast.UnaryOp):
+        return _is_plan_safe(node.operand)
+    if isinstance(node, ast.BinOp):
+        return _is_plan_safe(node.left) and _is_plan_safe(node.right)
+    if isinstance(node, ast.BoolOp):
+        return all(map(_is_plan_safe, node.values))
+    if isinstance(node, ast.Compare):
+        return _is_plan_safe(node.left) and all(map(_is_plan_safe, node.comparators))
+    if isinstance(node, ast.Attribute):
+        return _is_plan_safe(node.value)
+    if isinstance(node, ast.Call):
+        return _is_plan_safe(node.func) and _args_plan_safe(node)
+    if isinstance(node, ast.Name):
+        return node.id in POLARS_NAMES
+    return False
+
+
+def _args_plan_safe(call: ast.Call) -> bool:
+    return all(map(_is_plan_safe, call.args)) and all(_is_plan_safe(keyword.value) for keyword in call.keywords)
+
+
+def _column_names(node) -> bool:
+    """A literal list of distinct column names (`read_csv` also takes indices, which `select` does not)."""
+    return (
+        isinstance(node, (ast.List, ast.Tuple))
+        and bool(node.elts)
+        and all(isinstance(element, ast.Constant) and isinstance(element.value, str) for element in node.elts)
+        and len({element.value for element in node.elts}) == len(node.elts)
+    )
+
+
+def _select_in_file_order(polars: ast.expr, names: ast.expr) -> ast.expr:
+    """`pl.selectors.by_name(*names) & pl.selectors.all()`: a set operation keeps the schema's order, like `read_csv`."""
+    selectors = ast.Attribute(value=polars, attr="selectors", ctx=ast.Load())
+    by_name = ast.Call(func=ast.Attribute(value=selectors, attr="by_name", ctx=ast.Load()), args=names.elts, keywords=[])
+    every = ast.Call(func=ast.Attribute(value=copy.deepcopy(selectors), attr="all", ctx=ast.Load()), args=[], keywords=[])
+    return ast.BinOp(left=by_name, op=ast.BitAnd(), right=every)
+
+
+def _rebuilds_lazily(node) -> bool:
+    """
+    A chain of lazy methods over `pl.scan_csv(...)` or a variable (`.lazy()`
+    only right on the variable): evaluating it again builds a LazyFrame
+    without reading any data or re-running eager code.
+    """
+    lazy_methods = LAZY_METHODS | GROUP_BY_METHODS | {"group_by"}
+    while _method_call(node):
+        if _polars_call(node, "scan_csv"):
+            return _args_plan_safe(node)
+        if node.func.attr == "lazy" and not node.args and not node.keywords:
+            return isinstance(node.func.value, ast.Name) and node.func.value.id not in POLARS_NAMES
+        if node.func.attr not in lazy_methods or not _args_plan_safe(node):
+            return False
+        node = node.func.value
+    return isinstance(node, ast.Name) and node.id not in POLARS_NAMES
+
+
+def _collect(node: ast.expr, like: ast.AST) -> ast.Call:
+    return ast.copy_location(ast.Call(func=ast.Attribute(value=node, attr="collect", ctx=ast.Load()), args=[], keywords=[]), like)
+
+
+class _LazyRewriter(ast.NodeTransformer):
+    """Bottom-up rewrite of eager reads, and of `.collect()` followed by frame methods."""
+
+    def __init__(self, rewrites: List[str]):
+        self.rewrites = rewrites
+
+    def visit_Call(self, node: ast.Call):
+        self.generic_visit(node)
+
+        if (
+            _polars_call(node, "read_csv")
+            and len(node.args) == 1
+            and isinstance(node.args[0], ast.Constant)
+            and isinstance(node.args[0].value, str)
+        ):
+            keywords = [keyword for keyword in node.keywords if keyword.arg != "columns"]
+            columns = [keyword.value for keyword in node.keywords if keyword.arg == "columns"]
+            if (
+                all(keyword.arg in SCAN_CSV_KWARGS for keyword in keywords)
+                and all(map(_column_names, columns))
+                # The row index column is not among the selected names, but `read_csv` keeps it
+                and not (columns and any(keyword.arg == "row_index_name" for keyword in keywords))
+            ):
+                scan = ast.Call(
+                    func=ast.Attribute(value=node.func.value, attr="scan_csv", ctx=ast.Load()),
+                    args=node.args, keywords=keywords,
+                )
+                if columns:
+                    select = _select_in_file_order(node.func.value, columns[0])
+                    scan = ast.Call(func=ast.Attribute(value=scan, attr="select", ctx=ast.Load()), args=[select], keywords=[])
+                self.rewrites.append("read_csv -> scan_csv")
+                return ast.copy_location(_collect(scan, node), node)
+
+        # <lazy>.collect().method(...) -> <lazy>.method(...).collect()
+        if _method_call(node, LAZY_METHODS) and _is_collect(node.func.value) and _args_plan_safe(node):
+            lazy = node.func.value.func.value
+            self.rewrites.append(f"collect pushed past {node.func.attr}")
+            return _collect(ast.Call(func=ast.Attribute(value=lazy, attr=node.func.attr, ctx=ast.Load()),
+                                     args=node.args, keywords=node.keywords), node)
+
+        # <lazy>.collect().group_by(...).agg(...) -> <lazy>.group_by(...).agg(...).collect()
+        if (
+            _method_call(node, GROUP_BY_METHODS)
+            and _method_call(node.func.value, {"group_by"})
+            and _is_collect(node.func.value.func.value)
+            and _args_plan_safe(node)
+            and _args_plan_safe(node.func.value)
+        ):
+            group_by = node.func.value
+            lazy = group_by.func.value.func.value
+            self.rewrites.append(f"collect pushed past group_by.{node.func.attr}")
+            lazy_group_by = ast.Call(func=ast.Attribute(value=lazy, attr="group_by", ctx=ast.Load()),
+                                     args=group_by.args, keywords=group_by.keywords)
+            return _collect(ast.Call(func=ast.Attribute(value=lazy_group_by, attr=node.func.attr, ctx=ast.Load()),
+                                     args=node.args, keywords=node.keywords), node)
+        return node
+
+
+class _NameUses(ast.NodeVisitor):
+    """Loads and stores of every name, and whether a load sits inside a loop, comprehension or function."""
+
+    def __init__(self):
+        self.loads = {}
+        self.stores = {}
+        self.nested = set()
+        self._depth = 0
+
+    def generic_visit(self, node):
+        nested = isinstance(node, _SCOPES)
+        self._depth += nested
+        super().generic_visit(node)
+        self._depth -= nested
+
+    def visit_Name(self, node: ast.Name):
+        counts = self.stores if isinstance(node.ctx, ast.Store) else self.loads
+        counts[node.id] = counts.get(node.id, 0) + 1
+        if self._depth:
+            self.nested.add(node.id)
+
+
+class _CollectAtUse(ast.NodeTransformer):
+    def __init__(self, name: str):
+        self.name = name
+
+    def visit_Name(self, node: ast.Name):
+        if node.id == self.name and isinstance(node.ctx, ast.Load):
+            return _collect(node, node)
+        return node
+
+
+class QueryOptimizer:
+    def __init__(self, row_limit: int = OPTIMIZER_ROW_LIMIT):
+        self.row_limit = row_limit
+
+    def optimize(self, tree: ast.Module) -> OptimizedQuery:
+        """Optimize a copy of a parsed snippet; the original tree is left untouched."""
+        tree = copy.deepcopy(tree)
+        rewrites: List[str] = []
+        rewriter = _LazyRewriter(rewrites)
+        tree = rewriter.visit(tree)
+        self._defer_single_use_collects(tree, rewriter)
+        plan, row_limit = self._limit_result(tree, rewrites)
+        if plan is not None and not _rebuilds_lazily(plan):
+            # Explaining it would evaluate eager parts of the query a second time
+            plan = None
+        return OptimizedQuery(ast.fix_missing_locations(tree), rewrites, plan, row_limit)
+
+    @staticmethod
+    def _defer_single_use_collects(tree: ast.Module, rewriter: _LazyRewriter):
+        """`df = <lazy>.collect()` used once later -> keep `df` lazy and collect it at its use."""
+        uses = _NameUses()
+        uses.visit(tree)
+        for index, statement in enumerate(tree.body):
+            if not (
+                isinstance(statement, ast.Assign)
+                and len(statement.targets) == 1
+                and isinstance(statement.targets[0], ast.Name)
+                and _is_collect(statement.value)
+            ):
+                continue
+            name = statement.targets[0].id
+            if uses.stores.get(name) != 1 or uses.loads.get(name) != 1 or name in uses.nested:
+                continue
+            use = next(
+                (later for later in tree.body[index + 1:]
+                 if any(isinstance(node, ast.Name) and node.id == name for node in ast.walk(later))),
+                None,
+            )
+            if use is None:
+                continue
+            statement.value = statement.value.func.value
+            tree.body[tree.body.index(use)] = rewriter.visit(_CollectAtUse(name).visit(use))
+            rewriter.rewrites.append(f"{name} kept lazy until its use")
+
+    def _limit_result(self, tree: ast.Module, rewrites: List[str]):
+        """Cap the final collected frame at `row_limit` rows; returns its lazy plan and the limit applied."""
+        if not tree.body or not isinstance(tree.body[-1], ast.Expr):
+            return None, None
+        final = tree.body[-1]
+        holder = final
+        if isinstance(final.value, ast.Name):
+            uses = _NameUses()
+            uses.visit(tree)
+            name = final.value.id
+            holder = next(
+                (statement for statement in reversed(tree.body[:-1])
+                 if isinstance(statement, ast.Assign)
+                 and len(statement.targets) == 1
+                 and isinstance(statement.targets[0], ast.Name)
+                 and statement.targets[0].id == name),
+                None,
+            )
+            if holder is None or uses.stores.get(name) != 1 or uses.loads.get(name) != 1:
+                return None, None
+        if not _method_call(holder.value, {"collect"}):
+            return None, None
+
+        lazy = holder.value.func.value
+        if self.row_limit <= 0:
+            return copy.deepcopy(lazy), None
+        limited = ast.Call(
+            func=ast.Attribute(value=lazy, attr="head", ctx=ast.Load()),
+            args=[ast.Constant(self.row_limit + 1)], keywords=[],
+        )
+        holder.value.func.value = ast.copy_location(limited, lazy)
+        rewrites.append(f"result limited to {self.row_limit} rows")
+        return copy.deepcopy(limited), self.row_limit
@@ -1,44 +1,157 @@
 from src.security.analyzer import ASTSafetyAnalyzer
-from src.security.restricted_executor import RestrictedPythonExecutor
+from src.security.optimizer import OPTIMIZER_ENABLED, QueryOptimizer
+from src.security.restricted_executor import EXECUTION_MODE, RestrictedPythonExecutor, restrict
+from src.security.result_cache import EXEC_CACHE_ENABLED, result_cache
 from src.security.serialization import ExecutionResultSerializer
+from src.observability.logs import preview
+from collections import OrderedDict
+from dataclasses import dataclass
+from types import CodeType
+from typing import List, Optional
+import ast
+import polars as pl
+import hashlib
 import logging
+import os
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+optimizer_logger = logging.getLogger("src.security.optimizer")
+
+
+# Compiled snippets kept per pipeline, keyed by source hash
+COMPILE_CACHE_SIZE = int(os.getenv("COMPILE_CACHE_SIZE", "256"))
+
+
+@dataclass(frozen=True)
+class CompiledSnippet:
+    """A snippet parsed, analyzed and compiled once, Jupyter style: statements plus a final expression."""
+    tree: ast.Module
+    issues: List[str]
+    body: Optional[CodeType]
+    expression: Optional[CodeType]
+    # Lazy plan of the final result (for `explain()` logging) and the row limit the optimizer put on it
+    plan: Optional[CodeType] = None
+    row_limit: Optional[int] = None
+
+
+def split_final_expression(tree: ast.Module):
+    """Split a module into its statements and its trailing expression (if the last statement is one)."""
+    if tree.body and isinstance(tree.body[-1], ast.Expr):
+        return ast.Module(body=tree.body[:-1], type_ignores=[]), ast.Expression(body=tree.body[-1].value)
+    return tree, None
+
 
 class SecureCodePipeline:
-    def __init__(self, allowed_imports=None, allowed_calls=None, allowed_globals=None):
+    def __init__(self, allowed_imports=None, allowed_calls=None, allowed_globals=None, restricted=None):
+        self.restricted = EXECUTION_MODE == "restricted" if restricted is None else restricted
         self.ast_analyzer = ASTSafetyAnalyzer(allowed_imports, allowed_calls)
+        self.optimizer = QueryOptimizer() if OPTIMIZER_ENABLED else None
         self.executor = RestrictedPythonExecutor(allowed_globals)
         self.serializer = ExecutionResultSerializer()
+        self.result_cache = result_cache if EXEC_CACHE_ENABLED else None
+        self._compiled: "OrderedDict[str, CompiledSnippet]" = OrderedDict()
+        self._compiled_lock = threading.Lock()
+
+    def compile(self, code_string) -> CompiledSnippet:
+        """Parse, analyze and compile a snippet, or return the cached result for the same source."""
+        key = hashlib.sha256(code_string.encode()).hexdigest()
+        with self._compiled_lock:
+            if key in self._compiled:
+                self._compiled.move_to_end(key)
+                return self._compiled[key]
+
+        tree = ast.parse(code_string)
+        safe, issues = self.ast_analyzer.analyze_tree(tree)
+        body = expression = plan = row_limit = None
+        if safe:
+            optimized = tree
+            plan_module = None
+            if self.optimizer is not None:
+                query = self.optimizer.optimize(tree)
+                optimized, row_limit = query.tree, query.row_limit
+                if query.plan is not None:
+                    plan_module = ast.fix_missing_locations(ast.Module(body=[ast.Expr(query.plan)], type_ignores=[]))
+                if query.rewrites:
+                    logger.debug("Optimized snippet: %s", ", ".join(query.rewrites))
+            try:
+                # RestrictedPython rewrites attribute/item access, iteration and print into guarded calls
+                runnable = restrict(optimized) if self.restricted else optimized
+                if plan_module is not None:
+                    plan_module = restrict(plan_module) if self.restricted else plan_module
+            except SyntaxError as e:
+                safe, issues = False, [f"Restricted code compilation error: {e}"]
+        if safe:
+            statements, final_expression = split_final_expression(runnable)
+            if statements.body:
+                body = compile(statements, '<user_code>', 'exec')
+            if final_expression is not None:
+                expression = compile(final_expression, '<user_code>', 'eval')
+            if plan_module is not None:
+                plan = compile(split_final_expression(plan_module)[1], '<user_code>', 'eval')
+        snippet = CompiledSnippet(
+            tree=tree, issues=list(issues), body=body, expression=expression, plan=plan, row_limit=row_limit
+        )
+
+        with self._compiled_lock:
+            self._compiled[key] = snippet
+            while len(self._compiled) > COMPILE_CACHE_SIZE:
+                self._compiled.popitem(last=False)
+        return snippet
+
+    def run(self, code_string, extra_globals=None, timings=None):
+        """Run a snippet and serialize its result; `timings`, if given, receives the seconds spent per stage."""
+        started = time.perf_counter()
+
+        # Step 1: Parse once, AST static analysis, compile (all cached per source)
+        snippet = self.compile(code_string)
+        if snippet.issues:
+            raise ValueError(f"Unsafe code detected: {snippet.issues}")
+
+        # Identical code (modulo whitespace/comments) over unchanged datasets returns the cached result
+        cache_key = self.result_cache.key(snippet.tree) if self.result_cache else None
+        if cache_key is not None and (cached := self.result_cache.get(cache_key)) is not None:
+            logger.debug("Serving cached result for %s", cache_key)
+            return cached
+
+        # Step 2: Execute the statements, then evaluate the final expression (once) as the result.
+        # In restricted mode the globals are a copy of the executor's prebuilt guarded namespace.
+        compiled = time.perf_counter()
+        execution_globals = self.executor.new_globals(self.restricted, extra_globals)
+        if snippet.body is not None:
+            exec(snippet.body, execution_globals)
+        result = eval(snippet.expression, execution_globals) if snippet.expression is not None else None
+        executed = time.perf_counter()
+        if snippet.plan is not None and optimizer_logger.isEnabledFor(logging.DEBUG):
+            self._log_plan(snippet.plan, execution_globals)
+
+        # Step 3: Serialize the execution results (the optimizer's limit lets one row more through to detect a cut)
+        limited = snippet.row_limit is not None and isinstance(result, pl.DataFrame) and result.height > snippet.row_limit
+        if limited:
+            result = result.head(snippet.row_limit)
+        serialized_result = self.serializer.serialize_result(result)
+        if limited and isinstance(serialized_result.get("result"), dict):
+            serialized_result["result"]["row_limit"] = snippet.row_limit
+        if timings is not None:
+            timings.update(compile=compiled - started, execute=executed - compiled, serialize=time.perf_counter() - executed)
+
+        logger.debug("Serialized result: %s", preview(serialized_result))
+
+        if cache_key is not None and serialized_result.get("status") == "success":
+            self.result_cache.put(cache_key, serialized_result)
+
+        return serialized_result
 
-    def run(self, code_string, extra_globals=None):
-        
-        # Step 1: AST static analysis
-        safe, issues = self.ast_analyzer.analyze(code_string)
-        if not safe:
-            raise ValueError(f"Unsafe code detected: {issues}")
-        
-        # Step 2 (optional): Execute in restricted environment
-        #execution_result = self.executor.execute(code_string, extra_globals)
-        #logging.info(f"Execution result: {execution_result}")
-
-        # Execute the code and capture result
-        execution_globals = self.executor.allowed_globals.copy()
-        exec(code_string, execution_globals)
-        
-        # Get the last variable assignment as result (assuming last line is the result)
-        result = None
-        if code_string.strip().split('\n')[-1].strip() and not code_string.strip().split('\n')[-1].strip().startswith('#'):
-            last_line = code_string.strip().split('\n')[-1].strip()
-            if '=' not in last_line:  # If last line is just a variable name
-                try:
-                    result = eval(last_line, execution_globals)
-                except:
-                    result = None
-        
-        execution_result = {'result': result, 'globals': execution_globals}
-        
-        # Step 3: Serialize the execution results
-        serialized_result = self.serializer.serialize_execution_result(code_string, execution_result)
-
-        logging.info(f"Serialized result: {serialized_result}")
-        
-        return serialized_result
\ No newline at end of file
+    @staticmethod
+    def _log_plan(plan: CodeType, execution_globals: dict):
+        """
+        Log the optimized plan of the final result. The plan is evaluated again,
+        which the optimizer only allows for scans and lazy methods over variables,
+        so it builds a LazyFrame without reading data or re-running eager code.
+        """
+        try:
+            optimizer_logger.debug("Query plan:\n%s", eval(plan, execution_globals).explain())
+        except Exception as e:
+            optimizer_logger.debug("Could not explain the query plan: %s", e)
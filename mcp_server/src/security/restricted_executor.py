@@ -1,11 +1,106 @@
-from RestrictedPython import compile_restricted, safe_globals
-import polars as pl
+from RestrictedPython import RestrictingNodeTransformer, safe_builtins
+from RestrictedPython.Guards import full_write_guard
+from RestrictedPython.PrintCollector import PrintCollector
+from RestrictedPython.transformer import INSPECT_ATTRIBUTES
+from src.catalog.columnar import get_polars
+from functools import lru_cache
+from types import MappingProxyType
+import ast
+import copy
+import operator
+import os
+
+
+# "restricted" runs user code compiled by RestrictedPython with guarded builtins; "unrestricted" runs plain exec
+EXECUTION_MODE = os.getenv("EXECUTION_MODE", "restricted")
+
+_RAISE = object()
+_BLOCKED_ATTRIBUTES = frozenset(INSPECT_ATTRIBUTES) | {"format", "format_map"}
+
+_INPLACE_OPERATORS = {
+    "+=": operator.iadd,
+    "-=": operator.isub,
+    "*=": operator.imul,
+    "/=": operator.itruediv,
+    "//=": operator.ifloordiv,
+    "%=": operator.imod,
+    "**=": operator.ipow,
+    "<<=": operator.ilshift,
+    ">>=": operator.irshift,
+    "|=": operator.ior,
+    "^=": operator.ixor,
+    "&=": operator.iand,
+    "@=": operator.imatmul,
+}
+
+
+def guarded_getattr(obj, name, default=_RAISE):
+    """
+    `_getattr_` guard with the checks of RestrictedPython's `safer_getattr`,
+    ordered so the common case (a public, non-`format` name) costs one set
+    lookup and one string comparison.
+    """
+    if name in _BLOCKED_ATTRIBUTES:
+        if name in INSPECT_ATTRIBUTES:
+            raise AttributeError(f'"{name}" is a restricted name, that is forbidden to access in RestrictedPython.')
+        if isinstance(obj, str) or (isinstance(obj, type) and issubclass(obj, str)):
+            raise NotImplementedError('Using the format*() methods of `str` is not safe')
+    elif name[:1] == "_":
+        raise AttributeError(f'"{name}" is an invalid attribute name because it starts with "_"')
+    return getattr(obj, name) if default is _RAISE else getattr(obj, name, default)
+
+
+# RestrictedPython's safe builtins plus the read-only helpers analysis code commonly uses.
+# A plain dict: CPython requires one for `__builtins__` lookups such as `import`.
+RESTRICTED_BUILTINS = {
+    **safe_builtins,
+    **{
+        builtin.__name__: builtin
+        for builtin in (all, any, dict, enumerate, filter, list, map, max, min, reversed, set, sum)
+    },
+    'getattr': guarded_getattr,
+}
+
+
+def guarded_inplacevar(op, target, value):
+    return _INPLACE_OPERATORS[op](target, value)
+
+
+def guarded_apply(function, *args, **kwargs):
+    return function(*args, **kwargs)
+
+
+# `_getiter_` is plain `iter`, so re-wrapping every element of an unpacked sequence
+# in it (RestrictedPython's guarded_*unpack_sequence) adds cost but no protection:
+# the values are handed back for Python's own unpacking instead.
+def guarded_unpack_sequence(it, spec, _getiter_):
+    return _getiter_(it)
+
+
+def guarded_iter_unpack_sequence(it, spec, _getiter_):
+    return _getiter_(it)
+
+
+def restrict(tree: ast.Module) -> ast.Module:
+    """Rewrite a parsed module with RestrictedPython's policy; raises SyntaxError if the code is not allowed."""
+    errors, warnings, used_names = [], [], {}
+    restricted = RestrictingNodeTransformer(errors, warnings, used_names).visit(copy.deepcopy(tree))
+    if errors:
+        raise SyntaxError("; ".join(errors))
+    return ast.fix_missing_locations(restricted)
+
+
+@lru_cache(maxsize=256)
+def _compile_restricted(code_string):
+    return compile(restrict(ast.parse(code_string)), '<user_code>', 'exec')
 
-    
 
 class RestrictedPythonExecutor:
     def __init__(self, allowed_globals=None):
 
+        # scan_csv/read_csv of the datasets are served from resident frames and columnar copies
+        pl = get_polars()
+
         self.allowed_globals = allowed_globals or {
             'print': print,
             '_print_': print,
@@ -16,22 +111,43 @@ class RestrictedPythonExecutor:
             'pl': pl,  # Add pl alias as well
         }
 
-    def execute(self, code_string, extra_globals=None):
-        
-        # Reset print collector for each execution
-        
-        byte_code = compile_restricted(code_string, '<user_code>', 'exec')
-        restricted_globals = safe_globals.copy()
-        restricted_globals.update(self.allowed_globals)
+        # Built once; every run gets a shallow copy to write its variables into
+        self.restricted_globals = MappingProxyType({
+            **self.allowed_globals,
+            '__builtins__': RESTRICTED_BUILTINS,
+            '__name__': 'restricted_module',
+            '__metaclass__': type,
+            '_getattr_': guarded_getattr,
+            '_getitem_': operator.getitem,
+            '_getiter_': iter,
+            '_write_': full_write_guard,
+            '_print_': PrintCollector,
+            '_inplacevar_': guarded_inplacevar,
+            '_apply_': guarded_apply,
+            '_unpack_sequence_': guarded_unpack_sequence,
+            '_iter_unpack_sequence_': guarded_iter_unpack_sequence,
+        })
+
+    def new_globals(self, restricted=True, extra_globals=None):
+        execution_globals = dict(self.restricted_globals) if restricted else self.allowed_globals.copy()
         if extra_globals:
-            restricted_globals.update(extra_globals)
-        
+            execution_globals.update(extra_globals)
+        return execution_globals
+
+    def execute(self, code_string, extra_globals=None):
+
+        try:
+            byte_code = _compile_restricted(code_string)
+        except SyntaxError as e:
+            raise RuntimeError(f"Restricted code compilation error: {e}")
+        restricted_globals = self.new_globals(extra_globals=extra_globals)
+
         try:
             exec(byte_code, restricted_globals)
         except Exception as e:
             raise RuntimeError(f"Restricted code execution error: {e}")
-        
+
         # Return both the globals and captured print output
         return {
             'globals': restricted_globals
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,212 @@
+import ast
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.catalog.datasets import DATA_DIR
+
+
+logger = logging.getLogger(__name__)
+
+
+EXEC_CACHE_ENABLED = os.getenv("EXEC_CACHE_ENABLED", "true").lower() == "true"
+EXEC_CACHE_MAX_ENTRIES = int(os.getenv("EXEC_CACHE_MAX_ENTRIES", "256"))
+EXEC_CACHE_MAX_BYTES = int(os.getenv("EXEC_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Directory for persisting results across restarts and worker processes; empty keeps them in memory only
+EXEC_CACHE_DIR = os.getenv("EXEC_CACHE_DIR", "")
+
+# Calls whose result changes between runs of the same code; snippets using them are never cached
+NON_DETERMINISTIC_CALLS = {"sample", "shuffle", "now", "today", "random", "rand", "randint", "uuid4"}
+
+# Calls reading a file given by their first argument; the file's version becomes part of the cache key
+READ_CALLS = {
+    "read_csv", "scan_csv", "read_parquet", "scan_parquet", "read_ipc", "scan_ipc",
+    "read_json", "read_ndjson", "scan_ndjson", "read_excel", "open",
+}
+
+_GLOB_CHARS = set("*?[")
+
+
+def canonical_code(tree: ast.AST) -> str:
+    """AST dump without positions: identical for snippets that differ only in whitespace and comments."""
+    return ast.dump(tree, annotate_fields=False, include_attributes=False)
+
+
+def _call_name(node: ast.Call) -> Optional[str]:
+    func = node.func
+    return func.attr if isinstance(func, ast.Attribute) else getattr(func, "id", None)
+
+
+def is_deterministic(tree: ast.AST) -> bool:
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call) and _call_name(node) in NON_DETERMINISTIC_CALLS:
+            return False
+    return True
+
+
+def referenced_files(tree: ast.AST, data_dir: str = DATA_DIR) -> Optional[List[str]]:
+    """
+    The datasets the code reads, or None if they cannot be told from the code.
+
+    Every read call must name a file directly inside `data_dir` with a string
+    literal: a path built at run time (f-string, variable, `os.path.join`), a
+    glob or a file elsewhere could change without the key changing. Globs are
+    never expanded and no directory is listed.
+    """
+    data_dir = os.path.realpath(data_dir)
+    files = set()
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call) or _call_name(node) not in READ_CALLS:
+            continue
+        source = node.args[0] if node.args else next((k.value for k in node.keywords if k.arg == "source"), None)
+        if not isinstance(source, ast.Constant) or not isinstance(source.value, str):
+            return None
+        if _GLOB_CHARS & set(source.value):
+            return None
+        path = os.path.realpath(source.value)
+        if os.path.dirname(path) != data_dir:
+            return None
+        files.add(path)
+    return sorted(files)
+
+
+def dataset_versions(files: List[str]) -> List[Tuple[str, int, int]]:
+    versions = []
+    for path in files:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        versions.append((path, stat.st_mtime_ns, stat.st_size))
+    return versions
+
+
+class ExecutionResultCache:
+    """
+    LRU cache of serialized `code_executor` results.
+
+    Entries are keyed on the canonical AST of the snippet plus the mtime and
+    size of every dataset it reads, so reformatted or re-commented code hits
+    the same entry and any change to an input dataset misses. Snippets whose
+    inputs cannot be told from the code are not cached. The cache is
+    bounded both by entry count and by the JSON size of the results. With a
+    `directory`, results are also written there and read back on a memory miss.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = EXEC_CACHE_MAX_ENTRIES,
+        max_bytes: int = EXEC_CACHE_MAX_BYTES,
+        directory: Optional[str] = EXEC_CACHE_DIR or None,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(tree: ast.AST) -> Optional[str]:
+        """Cache key for a parsed snippet, or None if its result must not be cached."""
+        if not is_deterministic(tree):
+            return None
+        files = referenced_files(tree)
+        if files is None:
+            return None
+        material = json.dumps([canonical_code(tree), dataset_versions(files)])
+        return hashlib.sha256(material.encode()).hexdigest()
+
+    def key_for(self, code: str) -> Optional[str]:
+        try:
+            return self.key(ast.parse(code))
+        except SyntaxError:
+            return None
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+        if self.directory:
+            try:
+                with open(self._disk_path(key)) as f:
+                    result = json.load(f)
+            except (OSError, ValueError):
+                pass
+            else:
+                self._put_memory(key, result, len(json.dumps(result, default=str)))
+                with self._lock:
+                    self.hits += 1
+                    self.disk_hits += 1
+                return result
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, result: Dict[str, Any]):
+        if isinstance(result.get("result"), dict) and "resource" in result["result"]:
+            # Exported results expire on disk, a cached reference to them would dangle
+            return
+        payload = json.dumps(result, default=str)
+        if len(payload) > self.max_bytes:
+            return
+        self._put_memory(key, result, len(payload))
+        if self.directory:
+            tmp_path = f"{self._disk_path(key)}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_path, "w") as f:
+                    f.write(payload)
+                os.replace(tmp_path, self._disk_path(key))
+            except OSError as e:
+                logger.warning("Could not persist cached result %s: %s", key, e)
+
+    def _put_memory(self, key: str, result: Dict[str, Any], size: int):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (result, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+result_cache = ExecutionResultCache()
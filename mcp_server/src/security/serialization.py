@@ -1,102 +1,169 @@
-import ast
-from typing import Any, Dict
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+import polars as pl
+
+
+logger = logging.getLogger(__name__)
+
+
+# Rows of a frame shipped inline; the full frame is exported instead of inlined
+RESULT_MAX_ROWS = int(os.getenv("RESULT_MAX_ROWS", "50"))
+# JSON size budget of the inline part of a result
+RESULT_MAX_BYTES = int(os.getenv("RESULT_MAX_BYTES", str(64 * 1024)))
+RESULT_MAX_CELL_CHARS = int(os.getenv("RESULT_MAX_CELL_CHARS", "1000"))
+# "head", "head_tail" or "sample"
+RESULT_PREVIEW = os.getenv("RESULT_PREVIEW", "head")
+# Truncated frames are written here in full and exposed as a `result://` MCP resource; empty disables it
+RESULT_EXPORT_DIR = os.getenv("RESULT_EXPORT_DIR", os.path.join(tempfile.gettempdir(), "mcp-results"))
+# "ipc" (Arrow IPC) or "parquet"
+RESULT_EXPORT_FORMAT = os.getenv("RESULT_EXPORT_FORMAT", "ipc")
+RESULT_EXPORT_TTL = float(os.getenv("RESULT_EXPORT_TTL", "3600"))
+
+RESULT_EXPORT_MIME_TYPES = {"ipc": "application/vnd.apache.arrow.file", "parquet": "application/vnd.apache.parquet"}
+RESULT_URI_PREFIX = "result://"
+
+_RESULT_ID = re.compile(r"^[0-9a-f]{32}\.(ipc|parquet)$")
+
+
+def export_path(result_id: str) -> Optional[str]:
+    """Path of an exported result, or None if the id is not one this server produced."""
+    if not RESULT_EXPORT_DIR or not _RESULT_ID.match(result_id):
+        return None
+    return os.path.join(RESULT_EXPORT_DIR, result_id)
+
+
+def _expire_exports(directory: str):
+    cutoff = time.time() - RESULT_EXPORT_TTL
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+    except OSError:
+        pass
+
 
 class ExecutionResultSerializer:
     """
-    Simple serializer that follows Jupyter notebook behavior:
-    - If the last line is a variable name, return its value
-    - Otherwise, return None
+    Simple serializer that follows Jupyter notebook behavior: the value of the
+    snippet's final expression is returned, None if it ends with a statement.
+
+    Polars frames are never serialized whole: at most `max_rows` rows (fewer
+    if they exceed `max_bytes` of JSON) are inlined as columns, together with
+    the total row count and the schema. When rows were left out, the full
+    frame is streamed to an Arrow IPC/Parquet file by polars and referenced by
+    a `result://` resource URI that MCP clients can read.
     """
-    
-    def serialize_execution_result(self, code: str, execution_result: Dict[str, Any]) -> Dict[str, Any]:
-        """
-        Analyze the executed code and return the result like Jupyter notebooks.
-        
-        Args:
-            code: The original code that was executed
-            execution_result: The execution result containing globals
-            
-        Returns:
-            Dictionary containing the execution result
-        """
+
+    def __init__(
+        self,
+        max_rows: int = RESULT_MAX_ROWS,
+        max_bytes: int = RESULT_MAX_BYTES,
+        preview: str = RESULT_PREVIEW,
+        export_dir: str = RESULT_EXPORT_DIR,
+        export_format: str = RESULT_EXPORT_FORMAT,
+    ):
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.preview = preview
+        self.export_dir = export_dir
+        self.export_format = export_format
+
+    def serialize_result(self, value: Any) -> Dict[str, Any]:
+        """Serialize the value of the final expression of a snippet (None if it had none)."""
         try:
-            global_scope = execution_result['globals']
-            print(f"[DEBUG SERIALIZER] Code: {repr(code)}")
-            
-            # Parse the code to get the last statement
-            tree = ast.parse(code.strip())
-            print(f"[DEBUG SERIALIZER] AST body length: {len(tree.body)}")
-            
-            # Check if the last statement is a simple variable name
-            last_value = None
-            if tree.body:
-                last_stmt = tree.body[-1]
-                print(f"[DEBUG SERIALIZER] Last statement type: {type(last_stmt)}")
-                
-                # If the last statement is an expression with a single Name node
-                if isinstance(last_stmt, ast.Expr) and isinstance(last_stmt.value, ast.Name):
-                    var_name = last_stmt.value.id
-                    print(f"[DEBUG SERIALIZER] Found variable name: {var_name}")
-                    if var_name in global_scope:
-                        raw_value = global_scope[var_name]
-                        print(f"[DEBUG SERIALIZER] Raw value type: {type(raw_value)}")
-                        print(f"[DEBUG SERIALIZER] Raw value: {raw_value}")
-                        last_value = self._serialize_value(raw_value)
-                        print(f"[DEBUG SERIALIZER] Serialized value: {last_value}")
-                    else:
-                        print(f"[DEBUG SERIALIZER] Variable {var_name} not found in globals")
-                else:
-                    print(f"[DEBUG SERIALIZER] Last statement is not a simple variable name")
-            
-            result = {
+            return {
                 "status": "success",
-                "result": last_value
+                "result": None if value is None else self._serialize_value(value)
             }
-            print(f"[DEBUG SERIALIZER] Final result: {result}")
-            return result
-            
+
         except Exception as e:
             return {
-                "status": "error", 
+                "status": "error",
                 "error": str(e)
             }
-    
+
     def _serialize_value(self, value: Any) -> Any:
         """
-        Convert a value to a JSON-serializable format.
+        Convert a value to a bounded, JSON-serializable format.
         """
-        print(f"[DEBUG SERIALIZER] _serialize_value called with type: {type(value)}")
-        print(f"[DEBUG SERIALIZER] Value string representation: {str(value)[:200]}...")
-        
         try:
-            # Handle polars DataFrames
-            if hasattr(value, '__class__') and 'polars' in str(type(value)):
-                print(f"[DEBUG SERIALIZER] Detected polars DataFrame")
-                if hasattr(value, 'to_dict'):
-                    print(f"[DEBUG SERIALIZER] DataFrame has to_dict method")
-                    data_dict = value.to_dict(as_series=False)
-                    shape = value.shape
-                    result = {
-                        "type": "polars.DataFrame",
-                        "data": data_dict,
-                        "shape": shape
-                    }
-                    print(f"[DEBUG SERIALIZER] Serialized DataFrame: {result}")
-                    return result
-                else:
-                    print(f"[DEBUG SERIALIZER] DataFrame missing to_dict method")
-            else:
-                print(f"[DEBUG SERIALIZER] Not a polars DataFrame")
-            
+            if isinstance(value, pl.DataFrame):
+                return self._serialize_frame(value, "polars.DataFrame")
+            if isinstance(value, pl.Series):
+                return self._serialize_frame(value.to_frame(), "polars.Series")
+
             # Fallback for other types
+            text = str(value)
             result = {
                 "type": str(type(value).__name__),
-                "value": str(value)
+                "value": text[:self.max_bytes]
             }
-            print(f"[DEBUG SERIALIZER] Fallback serialization: {result}")
+            if len(text) > self.max_bytes:
+                result["truncated"] = True
             return result
-            
+
         except Exception as e:
-            print(f"[DEBUG SERIALIZER] Exception in _serialize_value: {e}")
+            logger.warning("Could not serialize %s: %s", type(value).__name__, e)
             # Fallback to string representation
-            return str(value)
+            return str(value)[:self.max_bytes]
+
+    def _preview_frame(self, frame: pl.DataFrame, rows: int) -> pl.DataFrame:
+        if frame.height <= rows:
+            return frame
+        if self.preview == "head_tail":
+            return pl.concat([frame.head(rows - rows // 2), frame.tail(rows // 2)])
+        if self.preview == "sample":
+            return frame.sample(rows, seed=0, shuffle=False)
+        return frame.head(rows)
+
+    def _serialize_frame(self, frame: pl.DataFrame, type_name: str) -> Dict[str, Any]:
+        rows = min(self.max_rows, frame.height)
+        while True:
+            preview = self._preview_frame(frame, rows).with_columns(
+                pl.col(pl.String).str.slice(0, RESULT_MAX_CELL_CHARS)
+            )
+            data = preview.to_dict(as_series=False)
+            if rows <= 1 or len(json.dumps(data, default=str)) <= self.max_bytes:
+                break
+            rows //= 2
+
+        result = {
+            "type": type_name,
+            "data": data,
+            "shape": frame.shape,
+            "schema": {name: str(dtype) for name, dtype in frame.schema.items()},
+            "truncated": rows < frame.height,
+        }
+        if rows < frame.height:
+            result["preview"] = self.preview
+            result["preview_rows"] = rows
+            resource = self._export(frame)
+            if resource is not None:
+                result["resource"] = resource
+        return result
+
+    def _export(self, frame: pl.DataFrame) -> Optional[str]:
+        """Write the full frame to disk and return its resource URI."""
+        if not self.export_dir:
+            return None
+        result_id = f"{uuid.uuid4().hex}.{self.export_format}"
+        path = os.path.join(self.export_dir, result_id)
+        try:
+            os.makedirs(self.export_dir, exist_ok=True)
+            _expire_exports(self.export_dir)
+            if self.export_format == "parquet":
+                frame.write_parquet(path)
+            else:
+                frame.write_ipc(path)
+        except Exception as e:
+            logger.warning("Could not export result to %s: %s", path, e)
+            return None
+        return f"{RESULT_URI_PREFIX}{result_id}"
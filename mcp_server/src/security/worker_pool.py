@@ -0,0 +1,382 @@
+"""
+Pool of pre-warmed worker processes running `SecureCodePipeline`.
+
+User code runs outside the MCP server's event loop, so a heavy Polars query
+only occupies one worker and the server keeps answering other requests.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import pickle
+import time
+from multiprocessing.connection import Connection
+from typing import Any, Dict, List, Optional
+
+import polars  # noqa: F401  (imported here so forked workers start with polars loaded)
+
+from src.security.governor import (
+    JobUsage,
+    ResourceGovernor,
+    ResourceLimitExceeded,
+    ResourceLimits,
+    apply_worker_limits,
+    cpu_limit,
+    error_result,
+    exit_reason,
+    process_cpu_seconds,
+)
+from src.catalog.frames import FRAME_CACHE_EVENTS, dataset_frame_cache
+from src.observability.logs import configure_logging
+from src.observability.metrics import observe_job
+from src.observability.tracing import record_span
+from src.security.pipeline import SecureCodePipeline
+from src.security.result_cache import EXEC_CACHE_ENABLED, result_cache
+
+
+logger = logging.getLogger(__name__)
+
+
+EXECUTOR_POOL_SIZE = int(os.getenv("EXECUTOR_POOL_SIZE", str(os.cpu_count() or 1)))
+# Jobs allowed to wait for a free worker before new ones are rejected
+EXECUTOR_MAX_QUEUE = int(os.getenv("EXECUTOR_MAX_QUEUE", "64"))
+EXECUTOR_MEMORY_CHECK_INTERVAL = 0.1
+EXECUTOR_START_TIMEOUT = 30.0
+# Delay before retrying a failed worker restart, doubled per failure up to the maximum
+EXECUTOR_RESTART_BACKOFF = 0.5
+EXECUTOR_RESTART_BACKOFF_MAX = 30.0
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _mp_context():
+    # Workers are forked from a server process that already imported polars and the
+    # pipeline, so (re)starting one is cheap and never forks the multi-threaded MCP server
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+def _worker_main(conn: Connection, limits: ResourceLimits, pool_size: int):
+    configure_logging()
+    apply_worker_limits(limits, pool_size)
+    pipeline = SecureCodePipeline()
+    # Results are cached by the parent, which sees every job
+    pipeline.result_cache = None
+    conn.send(("ready", os.getpid()))
+    while True:
+        try:
+            code = conn.recv()
+        except EOFError:
+            return
+        if code is None:
+            return
+
+        started, cpu_started = time.perf_counter(), process_cpu_seconds()
+        stages, cache_before = {}, dataset_frame_cache.stats()
+        try:
+            with cpu_limit(limits.cpu_seconds):
+                result = pipeline.run(code, timings=stages)
+        except MemoryError:
+            result = error_result("memory_limit", "Execution ran out of memory")
+        except Exception as e:
+            result = error_result("execution_error", str(e))
+        usage = {
+            "wall_seconds": time.perf_counter() - started,
+            "cpu_seconds": process_cpu_seconds() - cpu_started,
+            "stages": stages,
+            "dataset_cache": {
+                key: value - cache_before[key] if key in FRAME_CACHE_EVENTS else value
+                for key, value in dataset_frame_cache.stats().items()
+            },
+        }
+
+        # Pickled once: the size checked is the size sent
+        payload = pickle.dumps(result)
+        if len(payload) > limits.max_result_bytes:
+            payload = pickle.dumps(error_result(
+                "result_too_large",
+                f"Result of {len(payload)} bytes exceeds the limit of {limits.max_result_bytes} bytes",
+            ))
+        usage["result_bytes"] = len(payload)
+        conn.send(usage)
+        conn.send_bytes(payload)
+
+
+def _rss_bytes(pid: int) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class _Worker:
+    def __init__(self, context, limits: ResourceLimits, pool_size: int):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, limits, pool_size), daemon=True)
+        self.process.start()
+        child_conn.close()
+        # Frames resident in the worker's dataset cache, as of its last job
+        self.dataset_cache: Dict[str, int] = {}
+
+    def wait_ready(self, timeout: float = EXECUTOR_START_TIMEOUT):
+        if not self.conn.poll(timeout):
+            self.kill()
+            raise RuntimeError(f"Executor worker {self.process.pid} did not start within {timeout}s")
+        self.conn.recv()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=1)
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=1)
+        self.kill()
+
+
+class ExecutorPool:
+    """
+    Dispatches `code_executor` jobs to `size` worker processes.
+
+    Each job runs under the `limits` of the resource governor: a wall-clock
+    timeout and a resident memory cap checked by the parent while it waits,
+    and a CPU-time limit, address-space cap and result size limit applied in
+    the worker. A job that crosses a limit, or whose caller is cancelled (e.g.
+    the MCP client went away), has its worker killed and replaced, so runaway
+    queries never outlive their request. Violations come back as structured
+    errors (`error_type`), and every job's usage is recorded in `governor`.
+    At most `max_queue` jobs wait for a free worker; beyond that calls fail fast,
+    as they do while no worker is alive (restarts are retried with a backoff).
+    """
+
+    def __init__(
+        self,
+        size: int = EXECUTOR_POOL_SIZE,
+        max_queue: int = EXECUTOR_MAX_QUEUE,
+        limits: Optional[ResourceLimits] = None,
+    ):
+        self.size = max(1, size)
+        self.max_queue = max_queue
+        self.limits = limits or ResourceLimits()
+        self.memory_limit_bytes = self.limits.memory_mb * 1024 * 1024
+        self.governor = ResourceGovernor()
+        self._context = _mp_context()
+        self._workers: List[_Worker] = []
+        self._idle: Optional[asyncio.Queue] = None
+        self._waiting = 0
+        self._replacements = set()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._waiting
+
+    @property
+    def alive_workers(self) -> int:
+        return sum(worker.process.is_alive() for worker in self._workers)
+
+    def dataset_cache_stats(self) -> Dict[str, int]:
+        """Frames and bytes resident in the dataset caches of all workers."""
+        return {
+            key: sum(worker.dataset_cache.get(key, 0) for worker in self._workers)
+            for key in ("entries", "bytes")
+        }
+
+    def start(self):
+        """Start and warm up the workers; blocks until they are all ready."""
+        if self._workers:
+            return
+        started = time.perf_counter()
+        workers = [_Worker(self._context, self.limits, self.size) for _ in range(self.size)]
+        for worker in workers:
+            worker.wait_ready()
+        self._workers = workers
+        logger.info("Started %s executor workers in %.2fs", self.size, time.perf_counter() - started)
+
+    def close(self):
+        workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.stop()
+        self._idle = None
+
+    async def _idle_workers(self) -> asyncio.Queue:
+        if self._idle is None:
+            if not self._workers:
+                await asyncio.to_thread(self.start)
+            if self._idle is None:
+                self._idle = asyncio.Queue()
+                for worker in self._workers:
+                    self._idle.put_nowait(worker)
+        return self._idle
+
+    async def _replace(self, worker: _Worker) -> Optional[_Worker]:
+        worker.kill()
+
+        def start_worker() -> _Worker:
+            replacement = _Worker(self._context, self.limits, self.size)
+            replacement.wait_ready()
+            return replacement
+
+        replacement = await asyncio.to_thread(start_worker)
+        if worker not in self._workers:
+            # The pool was closed while the replacement started
+            replacement.stop()
+            return None
+        self._workers[self._workers.index(worker)] = replacement
+        return replacement
+
+    async def _wait_for_result(self, worker: _Worker, usage: JobUsage) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        readable = loop.create_future()
+        fd = worker.conn.fileno()
+        loop.add_reader(fd, lambda: readable.done() or readable.set_result(None))
+        try:
+            deadline = loop.time() + self.limits.timeout
+            while not readable.done():
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise ResourceLimitExceeded("timeout", f"Execution timed out after {self.limits.timeout:g}s")
+                await asyncio.wait([readable], timeout=min(EXECUTOR_MEMORY_CHECK_INTERVAL, remaining))
+                if readable.done():
+                    break
+                rss = _rss_bytes(worker.process.pid)
+                if rss is not None:
+                    usage.peak_rss_bytes = max(usage.peak_rss_bytes, rss)
+                    if self.memory_limit_bytes and rss > self.memory_limit_bytes:
+                        raise ResourceLimitExceeded(
+                            "memory_limit", f"Execution exceeded the memory limit of {self.limits.memory_mb}MB"
+                        )
+        finally:
+            loop.remove_reader(fd)
+
+        def receive():
+            worker_usage = worker.conn.recv()
+            return pickle.loads(worker.conn.recv_bytes()), worker_usage
+
+        result, worker_usage = await asyncio.to_thread(receive)
+        usage.wall_seconds = worker_usage["wall_seconds"]
+        usage.cpu_seconds = worker_usage["cpu_seconds"]
+        usage.result_bytes = worker_usage["result_bytes"]
+        usage.stages = worker_usage["stages"]
+        usage.dataset_cache = worker.dataset_cache = worker_usage["dataset_cache"]
+        return result
+
+    async def run(self, code: str) -> Dict[str, Any]:
+        # Parsing and stat-ing the inputs is kept off the event loop shared by every client
+        cache_key = await asyncio.to_thread(result_cache.key_for, code) if EXEC_CACHE_ENABLED else None
+        if cache_key is not None and (cached := result_cache.get(cache_key)) is not None:
+            return cached
+
+        if self._waiting >= self.max_queue:
+            rejected = JobUsage(error_type="queue_full")
+            self.governor.record(rejected)
+            observe_job(rejected)
+            return error_result("queue_full", f"Executor queue is full ({self.max_queue} jobs waiting)")
+
+        idle = await self._idle_workers()
+        if idle.empty() and not self.alive_workers:
+            return self._no_workers()
+        usage = JobUsage()
+        queued, queued_at = time.perf_counter(), time.time()
+        self._waiting += 1
+        try:
+            worker = await idle.get()
+            while worker is None and self.alive_workers:
+                # A wake-up left over from a failed restart, but a worker is back
+                worker = await idle.get()
+        finally:
+            self._waiting -= 1
+        if worker is None:
+            # Woken up by a failed restart that left no worker alive
+            return self._no_workers()
+        usage.queue_seconds = time.perf_counter() - queued
+
+        healthy, result = False, None
+        started, started_at = time.perf_counter(), time.time()
+        try:
+            worker.conn.send(code)
+            result = await self._wait_for_result(worker, usage)
+            healthy = True
+        except ResourceLimitExceeded as e:
+            logger.warning("Killing executor worker %s: %s", worker.process.pid, e)
+            result = error_result(e.error_type, str(e))
+        except (EOFError, OSError):
+            worker.process.join(timeout=1)
+            reason = exit_reason(worker.process.exitcode)
+            logger.warning("Executor worker %s died: %s", worker.process.pid, reason)
+            result = error_result(reason.error_type, str(reason))
+        except asyncio.CancelledError:
+            usage.error_type = "cancelled"
+            raise
+        except Exception as e:
+            # The worker's state is unknown after an unexpected failure, so it is replaced too
+            logger.exception("Executor job on worker %s failed", worker.process.pid)
+            result = error_result("executor_error", f"Executor failed: {e}")
+        finally:
+            # Cancelled jobs land here too: their worker is still busy with the abandoned code
+            if not healthy:
+                task = asyncio.ensure_future(self._release_replacement(worker, idle))
+                self._replacements.add(task)
+                task.add_done_callback(self._replacements.discard)
+            else:
+                idle.put_nowait(worker)
+            if not usage.wall_seconds:
+                usage.wall_seconds = time.perf_counter() - started
+            if usage.error_type is None and result is not None and result.get("status") == "error":
+                usage.error_type = result.get("error_type", "execution_error")
+            self.governor.record(usage)
+            observe_job(usage)
+            self._trace_job(usage, queued_at, started_at)
+
+        if cache_key is not None and result.get("status") == "success":
+            result_cache.put(cache_key, result)
+        return result
+
+    def _no_workers(self) -> Dict[str, Any]:
+        rejected = JobUsage(error_type="no_workers")
+        self.governor.record(rejected)
+        observe_job(rejected)
+        return error_result("no_workers", "No executor worker is running, restarting them")
+
+    @staticmethod
+    def _trace_job(usage: JobUsage, queued_at: float, started_at: float):
+        """Child spans of the calling tool's span: the wait for a worker, and the job with its pipeline stages."""
+        record_span("executor.queue", queued_at, started_at)
+        job = record_span(
+            "executor.job", started_at, started_at + usage.wall_seconds,
+            cpu_seconds=usage.cpu_seconds, peak_rss_bytes=usage.peak_rss_bytes,
+            result_bytes=usage.result_bytes, error_type=usage.error_type,
+        )
+        stage_start = started_at
+        for stage, seconds in usage.stages.items():
+            record_span(f"executor.{stage}", stage_start, stage_start + seconds, parent=job)
+            stage_start += seconds
+
+    async def _release_replacement(self, worker: _Worker, idle: asyncio.Queue):
+        """Restart the worker's slot, retrying with a backoff until it is up or the pool is closed."""
+        delay = EXECUTOR_RESTART_BACKOFF
+        while worker in self._workers:
+            try:
+                replacement = await self._replace(worker)
+                if replacement is not None:
+                    idle.put_nowait(replacement)
+                return
+            except Exception as e:
+                logger.error("Could not replace executor worker, retrying in %.1fs: %s", delay, e)
+            if not self.alive_workers:
+                # Jobs waiting for a worker would otherwise wait for as long as restarts fail
+                for _ in range(self._waiting):
+                    idle.put_nowait(None)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, EXECUTOR_RESTART_BACKOFF_MAX)
+
+
+executor_pool = ExecutorPool()
@@ -0,0 +1,6 @@
+import os
+
+# Read the fixture files themselves, not the columnar copies or resident frames of the data directory
+os.environ.setdefault("COLUMNAR_ENABLED", "false")
+os.environ.setdefault("DATASET_CACHE_ENABLED", "false")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
@@ -0,0 +1,91 @@
+"""The query rewriter must not change what a snippet returns."""
+import ast
+
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+
+from src.security.optimizer import QueryOptimizer
+from src.security.pipeline import split_final_expression
+
+
+ROW_LIMIT = 10
+
+# (snippet over the fixture CSV at {path}, rewrite expected among the optimizer's, or None when the
+# snippet must be left as it is: no read_csv switch, no collect deferred)
+CASES = {
+    "read_csv": ("pl.read_csv(\"{path}\").filter(pl.col(\"quantity\") > 2)", "read_csv -> scan_csv"),
+    "single_use_collect": (
+        "df = pl.read_csv(\"{path}\")\n"
+        "result = df.filter(pl.col(\"price\") > 50).select([\"id\", \"price\"])\n"
+        "result",
+        "df kept lazy until its use",
+    ),
+    "used_twice": (
+        "df = pl.scan_csv(\"{path}\").collect()\n"
+        "rows = df.height\n"
+        "df.filter(pl.col(\"id\") < rows // 2)",
+        None,
+    ),
+    "collect_pushed": (
+        "pl.scan_csv(\"{path}\").collect().filter(pl.col(\"region\") == \"r1\").head(3)",
+        "collect pushed past filter",
+    ),
+    "group_by": (
+        "pl.scan_csv(\"{path}\").collect().group_by(\"region\").agg(pl.col(\"price\").sum()).sort(\"region\")",
+        "collect pushed past group_by.agg",
+    ),
+    "unbounded": ("pl.scan_csv(\"{path}\").collect()", "result limited to 10 rows"),
+    "columns": ("pl.read_csv(\"{path}\", columns=[\"region\", \"price\"]).sum()", "read_csv -> scan_csv"),
+    "columns_reordered": ("pl.read_csv(\"{path}\", columns=[\"price\", \"id\"])", "read_csv -> scan_csv"),
+    "column_index": ("pl.read_csv(\"{path}\", columns=[2])", None),
+    "column_indices": ("pl.read_csv(\"{path}\", columns=[0, 2])", None),
+    "columns_mixed": ("pl.read_csv(\"{path}\", columns=[\"region\", 3])", None),
+    "columns_row_index": ("pl.read_csv(\"{path}\", columns=[\"price\"], row_index_name=\"row\").head(3)", None),
+}
+
+
+@pytest.fixture(scope="module")
+def dataset(tmp_path_factory):
+    path = tmp_path_factory.mktemp("optimizer") / "orders.csv"
+    rows = 40
+    pl.DataFrame({
+        "id": range(rows),
+        "region": [f"r{i % 3}" for i in range(rows)],
+        "price": [(i * 37) % 100 + 0.5 for i in range(rows)],
+        "quantity": [i % 5 for i in range(rows)],
+    }).write_csv(path)
+    return str(path)
+
+
+def evaluate(tree: ast.Module):
+    """Run a parsed snippet Jupyter style: the value of its final expression (or the exception raised)."""
+    body, expression = split_final_expression(tree)
+    scope = {"pl": pl}
+    try:
+        exec(compile(ast.fix_missing_locations(body), "<snippet>", "exec"), scope)
+        return eval(compile(ast.fix_missing_locations(expression), "<snippet>", "eval"), scope)
+    except Exception as e:
+        return e
+
+
+@pytest.mark.parametrize("name", CASES)
+def test_rewrite_is_equivalent(name, dataset):
+    code, rewrite = CASES[name]
+    tree = ast.parse(code.format(path=dataset))
+    query = QueryOptimizer(row_limit=ROW_LIMIT).optimize(tree)
+
+    if rewrite is None:
+        assert not any(r == "read_csv -> scan_csv" or r.endswith("kept lazy until its use") for r in query.rewrites)
+    else:
+        assert rewrite in query.rewrites
+
+    original, optimized = evaluate(tree), evaluate(query.tree)
+    if isinstance(original, Exception):
+        assert type(optimized) is type(original)
+        return
+    assert not isinstance(optimized, Exception), optimized
+    if query.row_limit is not None:
+        # One row more than the limit is let through so the pipeline can tell the result was cut
+        original = original.head(query.row_limit + 1)
+    assert_frame_equal(optimized, original)